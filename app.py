@@ -38,12 +38,16 @@ from PySide6.QtWidgets import (
 )
 from PySide6.QtGui import QDragEnterEvent, QDropEvent, QDesktopServices, QColor
 
+from ffmpeg_runner import EncodeProgress, cancel_all, progress_scope
+from media_probe import probe_batch, probe_many
 from processor import (
-    ConcatOrder, VideoMatch, TextOverlayConfig,
-    apply_text_overlay, check_ffmpeg_available, find_matches, get_match_counts,
-    process_video_pair, scan_video_files
+    ConcatOrder, SequenceMatch, VideoMatch, TextOverlayConfig,
+    apply_text_overlay, check_ffmpeg_available, find_matches, find_sequence_matches,
+    get_match_counts, get_sequence_counts, get_video_duration_ms, process_video_pair,
+    process_video_sequence, scan_video_files
 )
 
+from resource_usage import ResourceUsage, usage_scope
 from ugc_processor import (
     scan_ugc_videos, process_ugc_video, UGCProcessingResult, ASSETS_DIR
 )
@@ -190,10 +194,31 @@ class OverlayJob:
     overlay: TextOverlayConfig
 
 
+class ProbeWorker(QObject):
+    """Worker for probing a batch of videos in a background thread."""
+
+    finished = Signal(list, list)  # paths, list[Optional[MediaInfo]]
+
+    def run(self, paths: list[Path]):
+        self.finished.emit(paths, probe_many(paths))
+
+
+def _format_encode_progress(progress: EncodeProgress) -> str:
+    """Short status text for the running encode, e.g. '42% · 58 fps · ETA 0:31'."""
+    parts = [f"{progress.percent:.0f}%"] if progress.percent is not None else []
+    if progress.fps:
+        parts.append(f"{progress.fps:.0f} fps")
+    if progress.eta_sec is not None:
+        eta = int(progress.eta_sec)
+        parts.append(f"ETA {eta // 60}:{eta % 60:02d}")
+    return " · ".join(parts)
+
+
 class ProcessingWorker(QObject):
     """Worker for processing video pairs in a background thread."""
 
     progress = Signal(int, int)  # current, total
+    encode_progress = Signal(float, str)  # percent of the running encode, status text
     log = Signal(str)
     finished = Signal(int, int, int)  # success, failed, skipped
     single_complete = Signal(str, bool)  # basename, success
@@ -204,10 +229,14 @@ class ProcessingWorker(QObject):
 
     def cancel(self):
         self._cancel_requested = True
+        cancel_all()  # stop the running ffmpeg now rather than at its next poll
 
     def is_cancelled(self) -> bool:
         return self._cancel_requested
 
+    def _emit_encode_progress(self, progress: EncodeProgress):
+        self.encode_progress.emit(progress.percent or 0.0, _format_encode_progress(progress))
+
     def process(
         self,
         matches: list[VideoMatch],
@@ -237,6 +266,8 @@ class ProcessingWorker(QObject):
         flat_dir.mkdir(parents=True, exist_ok=True)
         nested_dir.mkdir(parents=True, exist_ok=True)
 
+        job_usage = probe_batch([path for m in matched for path in (m.file_a, m.file_b)], self.log.emit)
+
         success_count = 0
         fail_count = 0
 
@@ -262,30 +293,122 @@ class ProcessingWorker(QObject):
             nested_subdir.mkdir(parents=True, exist_ok=True)
             output_nested = nested_subdir / output_name
 
-            result = process_video_pair(
-                match=match,
-                output_flat=output_flat,
-                output_nested=output_nested,
-                order=order,
-                crf=crf,
-                try_fast_copy=try_fast_copy,
-                overlay_a=overlay_a,
-                overlay_b=overlay_b,
-                log_callback=lambda msg: self.log.emit(msg),
-                cancel_check=self.is_cancelled
-            )
+            with usage_scope() as item_usage:
+                result = process_video_pair(
+                    match=match,
+                    output_flat=output_flat,
+                    output_nested=output_nested,
+                    order=order,
+                    crf=crf,
+                    try_fast_copy=try_fast_copy,
+                    overlay_a=overlay_a,
+                    overlay_b=overlay_b,
+                    log_callback=lambda msg: self.log.emit(msg),
+                    cancel_check=self.is_cancelled,
+                    progress_callback=self._emit_encode_progress
+                )
 
             if result.success:
                 success_count += 1
             else:
                 fail_count += 1
 
+            job_usage.add(item_usage)
+            self.log.emit(f"  Resources: {item_usage.describe()}")
             self.single_complete.emit(match.basename, result.success)
             self.log.emit("")
 
         skipped = total - success_count - fail_count
         self.log.emit("=" * 50)
         self.log.emit(f"COMPLETE: {success_count} success, {fail_count} failed, {skipped} skipped")
+        self.log.emit(f"Resources: {job_usage.describe()}")
+        self.finished.emit(success_count, fail_count, skipped)
+
+    def process_sequences(
+        self,
+        matches: list[SequenceMatch],
+        roles: list[str],
+        order: list[str],
+        output_base: Path,
+        flat_folder: str,
+        nested_folder: str,
+        crf: int,
+        try_fast_copy: bool,
+        overlays: dict[str, Optional[TextOverlayConfig]]
+    ):
+        """Concatenate N-folder sequences; roles name match.files, order is the timeline."""
+        self._cancel_requested = False
+
+        complete = [m for m in matches if m.is_complete]
+        total = len(complete)
+
+        if total == 0:
+            self.log.emit("No complete sequences to process!")
+            self.finished.emit(0, 0, 0)
+            return
+
+        flat_dir = output_base / flat_folder
+        nested_dir = output_base / nested_folder
+
+        flat_dir.mkdir(parents=True, exist_ok=True)
+        nested_dir.mkdir(parents=True, exist_ok=True)
+
+        job_usage = probe_batch([path for m in complete for path in m.files], self.log.emit)
+
+        success_count = 0
+        fail_count = 0
+        positions = [roles.index(role) for role in order]
+
+        self.log.emit(f"Starting processing of {total} sequences...")
+        self.log.emit(f"Order: {' -> '.join(order)}")
+        self.log.emit(f"CRF: {crf}, Fast copy: {try_fast_copy}")
+        if any(overlay and overlay.is_enabled() for overlay in overlays.values()):
+            self.log.emit("Text overlays: enabled")
+        self.log.emit(f"Output: {output_base}")
+        self.log.emit("-" * 50)
+
+        for idx, match in enumerate(complete, 1):
+            if self._cancel_requested:
+                self.log.emit("\n*** CANCELLED BY USER ***")
+                break
+
+            self.progress.emit(idx, total)
+
+            output_name = f"{match.basename}.mp4"
+            output_flat = flat_dir / output_name
+            nested_subdir = nested_dir / str(idx)
+            nested_subdir.mkdir(parents=True, exist_ok=True)
+            output_nested = nested_subdir / output_name
+
+            with usage_scope() as item_usage:
+                result = process_video_sequence(
+                    basename=match.basename,
+                    files=[match.files[pos] for pos in positions],
+                    output_flat=output_flat,
+                    output_nested=output_nested,
+                    crf=crf,
+                    try_fast_copy=try_fast_copy,
+                    overlays=[overlays.get(role) for role in order],
+                    labels=order,
+                    log_callback=lambda msg: self.log.emit(msg),
+                    cancel_check=self.is_cancelled,
+                    progress_callback=self._emit_encode_progress
+                )
+
+            if result.success:
+                success_count += 1
+            else:
+                fail_count += 1
+
+            job_usage.add(item_usage)
+            self.log.emit(f"  Resources: {item_usage.describe()}")
+            self.single_complete.emit(match.basename, result.success)
+            self.log.emit("")
+
+        skipped = total - success_count - fail_count
+        self.log.emit("=" * 50)
+        self.log.emit(f"COMPLETE: {success_count} success, {fail_count} failed, {skipped} skipped")
+        self.log.emit(f"Resources: {job_usage.describe()}")
         self.finished.emit(success_count, fail_count, skipped)
 
     def process_overlays(
@@ -303,6 +426,7 @@ class ProcessingWorker(QObject):
 
         success_count = 0
         fail_count = 0
+        job_usage = ResourceUsage()
 
         self.log.emit(f"Starting text overlay processing of {total} videos...")
         self.log.emit(f"CRF: {crf}")
@@ -315,14 +439,16 @@ class ProcessingWorker(QObject):
 
             self.progress.emit(idx, total)
 
-            success, error = apply_text_overlay(
-                input_video=job.input_video,
-                output_path=job.output_path,
-                overlay=job.overlay,
-                crf=crf,
-                log_callback=lambda msg: self.log.emit(msg),
-                cancel_check=self.is_cancelled
-            )
+            duration_sec = get_video_duration_ms(job.input_video) / 1000
+            with progress_scope(self._emit_encode_progress, duration_sec), usage_scope() as item_usage:
+                success, error = apply_text_overlay(
+                    input_video=job.input_video,
+                    output_path=job.output_path,
+                    overlay=job.overlay,
+                    crf=crf,
+                    log_callback=lambda msg: self.log.emit(msg),
+                    cancel_check=self.is_cancelled
+                )
 
             if success:
                 success_count += 1
@@ -331,12 +457,15 @@ class ProcessingWorker(QObject):
                 if error:
                     self.log.emit(f"  FAILED: {error[:200]}")
 
+            job_usage.add(item_usage)
+            self.log.emit(f"  Resources: {item_usage.describe()}")
             self.single_complete.emit(job.input_video.name, success)
             self.log.emit("")
 
         skipped = total - success_count - fail_count
         self.log.emit("=" * 50)
         self.log.emit(f"COMPLETE: {success_count} success, {fail_count} failed, {skipped} skipped")
+        self.log.emit(f"Resources: {job_usage.describe()}")
         self.finished.emit(success_count, fail_count, skipped)
 
 
@@ -344,6 +473,7 @@ class UGCProcessingWorker(QObject):
     """Worker for processing UGC videos in a background thread."""
 
     progress = Signal(int, int)  # current, total
+    encode_progress = Signal(float, str)  # percent of the running encode, status text
     log = Signal(str)
     finished = Signal(int, int)  # success, failed
     single_complete = Signal(str, bool)  # filename, success
@@ -354,10 +484,14 @@ class UGCProcessingWorker(QObject):
 
     def cancel(self):
         self._cancel_requested = True
+        cancel_all()  # stop the running ffmpeg now rather than at its next poll
 
     def is_cancelled(self) -> bool:
         return self._cancel_requested
 
+    def _emit_encode_progress(self, progress: EncodeProgress):
+        self.encode_progress.emit(progress.percent or 0.0, _format_encode_progress(progress))
+
     def process(
         self,
         videos: list[Path],
@@ -382,6 +516,8 @@ class UGCProcessingWorker(QObject):
 
         output_dir.mkdir(parents=True, exist_ok=True)
 
+        job_usage = probe_batch(videos, self.log.emit)
+
         success_count = 0
         fail_count = 0
 
@@ -402,40 +538,58 @@ class UGCProcessingWorker(QObject):
 
             output_path = output_dir / f"{video.stem}_processed.mp4"
 
-            result = process_ugc_video(
-                input_video=video,
-                output_path=output_path,
-                api_key=api_key,
-                add1_overlay=add1_path,
-                add2_overlay=add2_path,
-                clip_end=clip_end_path,
-                add1_position=(add1_x, add1_y),
-                add2_opacity=add2_opacity,
-                crf=crf,
-                enable_captions=enable_captions,
-                log_callback=lambda msg: self.log.emit(msg),
-                cancel_check=self.is_cancelled
-            )
+            with usage_scope() as item_usage:
+                result = process_ugc_video(
+                    input_video=video,
+                    output_path=output_path,
+                    api_key=api_key,
+                    add1_overlay=add1_path,
+                    add2_overlay=add2_path,
+                    clip_end=clip_end_path,
+                    add1_position=(add1_x, add1_y),
+                    add2_opacity=add2_opacity,
+                    crf=crf,
+                    enable_captions=enable_captions,
+                    log_callback=lambda msg: self.log.emit(msg),
+                    cancel_check=self.is_cancelled,
+                    progress_callback=self._emit_encode_progress
+                )
 
             if result.success:
                 success_count += 1
             else:
                 fail_count += 1
 
+            job_usage.add(item_usage)
+            self.log.emit(f"  Resources: {item_usage.describe()}")
             self.single_complete.emit(video.name, result.success)
             self.log.emit("")
 
         self.log.emit("=" * 50)
         self.log.emit(f"COMPLETE: {success_count} success, {fail_count} failed")
+        self.log.emit(f"Resources: {job_usage.describe()}")
         self.finished.emit(success_count, fail_count)
 
 
+# Timeline block colours (background, text) for folders after A and B
+_EXTRA_FOLDER_COLORS = [
+    ("#FFE0B2", "#E65100"),
+    ("#E1BEE7", "#4A148C"),
+    ("#B2EBF2", "#006064"),
+    ("#F8BBD0", "#880E4F"),
+    ("#DCEDC8", "#33691E"),
+    ("#D7CCC8", "#3E2723"),
+]
+
+
 class ConcatTab(QWidget):
     """Tab for video concatenation functionality."""
 
     def __init__(self, parent=None):
         super().__init__(parent)
-        self.matches: list[VideoMatch] = []
+        self.matches: list = []  # VideoMatch, or SequenceMatch after an N-way scan
+        self.extra_drop_zones: list[DropZone] = []
+        self.sequence_roles: list[str] = []  # folder roles of the last N-way scan
         self.worker: Optional[ProcessingWorker] = None
         self.worker_thread: Optional[QThread] = None
         self._setup_ui()
@@ -481,6 +635,13 @@ class ConcatTab(QWidget):
 
         folders_layout.addLayout(folder_a_layout)
         folders_layout.addLayout(folder_b_layout)
+        self.folders_layout = folders_layout
+
+        # Further folders turn pairs into N-way sequences (e.g. hook+body+CTA)
+        self.btn_add_folder = QPushButton("+ Add Folder")
+        self.btn_add_folder.setToolTip("Add another folder; videos are matched by name across all folders")
+        self.btn_add_folder.clicked.connect(self._add_folder)
+        folders_layout.addWidget(self.btn_add_folder, 0, Qt.AlignTop)
         main_layout.addWidget(folders_group)
 
         # === Output Configuration ===
@@ -525,22 +686,8 @@ class ConcatTab(QWidget):
             "QListWidget::item:selected { background-color: #ffe082; }"
         )
 
-        item_a = QListWidgetItem("Video A")
-        item_a.setData(Qt.UserRole, "A")
-        item_a.setTextAlignment(Qt.AlignCenter)
-        item_a.setSizeHint(QSize(120, 40))
-        item_a.setBackground(QColor("#BBDEFB"))
-        item_a.setForeground(QColor("#0D47A1"))
-
-        item_b = QListWidgetItem("Video B")
-        item_b.setData(Qt.UserRole, "B")
-        item_b.setTextAlignment(Qt.AlignCenter)
-        item_b.setSizeHint(QSize(120, 40))
-        item_b.setBackground(QColor("#C8E6C9"))
-        item_b.setForeground(QColor("#1B5E20"))
-
-        self.timeline_list.addItem(item_a)
-        self.timeline_list.addItem(item_b)
+        self.timeline_list.addItem(self._timeline_item("A", "#BBDEFB", "#0D47A1"))
+        self.timeline_list.addItem(self._timeline_item("B", "#C8E6C9", "#1B5E20"))
         self.timeline_list.orderChanged.connect(self._update_timeline_sequence)
 
         self.timeline_sequence_label = QLabel("")
@@ -779,6 +926,7 @@ class ConcatTab(QWidget):
         progress_layout = QHBoxLayout()
         self.progress_label = QLabel("Ready")
         self.progress_bar = QProgressBar()
+        self._progress_item = (0, 0)
         self.progress_bar.setRange(0, 100)
         self.progress_bar.setValue(0)
         progress_layout.addWidget(self.progress_label)
@@ -794,6 +942,51 @@ class ConcatTab(QWidget):
         splitter.setSizes([300, 200])
         outer_layout.addWidget(splitter, 1)
 
+    def _timeline_item(self, role: str, background: str, foreground: str) -> QListWidgetItem:
+        item = QListWidgetItem(f"Video {role}")
+        item.setData(Qt.UserRole, role)
+        item.setTextAlignment(Qt.AlignCenter)
+        item.setSizeHint(QSize(120, 40))
+        item.setBackground(QColor(background))
+        item.setForeground(QColor(foreground))
+        return item
+
+    def _add_folder(self):
+        """Add a Folder C, D, ... drop zone and its timeline block."""
+        index = len(self.extra_drop_zones)
+        role = chr(ord("C") + index)
+        drop_zone = DropZone(f"Folder {role}")
+        drop_zone.pathChanged.connect(self._on_path_changed)
+        btn_browse = QPushButton("Browse...")
+        btn_browse.clicked.connect(lambda: self._browse_folder(drop_zone))
+        folder_layout = QVBoxLayout()
+        folder_layout.addWidget(drop_zone)
+        folder_layout.addWidget(btn_browse)
+        self.folders_layout.insertLayout(self.folders_layout.count() - 1, folder_layout)
+        self.extra_drop_zones.append(drop_zone)
+
+        background, foreground = _EXTRA_FOLDER_COLORS[index]
+        self.timeline_list.addItem(self._timeline_item(role, background, foreground))
+        self._update_timeline_sequence()
+        if len(self.extra_drop_zones) >= len(_EXTRA_FOLDER_COLORS):
+            self.btn_add_folder.setEnabled(False)
+
+    def _folder_paths(self) -> dict[str, Optional[str]]:
+        """Selected folder per timeline role."""
+        paths = {"A": self.drop_zone_a.get_path(), "B": self.drop_zone_b.get_path()}
+        for index, drop_zone in enumerate(self.extra_drop_zones):
+            paths[chr(ord("C") + index)] = drop_zone.get_path()
+        return paths
+
+    def _timeline_roles(self) -> list[str]:
+        """Folder roles in the order set on the timeline."""
+        return [self.timeline_list.item(i).data(Qt.UserRole) for i in range(self.timeline_list.count())]
+
+    def _has_processable_matches(self) -> bool:
+        if self.sequence_roles:
+            return any(m.is_complete for m in self.matches)
+        return any(m.is_matched for m in self.matches)
+
     def _update_timeline_sequence(self):
         """Update the displayed final output order."""
         labels = []
@@ -805,11 +998,10 @@ class ConcatTab(QWidget):
 
     def _get_concat_order(self) -> ConcatOrder:
         """Return ConcatOrder based on the timeline list order."""
-        if self.timeline_list.count() < 2:
+        roles = [role for role in self._timeline_roles() if role in ("A", "B")]
+        if len(roles) < 2:
             return ConcatOrder.A_THEN_B
-        first_item = self.timeline_list.item(0)
-        first_role = first_item.data(Qt.UserRole)
-        return ConcatOrder.A_THEN_B if first_role == "A" else ConcatOrder.B_THEN_A
+        return ConcatOrder.A_THEN_B if roles[0] == "A" else ConcatOrder.B_THEN_A
 
     def _build_overlay_config(
         self,
@@ -870,7 +1062,7 @@ class ConcatTab(QWidget):
         has_a = self.drop_zone_a.get_path() is not None
         has_b = self.drop_zone_b.get_path() is not None
         has_output = self.drop_zone_output.get_path() is not None
-        has_matches = any(m.is_matched for m in self.matches)
+        has_matches = self._has_processable_matches()
         overlay_text_a = self.input_overlay_a_text.text().strip()
         overlay_text_b = self.input_overlay_b_text.text().strip()
         if has_a and has_b:
@@ -895,6 +1087,13 @@ class ConcatTab(QWidget):
         if not path_a or not path_b:
             return
 
+        folder_paths = self._folder_paths()
+        roles = [role for role, path in folder_paths.items() if path]
+        if len(roles) > 2:
+            self._scan_sequences(roles, [Path(folder_paths[role]) for role in roles])
+            return
+
+        self.sequence_roles = []
         self.matches = find_matches(Path(path_a), Path(path_b))
         matched, only_a, only_b = get_match_counts(self.matches)
 
@@ -926,6 +1125,33 @@ class ConcatTab(QWidget):
         self._log(f"Scan complete: {matched} matched, {only_a} only in A, {only_b} only in B")
         self._update_button_states()
 
+    def _scan_sequences(self, roles: list[str], folders: list[Path]):
+        """Scan three or more folders and match N-way sequences by name."""
+        self.sequence_roles = roles
+        self.matches = find_sequence_matches(folders)
+        complete, incomplete = get_sequence_counts(self.matches)
+
+        self.stats_label.setText(
+            f"<b>Complete sequences ({len(roles)} folders):</b> {complete} | "
+            f"<span style='color: #ff9800'>Incomplete:</span> {incomplete}"
+        )
+
+        # The table shows folders A and B; the status covers every folder
+        self.table.setRowCount(len(self.matches))
+        for row, match in enumerate(self.matches):
+            self.table.setItem(row, 0, QTableWidgetItem(match.basename))
+            self.table.setItem(row, 1, QTableWidgetItem(match.files[0].name if match.files[0] else "-"))
+            self.table.setItem(row, 2, QTableWidgetItem(match.files[1].name if match.files[1] else "-"))
+
+            status_item = QTableWidgetItem(match.status)
+            status_item.setBackground(Qt.green if match.is_complete else Qt.yellow)
+            self.table.setItem(row, 3, status_item)
+
+            self.table.setItem(row, 4, QTableWidgetItem(""))
+
+        self._log(f"Scan complete: {complete} complete sequences across {len(roles)} folders, {incomplete} incomplete")
+        self._update_button_states()
+
     def _start_processing(self):
         """Start the processing operation."""
         path_a = self.drop_zone_a.get_path()
@@ -937,8 +1163,11 @@ class ConcatTab(QWidget):
             return
 
         # Validate paths
-        for path, name in [(path_a, "Folder A"), (path_b, "Folder B"), (path_output, "Output")]:
-            if not os.path.isdir(path):
+        folder_paths = self._folder_paths()
+        checks = [(path, f"Folder {role}") for role, path in folder_paths.items() if role in self.sequence_roles]
+        checks += [(path_a, "Folder A"), (path_b, "Folder B"), (path_output, "Output")]
+        for path, name in checks:
+            if not path or not os.path.isdir(path):
                 QMessageBox.warning(self, "Invalid Path", f"{name} is not a valid directory.")
                 return
 
@@ -992,6 +1221,7 @@ class ConcatTab(QWidget):
 
         # Connect signals
         self.worker.progress.connect(self._on_progress)
+        self.worker.encode_progress.connect(self._on_encode_progress)
         self.worker.log.connect(self._log)
         self.worker.finished.connect(self._on_finished)
         self.worker.single_complete.connect(self._on_single_complete)
@@ -1009,6 +1239,24 @@ class ConcatTab(QWidget):
             self.table.setItem(row, 4, QTableWidgetItem(""))
 
         # Start processing
+        if self.sequence_roles:
+            order_roles = [role for role in self._timeline_roles() if role in self.sequence_roles]
+            self.worker_thread.started.connect(
+                lambda: self.worker.process_sequences(
+                    self.matches,
+                    self.sequence_roles,
+                    order_roles,
+                    Path(path_output),
+                    flat_name,
+                    nested_name,
+                    crf,
+                    fast_copy,
+                    {"A": overlay_a, "B": overlay_b}
+                )
+            )
+            self.worker_thread.start()
+            return
+
         self.worker_thread.started.connect(
             lambda: self.worker.process(
                 self.matches,
@@ -1104,6 +1352,7 @@ class ConcatTab(QWidget):
 
         # Connect signals
         self.worker.progress.connect(self._on_progress)
+        self.worker.encode_progress.connect(self._on_encode_progress)
         self.worker.log.connect(self._log)
         self.worker.finished.connect(self._on_finished)
         self.worker.single_complete.connect(self._on_single_complete)
@@ -1136,9 +1385,16 @@ class ConcatTab(QWidget):
 
     def _on_progress(self, current: int, total: int):
         """Handle progress updates."""
+        self._progress_item = (current, total)
         self.progress_label.setText(f"Processing {current}/{total}")
-        self.progress_bar.setRange(0, total)
-        self.progress_bar.setValue(current)
+        self.progress_bar.setRange(0, total * 100)
+        self.progress_bar.setValue((current - 1) * 100)
+
+    def _on_encode_progress(self, percent: float, detail: str):
+        """Advance the bar within the current item from the running encode."""
+        current, total = self._progress_item
+        self.progress_label.setText(f"Processing {current}/{total} · {detail}")
+        self.progress_bar.setValue((current - 1) * 100 + int(percent))
 
     def _on_single_complete(self, basename: str, success: bool):
         """Update table when a single item completes."""
@@ -1154,6 +1410,8 @@ class ConcatTab(QWidget):
         """Handle processing completion."""
         self.btn_cancel.setEnabled(False)
         self.progress_label.setText(f"Complete: {success} success, {failed} failed, {skipped} skipped")
+        if not skipped:
+            self.progress_bar.setValue(self.progress_bar.maximum())
 
         # Cleanup thread
         if self.worker_thread:
@@ -1196,6 +1454,8 @@ class UGCOverlayTab(QWidget):
         self.videos: list[Path] = []
         self.worker: Optional[UGCProcessingWorker] = None
         self.worker_thread: Optional[QThread] = None
+        self.probe_worker: Optional[ProbeWorker] = None
+        self.probe_thread: Optional[QThread] = None
         self._setup_ui()
 
     def _setup_ui(self):
@@ -1374,6 +1634,7 @@ class UGCOverlayTab(QWidget):
         progress_layout = QHBoxLayout()
         self.progress_label = QLabel("Ready")
         self.progress_bar = QProgressBar()
+        self._progress_item = (0, 0)
         self.progress_bar.setRange(0, 100)
         self.progress_bar.setValue(0)
         progress_layout.addWidget(self.progress_label)
@@ -1444,12 +1705,42 @@ class UGCOverlayTab(QWidget):
         self.table.setRowCount(len(self.videos))
         for row, video in enumerate(self.videos):
             self.table.setItem(row, 0, QTableWidgetItem(video.name))
-            # Duration would require ffprobe, show placeholder for now
+            # Filled in by the background probe
             self.table.setItem(row, 1, QTableWidgetItem("-"))
             self.table.setItem(row, 2, QTableWidgetItem("Pending"))
 
         self._log(f"Found {len(self.videos)} videos in folder")
         self._update_button_states()
+        self._start_probe(list(self.videos))
+
+    def _start_probe(self, videos: list[Path]):
+        """Probe scanned videos in the background to fill the Duration column."""
+        if not videos or self.probe_thread is not None:
+            # A running probe re-checks self.videos when it finishes
+            return
+
+        self.probe_worker = ProbeWorker()
+        self.probe_thread = QThread()
+        self.probe_worker.moveToThread(self.probe_thread)
+        self.probe_worker.finished.connect(self._on_probe_finished)
+        self.probe_thread.started.connect(lambda: self.probe_worker.run(videos))
+        self.probe_thread.start()
+
+    def _on_probe_finished(self, paths: list, infos: list):
+        if self.probe_thread:
+            self.probe_thread.quit()
+            self.probe_thread.wait()
+            self.probe_thread = None
+            self.probe_worker = None
+
+        if paths != self.videos:
+            # Folder was rescanned while probing; probe the new list
+            self._start_probe(list(self.videos))
+            return
+
+        for row, info in enumerate(infos):
+            text = f"{info.duration_ms / 1000:.1f}s" if info else "unreadable"
+            self.table.setItem(row, 1, QTableWidgetItem(text))
 
     def _start_processing(self):
         input_path = self.drop_zone_input.get_path()
@@ -1503,6 +1794,7 @@ class UGCOverlayTab(QWidget):
 
         # Connect signals
         self.worker.progress.connect(self._on_progress)
+        self.worker.encode_progress.connect(self._on_encode_progress)
         self.worker.log.connect(self._log)
         self.worker.finished.connect(self._on_finished)
         self.worker.single_complete.connect(self._on_single_complete)
@@ -1550,9 +1842,15 @@ class UGCOverlayTab(QWidget):
             self.btn_cancel.setEnabled(False)
 
     def _on_progress(self, current: int, total: int):
+        self._progress_item = (current, total)
         self.progress_label.setText(f"Processing {current}/{total}")
-        self.progress_bar.setRange(0, total)
-        self.progress_bar.setValue(current)
+        self.progress_bar.setRange(0, total * 100)
+        self.progress_bar.setValue((current - 1) * 100)
+
+    def _on_encode_progress(self, percent: float, detail: str):
+        current, total = self._progress_item
+        self.progress_label.setText(f"Processing {current}/{total} · {detail}")
+        self.progress_bar.setValue((current - 1) * 100 + int(percent))
 
     def _on_single_complete(self, filename: str, success: bool):
         for row in range(self.table.rowCount()):
@@ -1568,6 +1866,8 @@ class UGCOverlayTab(QWidget):
         self.btn_scan.setEnabled(True)
         self.btn_cancel.setEnabled(False)
         self.progress_label.setText(f"Complete: {success} success, {failed} failed")
+        if success + failed == self._progress_item[1]:
+            self.progress_bar.setValue(self.progress_bar.maximum())
 
         if self.worker_thread:
             self.worker_thread.quit()
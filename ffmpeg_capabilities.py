@@ -0,0 +1,151 @@
+"""
+FFmpeg Capabilities Module
+
+What the installed ffmpeg can do: version, filters, encoders, decoders and
+libass support. Collected once per binary (four short ffmpeg calls) and
+persisted under the cache dir keyed by the binary's path and mtime, so
+workers load it from disk at startup and forked job processes inherit it
+instead of spawning ffmpeg per job. Upgrading ffmpeg changes the mtime,
+which rebuilds the entry.
+"""
+
+import hashlib
+import json
+import os
+import re
+import shutil
+import subprocess
+import threading
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Any, Optional
+
+from media_probe import get_cache_dir
+
+# Bump when the collected fields change so old entries stop matching
+_CAPABILITIES_VERSION = 1
+# Leading flag column of -filters/-encoders/-decoders rows, e.g. "T.C" or "V....D"
+_FLAGS_RE = re.compile(r"[A-Z.|]+")
+
+_MEMO: dict[tuple[str, int], "FFmpegCapabilities"] = {}
+_MEMO_LOCK = threading.Lock()
+
+
+@dataclass
+class FFmpegCapabilities:
+    """Features of one ffmpeg binary."""
+    path: str
+    version: str  # first line of ffmpeg -version
+    filters: set[str] = field(default_factory=set)
+    encoders: set[str] = field(default_factory=set)
+    decoders: set[str] = field(default_factory=set)
+
+    @property
+    def has_libass(self) -> bool:
+        # The ass filter only exists in builds with libass
+        return "ass" in self.filters
+
+    def to_dict(self) -> dict[str, Any]:
+        data = asdict(self)
+        for name in ("filters", "encoders", "decoders"):
+            data[name] = sorted(data[name])
+        return data
+
+    @classmethod
+    def from_dict(cls, data: dict[str, Any]) -> "FFmpegCapabilities":
+        return cls(
+            path=data["path"],
+            version=data["version"],
+            filters=set(data.get("filters", [])),
+            encoders=set(data.get("encoders", [])),
+            decoders=set(data.get("decoders", [])),
+        )
+
+
+def _binary_key() -> Optional[tuple[str, int]]:
+    """(resolved path, mtime) of the ffmpeg on PATH, or None if there is none."""
+    found = shutil.which("ffmpeg")
+    if found is None:
+        return None
+    path = os.path.realpath(found)
+    try:
+        return path, os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+
+def _cache_file(key: tuple[str, int]) -> Path:
+    digest = hashlib.sha1(json.dumps([_CAPABILITIES_VERSION, *key]).encode()).hexdigest()[:16]
+    return get_cache_dir() / "ffmpeg" / f"capabilities_{digest}.json"
+
+
+def _parse_names(output: str) -> set[str]:
+    """Names from the rows of ffmpeg -filters/-encoders/-decoders output."""
+    names = set()
+    for line in output.splitlines():
+        parts = line.split()
+        # Skips the header, the flag legend ("V..... = Video") and "------"
+        if len(parts) >= 2 and parts[1] != "=" and _FLAGS_RE.fullmatch(parts[0]):
+            names.add(parts[1])
+    return names
+
+
+def _ffmpeg_output(path: str, *args: str) -> str:
+    result = subprocess.run(
+        [path, '-hide_banner', *args], capture_output=True, text=True, timeout=10
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"ffmpeg {' '.join(args)} exited with {result.returncode}")
+    return result.stdout
+
+
+def _collect(path: str) -> FFmpegCapabilities:
+    return FFmpegCapabilities(
+        path=path,
+        version=_ffmpeg_output(path, '-version').split('\n')[0],
+        filters=_parse_names(_ffmpeg_output(path, '-filters')),
+        encoders=_parse_names(_ffmpeg_output(path, '-encoders')),
+        decoders=_parse_names(_ffmpeg_output(path, '-decoders')),
+    )
+
+
+def _load(key: tuple[str, int]) -> Optional[FFmpegCapabilities]:
+    try:
+        data = json.loads(_cache_file(key).read_text(encoding="utf-8"))
+        return FFmpegCapabilities.from_dict(data)
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+
+
+def _store(key: tuple[str, int], capabilities: FFmpegCapabilities) -> None:
+    cache_file = _cache_file(key)
+    temp_path = cache_file.with_name(f"{cache_file.name}.{os.getpid()}.tmp")
+    try:
+        cache_file.parent.mkdir(parents=True, exist_ok=True)
+        temp_path.write_text(json.dumps(capabilities.to_dict()), encoding="utf-8")
+        os.replace(temp_path, cache_file)
+    except OSError:
+        temp_path.unlink(missing_ok=True)
+
+
+def get_capabilities() -> Optional[FFmpegCapabilities]:
+    """
+    Capabilities of the ffmpeg on PATH, from memory, the disk cache or a
+    fresh collection, in that order. Returns None if ffmpeg is missing or
+    does not run.
+    """
+    key = _binary_key()
+    if key is None:
+        return None
+    with _MEMO_LOCK:
+        capabilities = _MEMO.get(key)
+        if capabilities is None:
+            capabilities = _load(key)
+            if capabilities is None:
+                try:
+                    capabilities = _collect(key[0])
+                except (OSError, RuntimeError, subprocess.SubprocessError):
+                    return None
+                _store(key, capabilities)
+            _MEMO[key] = capabilities
+    return capabilities
@@ -0,0 +1,611 @@
+"""
+FFmpeg Runner Module
+
+Shared supervisor for ffmpeg child processes. Every process is started and
+supervised on one asyncio loop running in a background thread, so a
+waiting encode holds no output buffer of its own; the blocking functions
+below are the sync facade the processors call. Concurrent processes are
+capped by a semaphore, cancellation is event-driven (cancel_all(), failed
+siblings) with cancel_check polled on the loop, a watchdog kills runs that
+stop making progress, stderr is streamed into a ring of its last lines,
+and failed runs never leave partial outputs behind. classify_failure()
+maps a failed run's error to a FailureCause so fallback chains can tell
+which retries can help. Processes are reaped with wait4 and their
+resource usage is added to the caller's usage scopes (resource_usage).
+
+Every run reports its -progress blocks; inside a progress_scope() they are
+turned into percent/fps/ETA against the scope's expected output duration
+and delivered on the calling thread.
+"""
+
+import asyncio
+import codecs
+import os
+import queue
+import re
+import signal
+import subprocess
+import threading
+import time
+from contextlib import contextmanager
+from collections import deque
+from contextvars import ContextVar
+from dataclasses import dataclass
+from enum import Enum
+from pathlib import Path
+from typing import Callable, Iterator, Optional, Union
+
+from resource_usage import HAS_WAIT4, ResourceUsage, reap, record_usage
+
+# Max ffmpeg processes running at once in this worker process
+_MAX_PROCESSES = int(os.getenv("RECLIP_FFMPEG_PROCESSES", "0") or 0) or max(4, os.cpu_count() or 1)
+# How often cancel_check callables are polled on the loop
+_CANCEL_POLL_SEC = 0.1
+# Watchdog: a run whose -progress position has not moved for this long is hung
+_STALL_SEC = float(os.getenv("RECLIP_FFMPEG_STALL_SEC", "120") or 120)
+# Wall budget of a run with a known output duration, before ffmpeg reports
+# its speed: base plus the duration at this realtime multiple
+_WATCHDOG_BASE_SEC = 120.0
+_WATCHDOG_MIN_SPEED = 0.25
+_WATCHDOG_POLL_SEC = 1.0
+# stderr kept per process (runs use -nostats, so these are real messages;
+# errors come last)
+_STDERR_RING_LINES = 200
+_STDERR_MAX_LINE_CHARS = 1000
+# Lines of the ring returned as a failed run's error message
+_ERROR_LINES = 12
+
+_LOOP: Optional[asyncio.AbstractEventLoop] = None
+_LOOP_PID: Optional[int] = None
+_LOOP_LOCK = threading.Lock()
+_SEMAPHORE: Optional[asyncio.Semaphore] = None
+# Cancel events of the running processes; only touched on the loop thread
+_ACTIVE: set[asyncio.Event] = set()
+
+# (run index, -progress block) relayed from the loop to the calling thread
+ProgressReport = Callable[[int, dict[str, str]], None]
+
+
+class FailureCause(Enum):
+    """Why an ffmpeg run failed, as far as its error output tells."""
+    CANCELLED = "cancelled"
+    STALLED = "stalled"
+    TIMEOUT = "timeout"
+    OUT_OF_DISK = "out_of_disk"
+    MISSING_AUDIO = "missing_audio"
+    DIMENSION_MISMATCH = "dimension_mismatch"
+    UNSUPPORTED_CODEC = "unsupported_codec"
+    UNKNOWN = "unknown"
+
+
+_FAILURE_PATTERNS = [
+    (FailureCause.OUT_OF_DISK, re.compile(r"No space left on device|Disk quota exceeded", re.I)),
+    # "Stream specifier ':a' in filtergraph ... matches no streams", "Stream map '0:a' ..."
+    (FailureCause.MISSING_AUDIO, re.compile(r"Stream (?:specifier|map) '[^']*:a[^']*'.* matches no streams")),
+    (FailureCause.DIMENSION_MISMATCH, re.compile(
+        r"do not match the corresponding output link|not divisible by 2|does not match the (?:width|height)"
+    )),
+    (FailureCause.UNSUPPORTED_CODEC, re.compile(
+        r"Unknown (?:encoder|decoder)|(?:Encoder|Decoder) \(codec [^)]*\) not found|Unsupported codec",
+        re.I
+    )),
+]
+
+# Failures that no other render of the same inputs can fix
+UNRECOVERABLE_FAILURES = frozenset({
+    FailureCause.CANCELLED,
+    FailureCause.STALLED,
+    FailureCause.TIMEOUT,
+    FailureCause.OUT_OF_DISK,
+    FailureCause.UNSUPPORTED_CODEC,
+})
+
+
+def classify_failure(error: str) -> FailureCause:
+    """Map the error message of a failed run (see run_result) to its cause."""
+    if error == "Cancelled by user":
+        return FailureCause.CANCELLED
+    if error.startswith("Stalled"):
+        return FailureCause.STALLED
+    if error.startswith("Timed out"):
+        return FailureCause.TIMEOUT
+    for cause, pattern in _FAILURE_PATTERNS:
+        if pattern.search(error):
+            return cause
+    return FailureCause.UNKNOWN
+
+
+class StderrRing:
+    """The last lines of a stream fed in arbitrary chunks, bounded in size."""
+
+    def __init__(self, max_lines: int = _STDERR_RING_LINES):
+        self._lines: deque[str] = deque(maxlen=max_lines)
+        self._partial = ""
+        self._decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+
+    def feed(self, chunk: bytes) -> None:
+        *lines, self._partial = re.split(r"[\r\n]", self._partial + self._decoder.decode(chunk))
+        for line in lines:
+            if line.strip():
+                self._lines.append(line[:_STDERR_MAX_LINE_CHARS])
+        self._partial = self._partial[-_STDERR_MAX_LINE_CHARS:]
+
+    def lines(self) -> list[str]:
+        return [*self._lines, self._partial] if self._partial.strip() else list(self._lines)
+
+
+@dataclass
+class FFmpegRun:
+    """Outcome of one supervised ffmpeg process."""
+    returncode: Optional[int]
+    stderr: str  # last lines only, see StderrRing
+    cancelled: bool = False
+    stalled: bool = False  # killed by the watchdog: no progress
+    timed_out: bool = False  # killed by the watchdog: over its wall budget
+    error: str = ""  # the process could not be started
+    out_time_ms: int = 0  # output position of the final -progress block
+    frames: int = 0  # video frames written, from the final -progress block
+    usage: Optional[ResourceUsage] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.returncode == 0 and not (self.cancelled or self.stalled or self.timed_out)
+
+
+@dataclass
+class EncodeProgress:
+    """Progress of the running ffmpeg pass, from its -progress output."""
+    out_time_sec: float
+    frame: int = 0
+    fps: float = 0.0
+    speed: float = 0.0  # realtime multiple
+    percent: Optional[float] = None  # None when the duration is unknown
+    eta_sec: Optional[float] = None
+
+
+@dataclass
+class ProgressScope:
+    """Where progress goes and the output duration it is measured against."""
+    callback: Callable[[EncodeProgress], None]
+    duration_sec: Optional[float] = None
+
+    def emit(self, out_time_sec: float, frame: int, fps: float, speed: float) -> None:
+        percent = eta_sec = None
+        if self.duration_sec and self.duration_sec > 0:
+            out_time_sec = min(out_time_sec, self.duration_sec)
+            percent = min(99.9, 100.0 * out_time_sec / self.duration_sec)
+            if speed > 0:
+                eta_sec = (self.duration_sec - out_time_sec) / speed
+        try:
+            self.callback(EncodeProgress(out_time_sec, frame, fps, speed, percent, eta_sec))
+        except Exception:
+            pass  # progress display must never fail an encode
+
+
+_PROGRESS_SCOPE: ContextVar[Optional[ProgressScope]] = ContextVar("ffmpeg_progress_scope", default=None)
+
+
+@contextmanager
+def progress_scope(
+    callback: Optional[Callable[[EncodeProgress], None]],
+    duration_sec: Optional[float] = None
+) -> Iterator[Optional[ProgressScope]]:
+    """
+    Report the progress of ffmpeg runs started in this block to callback.
+    duration_sec is the expected output length; callers that learn it later
+    can set it on the yielded scope.
+    """
+    if callback is None:
+        yield None
+        return
+    scope = ProgressScope(callback, duration_sec)
+    token = _PROGRESS_SCOPE.set(scope)
+    try:
+        yield scope
+    finally:
+        _PROGRESS_SCOPE.reset(token)
+
+
+def _parse_number(value: Optional[str]) -> float:
+    try:
+        # Before the first frame ffmpeg reports "N/A" or a large negative time
+        return max(0.0, float((value or "").rstrip("x")))
+    except ValueError:
+        return 0.0
+
+
+class _Watchdog:
+    """
+    Tells when a run is hung: its -progress position (time, frames, bytes)
+    has not moved for _STALL_SEC, or it is past its wall budget. The budget
+    comes from the expected output duration and grows with the live speed,
+    so slow but steady encodes of long inputs are never cut off.
+    """
+
+    def __init__(self, now: float, duration_sec: Optional[float]):
+        self.duration_sec = duration_sec
+        self.last_advance = now
+        self.position: tuple = ()
+        self.deadline = (
+            now + _WATCHDOG_BASE_SEC + duration_sec / _WATCHDOG_MIN_SPEED
+            if duration_sec else None
+        )
+
+    def observe(self, block: dict[str, str], now: float) -> None:
+        position = (block.get("out_time_us"), block.get("frame"), block.get("total_size"))
+        if position != self.position:
+            self.position = position
+            self.last_advance = now
+        speed = _parse_number(block.get("speed"))
+        if self.deadline is not None and speed > 0:
+            # Output running past the expected duration earns no more time
+            remaining = self.duration_sec - _parse_number(block.get("out_time_us")) / 1_000_000
+            if remaining > 0:
+                self.deadline = max(self.deadline, now + _WATCHDOG_BASE_SEC + 2 * remaining / speed)
+
+    def stalled(self, now: float) -> bool:
+        return now - self.last_advance >= _STALL_SEC
+
+    def expired(self, now: float) -> bool:
+        return self.deadline is not None and now >= self.deadline
+
+
+def configure_ffmpeg_processes(max_processes: int) -> None:
+    """Cap the ffmpeg processes running at once (applies to new runs)."""
+    global _MAX_PROCESSES, _SEMAPHORE
+    _MAX_PROCESSES = max(1, int(max_processes))
+    _SEMAPHORE = None
+
+
+def _get_loop() -> asyncio.AbstractEventLoop:
+    """The supervisor loop, started on first use and again after a fork."""
+    global _LOOP, _LOOP_PID, _SEMAPHORE, _ACTIVE
+    with _LOOP_LOCK:
+        # A forked child (e.g. an RQ work horse) inherits the loop object but
+        # not the thread running it
+        if _LOOP is None or _LOOP_PID != os.getpid():
+            loop = asyncio.new_event_loop()
+            thread = threading.Thread(target=loop.run_forever, name="ffmpeg-supervisor", daemon=True)
+            thread.start()
+            _LOOP, _LOOP_PID = loop, os.getpid()
+            _SEMAPHORE = None
+            _ACTIVE = set()
+        return _LOOP
+
+
+def _get_semaphore() -> asyncio.Semaphore:
+    global _SEMAPHORE
+    if _SEMAPHORE is None:
+        _SEMAPHORE = asyncio.Semaphore(_MAX_PROCESSES)
+    return _SEMAPHORE
+
+
+async def _stream_stderr(stream: asyncio.StreamReader, ring: StderrRing) -> None:
+    while True:
+        chunk = await stream.read(4096)
+        if not chunk:
+            break
+        ring.feed(chunk)
+
+
+async def _stream_progress(
+    stream: asyncio.StreamReader,
+    report: Optional[ProgressReport],
+    run_idx: int,
+    watchdog: _Watchdog
+) -> dict[str, str]:
+    """Forward each -progress block to report; returns the last one."""
+    loop = asyncio.get_running_loop()
+    block: dict[str, str] = {}
+    last: dict[str, str] = {}
+    while True:
+        line = await stream.readline()
+        if not line:
+            break
+        key, _, value = line.decode('utf-8', errors='replace').strip().partition("=")
+        block[key] = value
+        if key == "progress":  # last key of every block
+            watchdog.observe(block, loop.time())
+            if report:
+                report(run_idx, block)
+            last, block = block, {}
+    return last
+
+
+class _Child:
+    """
+    A running ffmpeg process. Where wait4 exists it is reaped by a thread
+    with wait4 (asyncio's own reaping drops the rusage); exited resolves to
+    its ResourceUsage once it is gone.
+    """
+
+    def __init__(self, kill: Callable[[], None], stdout, stderr, exited: asyncio.Future):
+        self.kill = kill
+        self.stdout = stdout
+        self.stderr = stderr
+        self.exited = exited
+        self.returncode: Optional[int] = None
+
+
+async def _pipe_reader(pipe) -> asyncio.StreamReader:
+    loop = asyncio.get_running_loop()
+    reader = asyncio.StreamReader()
+    await loop.connect_read_pipe(lambda: asyncio.StreamReaderProtocol(reader), pipe)
+    return reader
+
+
+async def _spawn(cmd: list[str]) -> _Child:
+    loop = asyncio.get_running_loop()
+    started = time.monotonic()
+    if not HAS_WAIT4:
+        process = await asyncio.create_subprocess_exec(
+            *cmd, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=subprocess.PIPE
+        )
+
+        async def _wait() -> ResourceUsage:
+            child.returncode = await process.wait()
+            return ResourceUsage(processes=1, wall_sec=time.monotonic() - started)
+
+        child = _Child(process.kill, process.stdout, process.stderr, loop.create_future())
+        child.exited = asyncio.ensure_future(_wait())
+        return child
+
+    process = subprocess.Popen(cmd, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+
+    def _kill() -> None:
+        # Not Popen.kill(): its poll() could reap the process before wait4
+        if process.returncode is None:
+            try:
+                os.kill(process.pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+
+    def _reap() -> None:
+        usage = reap(process, started)
+        loop.call_soon_threadsafe(_exited, usage)
+
+    def _exited(usage: ResourceUsage) -> None:
+        child.returncode = process.returncode
+        if not child.exited.done():
+            child.exited.set_result(usage)
+
+    child = _Child(
+        _kill, await _pipe_reader(process.stdout), await _pipe_reader(process.stderr), loop.create_future()
+    )
+    threading.Thread(target=_reap, name="ffmpeg-reaper", daemon=True).start()
+    return child
+
+
+async def _supervise(
+    cmd: list[str],
+    cancel_check: Optional[Callable[[], bool]],
+    duration_sec: Optional[float],
+    cancel_event: Optional[asyncio.Event] = None,
+    report: Optional[ProgressReport] = None,
+    run_idx: int = 0
+) -> FFmpegRun:
+    cancel_event = cancel_event or asyncio.Event()
+    # Machine-readable progress on stdout instead of stats lines on stderr
+    cmd = [cmd[0], '-hide_banner', '-nostats', '-progress', 'pipe:1', *cmd[1:]]
+    async with _get_semaphore():
+        if cancel_event.is_set() or (cancel_check and cancel_check()):
+            return FFmpegRun(None, "", cancelled=True)
+        try:
+            process = await _spawn(cmd)
+        except OSError as e:
+            return FFmpegRun(None, "", error=str(e))
+
+        _ACTIVE.add(cancel_event)
+        loop = asyncio.get_running_loop()
+        watchdog = _Watchdog(loop.time(), duration_sec)
+        ring = StderrRing()
+        readers = asyncio.gather(
+            _stream_stderr(process.stderr, ring),
+            _stream_progress(process.stdout, report, run_idx, watchdog)
+        )
+        waiter = process.exited
+        cancel_waiter = asyncio.ensure_future(cancel_event.wait())
+        cancelled = stalled = timed_out = False
+        try:
+            while not waiter.done():
+                await asyncio.wait(
+                    {waiter, cancel_waiter},
+                    timeout=_CANCEL_POLL_SEC if cancel_check else _WATCHDOG_POLL_SEC,
+                    return_when=asyncio.FIRST_COMPLETED
+                )
+                if waiter.done():
+                    break
+                now = loop.time()
+                if cancel_event.is_set() or (cancel_check and cancel_check()):
+                    cancelled = True
+                elif watchdog.stalled(now):
+                    stalled = True
+                elif watchdog.expired(now):
+                    timed_out = True
+                else:
+                    continue
+                # The output is discarded anyway, so skip ffmpeg's graceful
+                # SIGTERM shutdown (it flushes the encoder first)
+                process.kill()
+                await asyncio.shield(waiter)
+        finally:
+            _ACTIVE.discard(cancel_event)
+            cancel_waiter.cancel()
+            if not waiter.done():
+                process.kill()
+                await asyncio.shield(waiter)
+            _, last_progress = await readers
+
+    return FFmpegRun(
+        process.returncode,
+        "\n".join(ring.lines()),
+        cancelled=cancelled,
+        stalled=stalled,
+        timed_out=timed_out,
+        out_time_ms=int(_parse_number(last_progress.get("out_time_us")) / 1000),
+        frames=int(_parse_number(last_progress.get("frame"))),
+        usage=waiter.result()
+    )
+
+
+def cancel_all() -> None:
+    """Kill every ffmpeg process this worker is running right now."""
+    loop = _LOOP
+    if loop is None or _LOOP_PID != os.getpid():
+        return
+
+    def _cancel() -> None:
+        for event in list(_ACTIVE):
+            event.set()
+
+    loop.call_soon_threadsafe(_cancel)
+
+
+def _run_on_loop(make_coro: Callable[[Optional[ProgressReport]], object], tracked: Optional[set[int]] = None):
+    """
+    Run the coroutine built by make_coro on the supervisor loop and wait for
+    it, relaying progress blocks of the tracked runs (all when None) to the
+    current progress scope on this thread.
+    """
+    loop = _get_loop()
+    scope = _PROGRESS_SCOPE.get()
+    if scope is None:
+        return asyncio.run_coroutine_threadsafe(make_coro(None), loop).result()
+
+    events: queue.SimpleQueue = queue.SimpleQueue()
+    future = asyncio.run_coroutine_threadsafe(
+        make_coro(lambda idx, block: events.put((idx, block))), loop
+    )
+    future.add_done_callback(lambda _: events.put(None))
+    latest: dict[int, dict[str, str]] = {}
+    while True:
+        event = events.get()
+        if event is None:
+            break
+        idx, block = event
+        if tracked is not None and idx not in tracked:
+            continue
+        latest[idx] = block
+        # Concurrent runs (segment chunks) add up to the whole output
+        scope.emit(
+            sum(_parse_number(b.get("out_time_us")) for b in latest.values()) / 1_000_000,
+            int(sum(_parse_number(b.get("frame")) for b in latest.values())),
+            sum(_parse_number(b.get("fps")) for b in latest.values()),
+            sum(_parse_number(b.get("speed")) for b in latest.values())
+        )
+    return future.result()
+
+
+def _expected_duration(duration_sec: Optional[float]) -> Optional[float]:
+    """duration_sec, else the duration of the current progress scope."""
+    if duration_sec:
+        return duration_sec
+    scope = _PROGRESS_SCOPE.get()
+    return scope.duration_sec if scope else None
+
+
+def run_ffmpeg_process(
+    cmd: list[str],
+    cancel_check: Optional[Callable[[], bool]] = None,
+    duration_sec: Optional[float] = None
+) -> FFmpegRun:
+    """
+    Run cmd under the supervisor and block until it exits. duration_sec is
+    the expected output length for the watchdog's wall budget (default: the
+    progress scope's); without one only stalls are detected. Its resource
+    usage is added to the open usage scopes.
+    """
+    duration_sec = _expected_duration(duration_sec)
+    try:
+        run = _run_on_loop(lambda report: _supervise(cmd, cancel_check, duration_sec, report=report))
+    except Exception as e:
+        return FFmpegRun(None, "", error=str(e))
+    record_usage(run.usage)
+    return run
+
+
+def _as_paths(outputs: Union[Path, list[Path]]) -> list[Path]:
+    return [outputs] if isinstance(outputs, Path) else list(outputs)
+
+
+def run_result(run: FFmpegRun, outputs: Union[Path, list[Path]]) -> tuple[bool, str]:
+    """
+    (success, error_message) for a finished run: success needs exit code 0
+    and every output non-empty. Outputs are removed on failure. The error
+    message is the end of ffmpeg's stderr (see classify_failure).
+    """
+    outputs = _as_paths(outputs)
+    missing = [path for path in outputs if not (path.exists() and path.stat().st_size > 0)]
+    if run.ok and not missing:
+        return True, ""
+    for path in outputs:
+        path.unlink(missing_ok=True)
+    if run.cancelled:
+        return False, "Cancelled by user"
+    if run.stalled:
+        return False, f"Stalled: no progress for {_STALL_SEC:.0f}s"
+    if run.timed_out:
+        return False, "Timed out: over the watchdog budget for its duration"
+    if run.error:
+        return False, run.error
+    if run.returncode == 0:
+        return False, f"missing output {missing[0].name}"
+    return False, "\n".join(run.stderr.splitlines()[-_ERROR_LINES:]) or "Unknown error"
+
+
+def run_ffmpeg(
+    cmd: list[str],
+    outputs: Union[Path, list[Path]],
+    cancel_check: Optional[Callable[[], bool]] = None,
+    duration_sec: Optional[float] = None
+) -> tuple[bool, str]:
+    """Run ffmpeg writing outputs; removes partial outputs on failure."""
+    return run_result(run_ffmpeg_process(cmd, cancel_check, duration_sec), outputs)
+
+
+async def _supervise_all(
+    runs: list[tuple[list[str], list[Path]]],
+    cancel_check: Optional[Callable[[], bool]],
+    max_parallel: Optional[int],
+    duration_sec: Optional[float],
+    report: Optional[ProgressReport]
+) -> list[FFmpegRun]:
+    limit = asyncio.Semaphore(max_parallel or len(runs))
+    events = [asyncio.Event() for _ in runs]
+
+    async def one(idx: int, cmd: list[str]) -> FFmpegRun:
+        async with limit:
+            run = await _supervise(cmd, cancel_check, duration_sec, events[idx], report, idx)
+        if not run.ok:
+            for event in events:
+                event.set()  # stop the siblings; their output is useless now
+        return run
+
+    return await asyncio.gather(*(one(idx, cmd) for idx, (cmd, _) in enumerate(runs)))
+
+
+def run_ffmpeg_all(
+    runs: list[tuple[list[str], Union[Path, list[Path]]]],
+    cancel_check: Optional[Callable[[], bool]] = None,
+    max_parallel: Optional[int] = None,
+    progress_runs: Optional[set[int]] = None
+) -> list[tuple[bool, str]]:
+    """
+    Run several ffmpeg commands concurrently (at most max_parallel at once)
+    and return each one's (success, error_message). The first failure
+    cancels the rest, which report "Cancelled by user". Progress is the sum
+    over progress_runs (indexes into runs; all by default), for runs that
+    each produce one piece of the output.
+    """
+    runs = [(cmd, _as_paths(outputs)) for cmd, outputs in runs]
+    duration_sec = _expected_duration(None)
+    try:
+        results = _run_on_loop(
+            lambda report: _supervise_all(runs, cancel_check, max_parallel, duration_sec, report),
+            progress_runs
+        )
+    except Exception as e:
+        results = [FFmpegRun(None, "", error=str(e)) for _ in runs]
+    for run in results:
+        record_usage(run.usage)
+    return [run_result(run, outputs) for run, (_, outputs) in zip(results, runs)]
@@ -0,0 +1,347 @@
+"""
+Media Probe Module
+
+Single-call ffprobe wrapper shared by the concat and UGC processors,
+with an in-process memo and a persistent SQLite cache.
+"""
+
+import contextvars
+import json
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass, fields
+from pathlib import Path
+from typing import Any, Callable, Optional
+
+from resource_usage import ResourceUsage, run_measured, usage_scope
+
+# Upper bound on memoized probe results kept per process
+_PROBE_CACHE_MAX_ENTRIES = 4096
+
+# Concurrent ffprobe processes used by probe_many()
+DEFAULT_PROBE_WORKERS = min(16, (os.cpu_count() or 4) * 2)
+
+_PROBE_CACHE: dict[tuple[str, int, int], "MediaInfo"] = {}
+_PROBE_CACHE_LOCK = threading.Lock()
+
+# Root for on-disk caches shared by every process on this machine
+_CACHE_DIR = Path(os.getenv("RECLIP_CACHE_DIR", Path.home() / ".cache" / "reclip"))
+
+# Bump when MediaInfo changes shape so stale rows are ignored
+_DISK_CACHE_TABLE = "probe_cache_v2"
+# Rows not re-probed for this long are pruned
+_DISK_CACHE_MAX_AGE_SEC = 30 * 24 * 3600
+_DISK_CACHE_PRUNED_PID: Optional[int] = None
+
+
+@dataclass
+class MediaInfo:
+    """Stream and container metadata gathered from one ffprobe call."""
+    format_name: str = ""
+    duration_ms: int = 0
+    bit_rate: int = 0
+    # First video stream
+    has_video: bool = False
+    width: int = 0
+    height: int = 0
+    fps: float = 0.0
+    frame_rate: str = ""  # raw rational, e.g. "30000/1001"
+    video_codec: str = ""
+    video_profile: str = ""
+    video_level: int = 0  # e.g. 40 for H.264 level 4.0
+    video_frames: int = 0  # container frame count, 0 if not stored
+    pix_fmt: str = ""
+    video_time_base: str = ""
+    video_duration_ms: int = 0
+    # First audio stream
+    has_audio: bool = False
+    audio_codec: str = ""
+    audio_profile: str = ""
+    audio_channels: int = 0
+    audio_layout: str = ""
+    sample_rate: int = 0
+    audio_duration_ms: int = 0
+
+    @property
+    def is_decodable(self) -> bool:
+        return self.has_video or self.has_audio
+
+    def to_dict(self) -> dict[str, Any]:
+        return asdict(self)
+
+    @classmethod
+    def from_dict(cls, data: dict[str, Any]) -> "MediaInfo":
+        known = {f.name for f in fields(cls)}
+        return cls(**{k: v for k, v in data.items() if k in known})
+
+
+def _parse_rate(value: Optional[str]) -> float:
+    """Convert an ffprobe rational ("30000/1001") to a float."""
+    try:
+        num, _, den = (value or "").partition("/")
+        num_f = float(num)
+        den_f = float(den) if den else 1.0
+        if den_f == 0:
+            return 0.0
+        return num_f / den_f
+    except ValueError:
+        return 0.0
+
+
+def _parse_ms(value: Optional[str]) -> int:
+    try:
+        return int(float(value) * 1000)
+    except (TypeError, ValueError):
+        return 0
+
+
+def _parse_int(value: Any) -> int:
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return 0
+
+
+def parse_ffprobe_output(data: dict[str, Any]) -> MediaInfo:
+    """Build a MediaInfo from `ffprobe -show_streams -show_format` JSON."""
+    fmt = data.get("format") or {}
+    info = MediaInfo(
+        format_name=fmt.get("format_name") or "",
+        duration_ms=_parse_ms(fmt.get("duration")),
+        bit_rate=_parse_int(fmt.get("bit_rate")),
+    )
+
+    for stream in data.get("streams") or []:
+        codec_type = stream.get("codec_type")
+        if codec_type == "video" and not info.has_video:
+            # Skip cover art / thumbnails attached to audio files
+            if (stream.get("disposition") or {}).get("attached_pic"):
+                continue
+            frame_rate = stream.get("avg_frame_rate") or ""
+            if _parse_rate(frame_rate) <= 0:
+                frame_rate = stream.get("r_frame_rate") or ""
+            info.has_video = True
+            info.width = _parse_int(stream.get("width"))
+            info.height = _parse_int(stream.get("height"))
+            info.frame_rate = frame_rate
+            info.fps = _parse_rate(frame_rate)
+            info.video_codec = stream.get("codec_name") or ""
+            info.video_profile = stream.get("profile") or ""
+            info.video_level = max(0, _parse_int(stream.get("level")))
+            info.video_frames = _parse_int(stream.get("nb_frames"))
+            info.pix_fmt = stream.get("pix_fmt") or ""
+            info.video_time_base = stream.get("time_base") or ""
+            info.video_duration_ms = _parse_ms(stream.get("duration"))
+        elif codec_type == "audio" and not info.has_audio:
+            info.has_audio = True
+            info.audio_codec = stream.get("codec_name") or ""
+            info.audio_profile = stream.get("profile") or ""
+            info.audio_channels = _parse_int(stream.get("channels"))
+            info.audio_layout = stream.get("channel_layout") or ""
+            info.sample_rate = _parse_int(stream.get("sample_rate"))
+            info.audio_duration_ms = _parse_ms(stream.get("duration"))
+
+    if info.duration_ms <= 0:
+        info.duration_ms = max(info.video_duration_ms, info.audio_duration_ms)
+
+    return info
+
+
+def configure_cache_dir(path: Path) -> None:
+    """Set the directory holding on-disk caches (probe cache, etc.)."""
+    global _CACHE_DIR
+    _CACHE_DIR = Path(path)
+
+
+def get_cache_dir() -> Path:
+    return _CACHE_DIR
+
+
+def _cache_key(file_path: Path, stat: os.stat_result) -> tuple[str, int, int]:
+    return str(file_path.resolve()), stat.st_size, stat.st_mtime_ns
+
+
+def _remember(key: tuple[str, int, int], info: MediaInfo) -> None:
+    with _PROBE_CACHE_LOCK:
+        if len(_PROBE_CACHE) >= _PROBE_CACHE_MAX_ENTRIES:
+            # Drop the oldest entry (dicts keep insertion order)
+            _PROBE_CACHE.pop(next(iter(_PROBE_CACHE)))
+        _PROBE_CACHE[key] = info
+
+
+def _open_disk_cache() -> sqlite3.Connection:
+    """
+    Open the shared SQLite probe cache.
+    A fresh connection per call keeps this safe across threads and across
+    the forked RQ work horses; WAL lets readers and a writer run together.
+    """
+    global _DISK_CACHE_PRUNED_PID
+    _CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(str(_CACHE_DIR / "probe_cache.sqlite3"), timeout=30)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute(
+        f"CREATE TABLE IF NOT EXISTS {_DISK_CACHE_TABLE} ("
+        "dev INTEGER, ino INTEGER, size INTEGER, mtime_ns INTEGER, "
+        "info TEXT NOT NULL, probed_at REAL NOT NULL, "
+        "PRIMARY KEY (dev, ino, size, mtime_ns))"
+    )
+    if _DISK_CACHE_PRUNED_PID != os.getpid():
+        _DISK_CACHE_PRUNED_PID = os.getpid()
+        with conn:
+            conn.execute(
+                f"DELETE FROM {_DISK_CACHE_TABLE} WHERE probed_at < ?",
+                (time.time() - _DISK_CACHE_MAX_AGE_SEC,)
+            )
+    return conn
+
+
+def _disk_key(stat: os.stat_result) -> tuple[int, int, int, int]:
+    # Keyed by file identity rather than path, so hard-linked staged copies
+    # of an upload share one entry.
+    return stat.st_dev, stat.st_ino, stat.st_size, stat.st_mtime_ns
+
+
+def _disk_lookup(stat: os.stat_result) -> Optional[MediaInfo]:
+    try:
+        conn = _open_disk_cache()
+        try:
+            row = conn.execute(
+                f"SELECT info FROM {_DISK_CACHE_TABLE} "
+                "WHERE dev = ? AND ino = ? AND size = ? AND mtime_ns = ?",
+                _disk_key(stat)
+            ).fetchone()
+        finally:
+            conn.close()
+        if row is None:
+            return None
+        return MediaInfo.from_dict(json.loads(row[0]))
+    except (OSError, sqlite3.Error, ValueError, TypeError):
+        return None
+
+
+def _disk_store(stat: os.stat_result, info: MediaInfo) -> None:
+    try:
+        conn = _open_disk_cache()
+        try:
+            with conn:
+                conn.execute(
+                    f"INSERT OR REPLACE INTO {_DISK_CACHE_TABLE} "
+                    "(dev, ino, size, mtime_ns, info, probed_at) VALUES (?, ?, ?, ?, ?, ?)",
+                    (*_disk_key(stat), json.dumps(info.to_dict()), time.time())
+                )
+        finally:
+            conn.close()
+    except (OSError, sqlite3.Error):
+        pass
+
+
+def _run_ffprobe(file_path: Path) -> Optional[MediaInfo]:
+    cmd = [
+        'ffprobe', '-v', 'error',
+        '-show_streams', '-show_format',
+        '-of', 'json',
+        str(file_path)
+    ]
+    try:
+        returncode, stdout = run_measured(cmd, timeout=30)
+    except Exception:
+        return None
+    if returncode != 0 or not stdout:
+        return None
+    try:
+        data = json.loads(stdout)
+    except ValueError:
+        return None
+    return parse_ffprobe_output(data)
+
+
+def probe_media(file_path: Path) -> Optional[MediaInfo]:
+    """
+    Probe a media file with a single ffprobe call.
+    Results are memoized per (path, size, mtime) in memory and per file
+    identity in the on-disk cache; returns None if the file cannot be probed.
+    """
+    file_path = Path(file_path)
+    try:
+        stat = file_path.stat()
+    except OSError:
+        return None
+    key = _cache_key(file_path, stat)
+
+    with _PROBE_CACHE_LOCK:
+        cached = _PROBE_CACHE.get(key)
+    if cached is not None:
+        return cached
+
+    info = _disk_lookup(stat)
+    if info is None:
+        info = _run_ffprobe(file_path)
+        if info is None:
+            return None
+        _disk_store(stat, info)
+
+    _remember(key, info)
+    return info
+
+
+def probe_many(
+    file_paths: list[Path],
+    max_workers: Optional[int] = None
+) -> list[Optional[MediaInfo]]:
+    """
+    Probe many files concurrently on a bounded thread pool.
+    Returns results in the same order as file_paths.
+    """
+    paths = [Path(p) for p in file_paths]
+    if not paths:
+        return []
+
+    workers = max(1, min(max_workers or DEFAULT_PROBE_WORKERS, len(paths)))
+    if workers == 1:
+        return [probe_media(p) for p in paths]
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="probe") as pool:
+        # Each probe runs in a copy of the caller's context so its ffprobe
+        # is counted in the caller's usage scopes
+        futures = [pool.submit(contextvars.copy_context().run, probe_media, p) for p in paths]
+        return [future.result() for future in futures]
+
+
+def probe_batch(
+    file_paths: list[Path],
+    log_callback: Optional[Callable[[str], None]] = None
+) -> ResourceUsage:
+    """
+    Characterise a job's inputs up front with probe_many, so its processors
+    hit the probe cache instead of probing one file at a time. Logs how
+    long it took and returns the ffprobe usage.
+    """
+    started = time.monotonic()
+    with usage_scope() as usage:
+        infos = probe_many(file_paths)
+    if log_callback:
+        unreadable = sum(1 for info in infos if info is None)
+        message = f"Probed {len(infos)} inputs in {time.monotonic() - started:.1f}s"
+        if unreadable:
+            message += f" ({unreadable} unreadable)"
+        log_callback(message)
+    return usage
+
+
+def remember_media_info(file_path: Path, info: MediaInfo) -> None:
+    """Seed the probe cache with metadata obtained elsewhere (e.g. at upload)."""
+    file_path = Path(file_path)
+    try:
+        stat = file_path.stat()
+    except OSError:
+        return
+    _remember(_cache_key(file_path, stat), info)
+
+
+def clear_probe_cache() -> None:
+    """Forget all in-memory probe results (the on-disk cache is kept)."""
+    with _PROBE_CACHE_LOCK:
+        _PROBE_CACHE.clear()
@@ -0,0 +1,185 @@
+"""
+Mezzanine Cache Module
+
+Optional cache of concat inputs normalised to 30fps yuv420p at an even size
+(source audio kept as is), keyed by content hash plus the normalisation
+parameters and shared by every job on the machine. Re-rendering the same
+inputs then decodes the light intermediate instead of the original, and the
+concat graph's normalisation filters have nothing left to do. Entries are
+evicted least recently used first once the cache exceeds its disk budget.
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Optional
+
+from ffmpeg_runner import run_ffmpeg
+from media_probe import get_cache_dir, probe_media
+
+# Bump when the normalisation changes so old entries stop matching
+_MEZZANINE_VERSION = 3
+# Applied to every entry; the concat graphs start with the same chain
+MEZZANINE_VIDEO_FILTER = "fps=30,format=yuv420p,scale=trunc(iw/2)*2:trunc(ih/2)*2"
+# Near-lossless (x264 CRF 12, about 52 dB PSNR against CRF 0 on phone
+# footage), well above any deliverable CRF, so an entry serves every job.
+# Lossless CRF 0 was about 2.6x larger and twice as slow to decode again.
+MEZZANINE_VIDEO_ARGS = ['-c:v', 'libx264', '-preset', 'veryfast', '-crf', '12']
+
+_ENABLED = os.getenv("RECLIP_MEZZANINE", "0").lower() in ("1", "true", "yes", "on")
+# Disk budget for the whole mezzanine directory
+_MAX_BYTES = int(float(os.getenv("RECLIP_MEZZANINE_MAX_GB", "20") or 20) * 1024 ** 3)
+# Entries used this recently are never evicted; another job may be reading them
+_EVICT_GRACE_SEC = 15 * 60
+# Temp files left by crashed workers are removed after this long
+_STALE_TEMP_SEC = 24 * 3600
+
+_CONTENT_HASHES: dict[tuple[str, int, int], str] = {}
+_CONTENT_HASHES_LOCK = threading.Lock()
+
+
+def configure_mezzanine(enabled: bool, max_bytes: Optional[int] = None) -> None:
+    """Turn the mezzanine cache on or off and optionally set its disk budget."""
+    global _ENABLED, _MAX_BYTES
+    _ENABLED = bool(enabled)
+    if max_bytes is not None:
+        _MAX_BYTES = int(max_bytes)
+
+
+def mezzanine_enabled() -> bool:
+    return _ENABLED
+
+
+def _mezzanine_dir() -> Path:
+    return get_cache_dir() / "mezzanine"
+
+
+def _content_hash(file_path: Path) -> str:
+    """SHA-1 of the file's bytes, memoized per (path, size, mtime)."""
+    stat = file_path.stat()
+    key = (str(file_path.resolve()), stat.st_size, stat.st_mtime_ns)
+    with _CONTENT_HASHES_LOCK:
+        digest = _CONTENT_HASHES.get(key)
+    if digest is None:
+        hasher = hashlib.sha1()
+        with open(file_path, "rb") as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                hasher.update(chunk)
+        digest = hasher.hexdigest()
+        with _CONTENT_HASHES_LOCK:
+            _CONTENT_HASHES[key] = digest
+    return digest
+
+
+def evict_lru(
+    cache_dir: Path,
+    pattern: str,
+    max_bytes: int,
+    keep: Optional[Path] = None
+) -> int:
+    """
+    Delete the least recently used files matching pattern in cache_dir until
+    they fit max_bytes. Entries used within the grace period (and keep) are
+    never removed; temp files left by crashed workers are. Returns the
+    number of bytes freed.
+    """
+    now = time.time()
+    entries = []
+    for path in cache_dir.glob(pattern):
+        try:
+            stat = path.stat()
+        except OSError:
+            continue
+        if ".tmp" in path.name:
+            if now - stat.st_mtime > _STALE_TEMP_SEC:
+                path.unlink(missing_ok=True)
+            continue
+        entries.append((stat.st_mtime, stat.st_size, path))
+
+    total = sum(size for _, size, _ in entries)
+    freed = 0
+    for mtime, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        if path == keep or now - mtime < _EVICT_GRACE_SEC:
+            continue
+        try:
+            path.unlink()
+        except FileNotFoundError:
+            pass  # evicted by another worker
+        except OSError:
+            continue
+        total -= size
+        freed += size
+    return freed
+
+
+def touch_cached(path: Path) -> bool:
+    """Mark a cache entry as recently used; False if it no longer exists."""
+    try:
+        os.utime(path)
+    except OSError:
+        return False
+    return True
+
+
+def evict_mezzanines(keep: Optional[Path] = None) -> int:
+    """Evict mezzanine entries down to the cache's disk budget (see evict_lru)."""
+    return evict_lru(_mezzanine_dir(), "*.mkv", _MAX_BYTES, keep)
+
+
+def get_mezzanine(
+    source: Path,
+    log_callback: Optional[Callable[[str], None]] = None,
+    cancel_check: Optional[Callable[[], bool]] = None
+) -> Optional[Path]:
+    """
+    Return source normalised with MEZZANINE_VIDEO_FILTER and encoded with
+    MEZZANINE_VIDEO_ARGS, from the cache or freshly made. Returns None when the cache
+    is off or the entry cannot be made, so the caller uses source directly.
+    """
+    if not _ENABLED:
+        return None
+    source = Path(source)
+    info = probe_media(source)
+    if info is None or not info.has_video:
+        return None
+
+    try:
+        digest = _content_hash(source)
+    except OSError:
+        return None
+    key_fields = [_MEZZANINE_VERSION, digest, MEZZANINE_VIDEO_FILTER, MEZZANINE_VIDEO_ARGS]
+    key = hashlib.sha1(json.dumps(key_fields).encode()).hexdigest()[:24]
+    cached = _mezzanine_dir() / f"{key}.mkv"
+
+    if touch_cached(cached):
+        if log_callback:
+            log_callback(f"  Using cached mezzanine for {source.name}")
+        return cached
+
+    if log_callback:
+        log_callback(f"  Normalising {source.name} into the mezzanine cache...")
+    cached.parent.mkdir(parents=True, exist_ok=True)
+    temp_path = cached.with_name(f"{cached.stem}.{os.getpid()}.tmp{cached.suffix}")
+    cmd = [
+        'ffmpeg', '-y',
+        '-i', str(source),
+        '-map', '0:v:0', '-map', '0:a:0?',
+        '-vf', MEZZANINE_VIDEO_FILTER,
+        *MEZZANINE_VIDEO_ARGS,
+        '-c:a', 'copy',
+        str(temp_path)
+    ]
+    success, error = run_ffmpeg(cmd, temp_path, cancel_check)
+    if not success:
+        if log_callback and error != "Cancelled by user":
+            log_callback(f"  Mezzanine encode failed, using the original: {error[-200:]}")
+        return None
+    os.replace(temp_path, cached)
+
+    evict_mezzanines(keep=cached)
+    return cached
@@ -6,18 +6,48 @@ Handles all FFmpeg operations for concatenating video pairs.
 
 import os
 import re
-import subprocess
+import shutil
 import tempfile
-import json
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from enum import Enum
 from pathlib import Path
 from typing import Callable, Optional
 
+from ffmpeg_capabilities import get_capabilities
+from ffmpeg_runner import (
+    UNRECOVERABLE_FAILURES,
+    EncodeProgress,
+    FailureCause,
+    classify_failure,
+    progress_scope,
+    run_ffmpeg,
+    run_ffmpeg_process,
+    run_result,
+)
+from media_probe import MediaInfo, probe_media
+from mezzanine import get_mezzanine, mezzanine_enabled
+from scratch import link_or_copy, scratch_space
+from segmented_encode import SegmentSource, encode_segmented_if_long, probe_keyframes
+
 # Video extensions to recognize
 VIDEO_EXTENSIONS = {'.mp4', '.mov', '.avi', '.mkv', '.wmv', '.flv', '.webm', '.m4v', '.mpg', '.mpeg', '.3gp'}
 
-_DRAWTEXT_AVAILABLE: Optional[bool] = None
+# ffprobe H.264 profile names -> libx264 -profile:v values
+X264_PROFILES = {
+    "Constrained Baseline": "baseline",
+    "Baseline": "baseline",
+    "Main": "main",
+    "High": "high",
+    "High 10": "high10",
+    "High 4:2:2": "high422",
+    "High 4:4:4 Predictive": "high444",
+}
+
+# Audio codecs that can be stream-copied into an MP4 output
+MP4_AUDIO_CODECS = {"aac", "mp3", "ac3", "eac3", "alac"}
+# Copied audio may run this far from its video before it is re-encoded
+_AUDIO_ALIGN_TOLERANCE_MS = 50
+
 _FONT_INDEX: Optional[dict[str, Path]] = None
 
 
@@ -69,6 +99,24 @@ class VideoMatch:
             return "Only in A"
 
 
+@dataclass
+class SequenceMatch:
+    """Videos sharing a basename across N folders, in timeline order."""
+    basename: str
+    files: list[Optional[Path]]  # one per folder; None where missing
+
+    @property
+    def is_complete(self) -> bool:
+        return all(file is not None for file in self.files)
+
+    @property
+    def status(self) -> str:
+        if self.is_complete:
+            return "Matched"
+        missing = sum(1 for file in self.files if file is None)
+        return f"Missing {missing} of {len(self.files)}"
+
+
 @dataclass
 class ProcessingResult:
     """Result of processing a single video pair."""
@@ -76,6 +124,68 @@ class ProcessingResult:
     success: bool
     used_fast_copy: bool
     error_message: Optional[str] = None
+    fast_copy_attempted: bool = False
+    fast_copy_reason: Optional[str] = None  # planner decision; None if fast copy was off
+    renditions: list[Path] = field(default_factory=list)  # extra variants written
+    failure_cause: Optional[FailureCause] = None  # classified ffmpeg error of a failed item
+
+
+@dataclass
+class ConcatRenderPlan:
+    """Re-encode filter graph chosen up front from probe data."""
+    width: int
+    height: int
+    with_audio: bool
+    filter_complex: str
+    map_args: list[str]
+    audio_codec: list[str]
+    notes: list[str]  # human-readable decisions for the log
+    extra_inputs: list[Path] = field(default_factory=list)  # overlay images, after the videos
+    # Same graph split per input, for segmented encoding of long inputs
+    segment_sources: list[SegmentSource] = field(default_factory=list)
+    segment_audio_args: Optional[list[str]] = None
+    # Video-only graph, for when the audio track is assembled by stream copy
+    video_filter_complex: str = ""
+
+
+@dataclass
+class OverlayLayer:
+    """How a text overlay is composited onto one input of the concat graph."""
+    drawtext: Optional[str] = None  # drawtext filter string, or
+    image: Optional[Path] = None  # transparent PNG at the input's size
+    duration: float = 0  # seconds; 0 = full length
+
+
+@dataclass
+class Rendition:
+    """
+    An extra variant of a job's output, encoded from the same decode and
+    composite as the primary output. Zero width/height keep the primary
+    size; crf None uses the job CRF.
+    """
+    name: str
+    width: int = 0
+    height: int = 0
+    crf: Optional[int] = None
+
+    def output_path(self, primary: Path) -> Path:
+        return primary.with_name(f"{primary.stem}_{self.name}{primary.suffix}")
+
+    def scale_filter(self) -> str:
+        if not self.width or not self.height:
+            return ""
+        return (
+            f"scale={self.width}:{self.height}:force_original_aspect_ratio=decrease,"
+            f"pad={self.width}:{self.height}:(ow-iw)/2:(oh-ih)/2,setsar=1"
+        )
+
+
+@dataclass
+class FastCopyPlan:
+    """Planner decision on whether a stream-copy concat will work."""
+    allowed: bool
+    reason: str  # short category, suitable for aggregating in summaries
+    detail: str = ""
 
 
 def natural_sort_key(s: str):
@@ -108,22 +218,8 @@ def _normalize_drawtext_color(value: str) -> str:
 
 def _check_drawtext_available() -> bool:
     """Return True if ffmpeg has drawtext support."""
-    global _DRAWTEXT_AVAILABLE
-    if _DRAWTEXT_AVAILABLE is not None:
-        return _DRAWTEXT_AVAILABLE
-
-    try:
-        result = subprocess.run(
-            ['ffmpeg', '-filters'],
-            capture_output=True,
-            text=True,
-            timeout=10
-        )
-        output = result.stdout or ""
-        _DRAWTEXT_AVAILABLE = "drawtext" in output
-    except Exception:
-        _DRAWTEXT_AVAILABLE = False
-    return _DRAWTEXT_AVAILABLE
+    capabilities = get_capabilities()
+    return bool(capabilities and "drawtext" in capabilities.filters)
 
 
 def _build_font_index() -> dict[str, Path]:
@@ -190,46 +286,27 @@ def _resolve_font_path(font_family: Optional[str], font_style: str) -> Optional[
 
 def get_video_dimensions(file_path: Path) -> tuple[int, int]:
     """Get video width and height using ffprobe."""
-    try:
-        cmd = [
-            'ffprobe', '-v', 'error',
-            '-select_streams', 'v:0',
-            '-show_entries', 'stream=width,height',
-            '-of', 'json',
-            str(file_path)
-        ]
-        result = subprocess.run(cmd, capture_output=True, text=True, timeout=30)
-        data = result.stdout
-        if not data:
-            return 1920, 1080
-        import json
-        info = json.loads(data)
-        stream = info['streams'][0]
-        return int(stream['width']), int(stream['height'])
-    except Exception:
-        return 1920, 1080
+    info = probe_media(file_path)
+    if info and info.width and info.height:
+        return info.width, info.height
+    return 1920, 1080
 
 
 def get_video_duration_ms(file_path: Path) -> int:
     """Get video duration in milliseconds using ffprobe."""
-    try:
-        cmd = [
-            'ffprobe', '-v', 'error',
-            '-show_entries', 'format=duration',
-            '-of', 'json',
-            str(file_path)
-        ]
-        result = subprocess.run(cmd, capture_output=True, text=True, timeout=30)
-        data = json.loads(result.stdout)
-        duration_sec = float(data['format']['duration'])
-        return int(duration_sec * 1000)
-    except Exception:
-        return 0
+    info = probe_media(file_path)
+    return info.duration_ms if info else 0
 
 
 def _duration_within_tolerance(actual_ms: int, expected_ms: int) -> bool:
-    if actual_ms <= 0 or expected_ms <= 0:
+    """
+    True if actual_ms is close to expected_ms. Unchecked (True) only when
+    the expected duration is unknown; a missing actual duration fails.
+    """
+    if expected_ms <= 0:
         return True
+    if actual_ms <= 0:
+        return False
     tolerance_ms = max(2000, int(expected_ms * 0.05))
     return abs(actual_ms - expected_ms) <= tolerance_ms
 
@@ -365,6 +442,172 @@ def _render_text_overlay_image(
     return True, ""
 
 
+# Keyframes after the overlay window tried as smart-render cut points
+_SMART_RENDER_CUT_CANDIDATES = 4
+
+
+def _annexb_first_slice_is_idr(data: bytes) -> bool:
+    """True if the first slice NAL in an Annex B H.264 sample is IDR (type 5)."""
+    pos = data.find(b"\x00\x00\x01")
+    while pos >= 0 and pos + 3 < len(data):
+        nal_type = data[pos + 3] & 0x1F
+        if nal_type in (1, 5):
+            return nal_type == 5
+        pos = data.find(b"\x00\x00\x01", pos + 3)
+    return False
+
+
+def _find_idr_cut(
+    input_video: Path,
+    keyframes: list[float],
+    visible_sec: float,
+    last_sec: float,
+    work_dir: Path,
+    cancel_check: Optional[Callable[[], bool]] = None
+) -> Optional[float]:
+    """
+    First keyframe in [visible_sec, last_sec] that is an IDR frame. ffprobe's
+    keyframe flag also marks open-GOP I-frames, whose leading B-frames
+    would be broken in a copy starting there.
+    """
+    sample = work_dir / "cut.h264"
+    candidates = [t for t in keyframes if visible_sec <= t <= last_sec]
+    for t in candidates[:_SMART_RENDER_CUT_CANDIDATES]:
+        cmd = [
+            'ffmpeg', '-y', '-ss', f"{t:.6f}", '-i', str(input_video),
+            '-map', '0:v:0',
+            '-c', 'copy',
+            '-frames:v', '1',
+            '-bsf:v', 'h264_mp4toannexb',
+            '-f', 'h264',
+            str(sample)
+        ]
+        success, _ = run_ffmpeg(cmd, sample, cancel_check)
+        if success and _annexb_first_slice_is_idr(sample.read_bytes()):
+            return t
+    return None
+
+
+def _smart_render_overlay(
+    input_video: Path,
+    output_path: Path,
+    filter_graph: str,
+    extra_inputs: list[str],
+    visible_sec: float,
+    crf: int,
+    log_callback: Optional[Callable[[str], None]] = None,
+    cancel_check: Optional[Callable[[], bool]] = None
+) -> Optional[tuple[bool, str]]:
+    """
+    Smart render for overlays visible only at the start: re-encode up to
+    the first IDR frame after visible_sec, stream-copy the rest, and join.
+    The head is encoded with the source's profile, level and pixel format,
+    and the joined file must have the source's frame count and duration.
+    filter_graph reads [0:v] and writes [vout]. Audio is copied untouched.
+    Returns None when the source is unsuitable or the attempt fails, so the
+    caller re-encodes the whole video instead.
+    """
+    if not visible_sec or visible_sec <= 0:
+        return None
+    info = probe_media(input_video)
+    if info is None or info.video_codec != "h264" or info.pix_fmt != "yuv420p":
+        return None
+    profile = X264_PROFILES.get(info.video_profile)
+    total_sec = (info.video_duration_ms or info.duration_ms) / 1000
+    keyframes = probe_keyframes(input_video)
+    # Not worth it unless a meaningful tail can be copied
+    if not profile or not info.video_level or not any(
+        visible_sec <= t <= total_sec - 1.0 for t in keyframes
+    ):
+        return None
+
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    with tempfile.TemporaryDirectory(prefix=".smart_", dir=output_path.parent) as tmpdir:
+        head = Path(tmpdir) / "head.mp4"
+        tail = Path(tmpdir) / "tail.mp4"
+        list_file = Path(tmpdir) / "parts.txt"
+
+        cut = _find_idr_cut(input_video, keyframes, visible_sec, total_sec - 1.0, Path(tmpdir), cancel_check)
+        if cut is None:
+            if cancel_check and cancel_check():
+                return False, "Cancelled by user"
+            if log_callback:
+                log_callback("  Smart render: no IDR frame to cut at, re-encoding the whole video")
+            return None
+        if log_callback:
+            log_callback(f"  Smart render: encoding first {cut:.2f}s, copying the remaining {total_sec - cut:.2f}s")
+
+        # Both parts carry their SPS/PPS in-band (repeat-headers for the
+        # head, mp4toannexb at the tail's IDR), so the copied tail decodes
+        # with its own parameters after the re-encoded head; the head's
+        # profile/level match the source so the file's avcC fits both
+        head_cmd = [
+            'ffmpeg', '-y', '-t', f"{cut:.6f}", '-i', str(input_video),
+            *extra_inputs,
+            '-filter_complex', filter_graph,
+            '-map', '[vout]',
+            '-an',
+            '-c:v', 'libx264',
+            '-preset', 'medium',
+            '-crf', str(crf),
+            '-profile:v', profile,
+            '-level:v', str(info.video_level),
+            '-pix_fmt', info.pix_fmt,
+            '-x264-params', 'repeat-headers=1',
+            '-fps_mode', 'passthrough',
+            str(head)
+        ]
+        success, error = run_ffmpeg(head_cmd, head, cancel_check)
+        if success:
+            tail_cmd = [
+                # Seeking to the exact keyframe time starts the copy on it
+                'ffmpeg', '-y', '-ss', f"{cut:.6f}", '-i', str(input_video),
+                '-map', '0:v:0',
+                '-c', 'copy',
+                '-bsf:v', 'h264_mp4toannexb',
+                str(tail)
+            ]
+            success, error = run_ffmpeg(tail_cmd, tail, cancel_check)
+        if success:
+            list_file.write_text(f"file '{head.name}'\nfile '{tail.name}'\n")
+            join_cmd = [
+                'ffmpeg', '-y',
+                '-f', 'concat', '-safe', '0', '-i', str(list_file),
+                '-i', str(input_video),
+                '-map', '0:v',
+                '-map', '1:a?',
+                '-c', 'copy',
+                '-movflags', '+faststart',
+                str(output_path)
+            ]
+            run = run_ffmpeg_process(join_cmd, cancel_check, total_sec)
+            success, error = run_result(run, output_path)
+            if success:
+                out_ms = run.out_time_ms
+                expected_ms = info.video_duration_ms or info.duration_ms
+                if not _duration_within_tolerance(out_ms, expected_ms):
+                    error = f"duration mismatch (expected ~{expected_ms/1000:.2f}s, got {out_ms/1000:.2f}s)"
+                elif info.video_frames and run.frames != info.video_frames:
+                    error = f"frame count mismatch (expected {info.video_frames}, got {run.frames})"
+                else:
+                    return True, ""
+                output_path.unlink(missing_ok=True)
+
+    if error == "Cancelled by user":
+        return False, error
+    if log_callback:
+        log_callback(f"  Smart render failed, re-encoding the whole video: {error[-200:]}")
+    return None
+
+
+def _copy_audio_args(input_video: Path) -> Optional[list[str]]:
+    """Audio pass for a segmented encode that keeps the input's audio as-is."""
+    info = probe_media(input_video)
+    if not info or not info.has_audio:
+        return None
+    return ['-i', str(input_video), '-map', '0:a:0', '-c:a', 'copy']
+
+
 def _apply_text_overlay_with_image(
     input_video: Path,
     output_path: Path,
@@ -384,6 +627,29 @@ def _apply_text_overlay_with_image(
         if overlay.duration and overlay.duration > 0:
             enable_clause = f":enable='between(t,0,{overlay.duration})'"
 
+        overlay_graph = f"[1:v]format=rgba[ov];[0:v][ov]overlay=x=0:y=0{enable_clause}[vout]"
+        result = _smart_render_overlay(
+            input_video, output_path, overlay_graph, ['-i', str(overlay_path)],
+            overlay.duration, crf, log_callback, cancel_check
+        )
+        if result is not None:
+            return result
+
+        result = encode_segmented_if_long(
+            [SegmentSource(
+                input_video,
+                overlay_graph,
+                ['-i', str(overlay_path)]
+            )],
+            output_path,
+            crf,
+            _copy_audio_args(input_video),
+            log_callback,
+            cancel_check
+        )
+        if result is not None:
+            return result
+
         filter_str = (
             f"[1:v]format=rgba[ov];"
             f"[0:v][ov]overlay=x=0:y=0{enable_clause}[v]"
@@ -399,13 +665,13 @@ def _apply_text_overlay_with_image(
             '-c:v', 'libx264',
             '-preset', 'medium',
             '-crf', str(crf),
-            '-c:a', 'copy',
             '-movflags', '+faststart',
+            '-c:a', 'copy',
             '-shortest',
             str(output_path)
         ]
 
-        return _run_ffmpeg_command(cmd, output_path, cancel_check)
+        return run_ffmpeg(cmd, output_path, cancel_check)
 
 
 def build_drawtext_filter(config: TextOverlayConfig) -> str:
@@ -435,41 +701,21 @@ def build_drawtext_filter(config: TextOverlayConfig) -> str:
 
 
 def check_ffmpeg_available() -> tuple[bool, str]:
-    """Check if FFmpeg is available in PATH."""
-    try:
-        result = subprocess.run(
-            ['ffmpeg', '-version'],
-            capture_output=True,
-            text=True,
-            timeout=10
-        )
-        if result.returncode == 0:
-            # Extract version from first line
-            version_line = result.stdout.split('\n')[0]
-            return True, version_line
-        return False, "FFmpeg returned non-zero exit code"
-    except FileNotFoundError:
-        return False, "FFmpeg not found in PATH"
-    except subprocess.TimeoutExpired:
-        return False, "FFmpeg check timed out"
-    except Exception as e:
-        return False, str(e)
+    """Check if FFmpeg is available in PATH (from the capability registry)."""
+    capabilities = get_capabilities()
+    if capabilities is None:
+        if shutil.which("ffmpeg") is None:
+            return False, "FFmpeg not found in PATH"
+        return False, "FFmpeg did not run"
+    if "libx264" not in capabilities.encoders:
+        return False, f"FFmpeg has no libx264 encoder ({capabilities.version})"
+    return True, capabilities.version
 
 
 def probe_has_audio(file_path: Path) -> bool:
     """Check if a video file has an audio stream."""
-    try:
-        cmd = [
-            'ffprobe', '-v', 'error',
-            '-select_streams', 'a:0',
-            '-show_entries', 'stream=codec_type',
-            '-of', 'csv=p=0',
-            str(file_path)
-        ]
-        result = subprocess.run(cmd, capture_output=True, text=True, timeout=30)
-        return 'audio' in result.stdout.lower()
-    except:
-        return False
+    info = probe_media(file_path)
+    return bool(info and info.has_audio)
 
 
 def scan_video_files(folder: Path) -> dict[str, Path]:
@@ -524,11 +770,93 @@ def get_match_counts(matches: list[VideoMatch]) -> tuple[int, int, int]:
     return matched, only_a, only_b
 
 
+def find_sequence_matches(folders: list[Path]) -> list[SequenceMatch]:
+    """
+    Match videos by basename across folders (given in timeline order).
+    Returns SequenceMatch objects sorted naturally by basename.
+    """
+    videos = [scan_video_files(folder) for folder in folders]
+    all_basenames = set().union(*(found.keys() for found in videos)) if videos else set()
+
+    matches = [
+        SequenceMatch(basename=basename, files=[found.get(basename) for found in videos])
+        for basename in all_basenames
+    ]
+    matches.sort(key=lambda m: natural_sort_key(m.basename))
+    return matches
+
+
+def get_sequence_counts(matches: list[SequenceMatch]) -> tuple[int, int]:
+    """Return (complete_count, incomplete_count)."""
+    complete = sum(1 for m in matches if m.is_complete)
+    return complete, len(matches) - complete
+
+
+def _fast_copy_mismatch(first: MediaInfo, other: MediaInfo) -> Optional[tuple[str, str]]:
+    """Return (reason, detail) for the first parameter that differs, else None."""
+    checks = [
+        ("video codec differs", first.video_codec, other.video_codec),
+        ("video profile differs", first.video_profile, other.video_profile),
+        ("resolution differs", f"{first.width}x{first.height}", f"{other.width}x{other.height}"),
+        ("pixel format differs", first.pix_fmt, other.pix_fmt),
+        ("timebase differs", first.video_time_base, other.video_time_base),
+        ("frame rate differs", first.frame_rate, other.frame_rate),
+        ("audio presence differs", first.has_audio, other.has_audio),
+    ]
+    if first.has_audio and other.has_audio:
+        checks.extend([
+            ("audio codec differs", first.audio_codec, other.audio_codec),
+            ("audio profile differs", first.audio_profile, other.audio_profile),
+            ("audio sample rate differs", first.sample_rate, other.sample_rate),
+            ("audio channels differ", first.audio_channels, other.audio_channels),
+        ])
+
+    for reason, a, b in checks:
+        if a != b:
+            return reason, f"{a} vs {b}"
+    return None
+
+
+def plan_fast_copy(files: list[Path]) -> FastCopyPlan:
+    """
+    Decide from probe data whether the concat demuxer with -c copy will
+    produce a valid output, so doomed attempts can be skipped.
+    """
+    infos = []
+    for file in files:
+        info = probe_media(file)
+        if info is None:
+            return FastCopyPlan(False, "probe failed", file.name)
+        if not info.has_video:
+            return FastCopyPlan(False, "no video stream", file.name)
+        infos.append(info)
+
+    first = infos[0]
+    for file, info in zip(files[1:], infos[1:]):
+        mismatch = _fast_copy_mismatch(first, info)
+        if mismatch:
+            reason, detail = mismatch
+            return FastCopyPlan(False, reason, f"{file.name}: {detail}")
+
+    return FastCopyPlan(True, "compatible streams")
+
+
 def try_fast_copy_concat(
     file1: Path,
     file2: Path,
     output: Path,
-    log_callback: Optional[Callable[[str], None]] = None
+    log_callback: Optional[Callable[[str], None]] = None,
+    faststart: bool = False
+) -> bool:
+    """Two-input try_fast_copy_concat_files."""
+    return try_fast_copy_concat_files([file1, file2], output, log_callback, faststart)
+
+
+def try_fast_copy_concat_files(
+    files: list[Path],
+    output: Path,
+    log_callback: Optional[Callable[[str], None]] = None,
+    faststart: bool = False
 ) -> bool:
     """
     Attempt fast copy concatenation using concat demuxer.
@@ -537,8 +865,8 @@ def try_fast_copy_concat(
     # Create temporary file list for concat demuxer
     with tempfile.NamedTemporaryFile(mode='w', suffix='.txt', delete=False) as f:
         # Need to escape single quotes in paths
-        f.write(f"file '{str(file1).replace(chr(39), chr(39) + chr(92) + chr(39) + chr(39))}'\n")
-        f.write(f"file '{str(file2).replace(chr(39), chr(39) + chr(92) + chr(39) + chr(39))}'\n")
+        for file in files:
+            f.write(f"file '{str(file).replace(chr(39), chr(39) + chr(92) + chr(39) + chr(39))}'\n")
         list_file = f.name
 
     try:
@@ -548,24 +876,22 @@ def try_fast_copy_concat(
             '-safe', '0',
             '-i', list_file,
             '-c', 'copy',
+            *(['-movflags', '+faststart'] if faststart else []),
             str(output)
         ]
 
         if log_callback:
             log_callback(f"  Trying fast copy: ffmpeg -f concat -c copy ...")
 
-        result = subprocess.run(
-            cmd,
-            capture_output=True,
-            text=True,
-            timeout=300
-        )
+        # Input durations come from the probe cache (filled by the planner)
+        # and the output duration from ffmpeg's final progress report, so
+        # a successful fast copy costs a single subprocess.
+        expected = sum(get_video_duration_ms(file) for file in files)
+        run = run_ffmpeg_process(cmd, duration_sec=expected / 1000)
+        success, error = run_result(run, output)
 
-        if result.returncode == 0 and output.exists() and output.stat().st_size > 0:
-            dur1 = get_video_duration_ms(file1)
-            dur2 = get_video_duration_ms(file2)
-            out_dur = get_video_duration_ms(output)
-            expected = dur1 + dur2
+        if success:
+            out_dur = run.out_time_ms
 
             if not _duration_within_tolerance(out_dur, expected):
                 if log_callback:
@@ -577,11 +903,8 @@ def try_fast_copy_concat(
 
             return True
         else:
-            if log_callback and result.stderr:
-                log_callback(f"  Fast copy failed: {result.stderr[:200]}")
-            # Clean up failed output
-            if output.exists():
-                output.unlink()
+            if log_callback:
+                log_callback(f"  Fast copy failed: {error[-200:]}")
             return False
 
     except Exception as e:
@@ -598,110 +921,125 @@ def try_fast_copy_concat(
             pass
 
 
-def _run_ffmpeg_concat(
-    file1: Path,
-    file2: Path,
+def split_outputs(
+    filter_complex: str,
+    map_args: list[str],
+    audio_codec: list[str],
+    targets: list[tuple[Path, int, str]],
+    faststart: bool = True
+) -> tuple[str, list[str]]:
+    """
+    Fan one graph out to several libx264 outputs in a single ffmpeg run.
+    map_args starts with the video label ('-map', '[outv]') followed by any
+    audio maps; targets are (path, crf, scale filter or "") per output.
+    Graph audio labels are duplicated with asplit; input streams such as
+    0:a? are simply mapped again. Returns the graph and output arguments.
+    """
+    video_label = map_args[1].strip("[]")
+    audio_maps = map_args[2:]
+    parts = [filter_complex]
+    video_labels = [f"[{video_label}]"]
+    audio_label_groups = [list(audio_maps)]
+
+    if len(targets) > 1:
+        count = len(targets)
+        video_labels = [f"[{video_label}_r{idx}]" for idx in range(count)]
+        parts.append(f"[{video_label}]split={count}{''.join(video_labels)}")
+        audio_label_groups = [[] for _ in range(count)]
+        for flag, spec in zip(audio_maps[::2], audio_maps[1::2]):
+            if spec.startswith("["):
+                label = spec.strip("[]")
+                labels = [f"[{label}_r{idx}]" for idx in range(count)]
+                parts.append(f"[{label}]asplit={count}{''.join(labels)}")
+                for group, split_label in zip(audio_label_groups, labels):
+                    group.extend([flag, split_label])
+            else:
+                for group in audio_label_groups:
+                    group.extend([flag, spec])
+
+    output_args = []
+    for idx, (path, crf, scale) in enumerate(targets):
+        label = video_labels[idx]
+        if scale:
+            scaled = f"[{video_label}_s{idx}]"
+            parts.append(f"{label}{scale}{scaled}")
+            label = scaled
+        output_args.extend([
+            '-map', label,
+            *audio_label_groups[idx],
+            '-c:v', 'libx264',
+            '-preset', 'medium',
+            '-crf', str(crf),
+            *audio_codec,
+            *(['-movflags', '+faststart'] if faststart else []),
+            str(path)
+        ])
+    return ";".join(parts), output_args
+
+
+def rendition_targets(
+    output: Path,
+    crf: int,
+    renditions: Optional[list[Rendition]] = None
+) -> list[tuple[Path, int, str]]:
+    """split_outputs targets for output plus each rendition beside it."""
+    targets = [(output, crf, "")]
+    for rendition in renditions or []:
+        rendition_crf = rendition.crf if rendition.crf is not None else crf
+        targets.append((rendition.output_path(output), rendition_crf, rendition.scale_filter()))
+    return targets
+
+
+def _run_ffmpeg_render(
+    inputs: list[Path],
     output: Path,
     filter_complex: str,
     map_args: list,
     audio_codec: list,
     crf: int,
     log_callback: Optional[Callable[[str], None]] = None,
-    cancel_check: Optional[Callable[[], bool]] = None
+    cancel_check: Optional[Callable[[], bool]] = None,
+    faststart: bool = True,
+    renditions: Optional[list[Rendition]] = None
 ) -> tuple[bool, str]:
-    """Helper to run FFmpeg with given filter. Returns (success, error)."""
-    cmd = [
-        'ffmpeg', '-y',
-        '-i', str(file1),
-        '-i', str(file2),
-        '-filter_complex', filter_complex,
-        *map_args,
-        '-c:v', 'libx264',
-        '-preset', 'medium',
-        '-crf', str(crf),
-        *audio_codec,
-        '-movflags', '+faststart',
-        str(output)
-    ]
-
-    try:
-        process = subprocess.Popen(
-            cmd,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            text=True
-        )
-
-        while True:
-            try:
-                stdout, stderr = process.communicate(timeout=1)
-                break
-            except subprocess.TimeoutExpired:
-                if cancel_check and cancel_check():
-                    process.terminate()
-                    try:
-                        process.wait(timeout=5)
-                    except:
-                        process.kill()
-                    if output.exists():
-                        output.unlink()
-                    return False, "Cancelled by user"
-
-        if process.returncode == 0 and output.exists() and output.stat().st_size > 0:
-            return True, ""
-        else:
-            error = stderr[-500:] if stderr else "Unknown error"
-            if output.exists():
-                output.unlink()
-            return False, error
+    """
+    Run one libx264 encode of a filter graph over any number of inputs,
+    writing output and any renditions from the same decode.
+    """
+    targets = rendition_targets(output, crf, renditions)
+    graph, output_args = split_outputs(filter_complex, map_args, audio_codec, targets, faststart)
+    cmd = ['ffmpeg', '-y']
+    for file in inputs:
+        cmd.extend(['-i', str(file)])
+    cmd.extend(['-filter_complex', graph, *output_args])
 
-    except Exception as e:
-        if output.exists():
-            output.unlink()
-        return False, str(e)
+    return run_ffmpeg(cmd, [path for path, _, _ in targets], cancel_check)
 
 
-def _run_ffmpeg_command(
-    cmd: list,
+def encode_renditions(
+    source: Path,
     output: Path,
+    renditions: list[Rendition],
+    crf: int,
+    log_callback: Optional[Callable[[str], None]] = None,
     cancel_check: Optional[Callable[[], bool]] = None
 ) -> tuple[bool, str]:
-    """Run a generic ffmpeg command with cancellation support."""
-    try:
-        process = subprocess.Popen(
-            cmd,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            text=True
-        )
-
-        while True:
-            try:
-                stdout, stderr = process.communicate(timeout=1)
-                break
-            except subprocess.TimeoutExpired:
-                if cancel_check and cancel_check():
-                    process.terminate()
-                    try:
-                        process.wait(timeout=5)
-                    except:
-                        process.kill()
-                    if output.exists():
-                        output.unlink()
-                    return False, "Cancelled by user"
-
-        if process.returncode == 0 and output.exists() and output.stat().st_size > 0:
-            return True, ""
-        else:
-            error = stderr[-500:] if stderr else "Unknown error"
-            if output.exists():
-                output.unlink()
-            return False, error
-
-    except Exception as e:
-        if output.exists():
-            output.unlink()
-        return False, str(e)
+    """
+    Encode the renditions of output from a finished source (usually output
+    itself) with one decode, copying its audio. Used by render paths that
+    cannot fan out inside their own encode, such as stream-copy concats.
+    """
+    if not renditions:
+        return True, ""
+    if log_callback:
+        names = ", ".join(rendition.name for rendition in renditions)
+        log_callback(f"  Encoding renditions from {source.name}: {names}")
+    targets = rendition_targets(output, crf, renditions)[1:]
+    graph, output_args = split_outputs(
+        "[0:v]null[rv]", ['-map', '[rv]', '-map', '0:a?'], ['-c:a', 'copy'], targets
+    )
+    cmd = ['ffmpeg', '-y', '-i', str(source), '-filter_complex', graph, *output_args]
+    return run_ffmpeg(cmd, [path for path, _, _ in targets], cancel_check)
 
 
 def apply_text_overlay(
@@ -725,6 +1063,24 @@ def apply_text_overlay(
         else:
             filter_str = build_drawtext_filter(overlay)
 
+            result = _smart_render_overlay(
+                input_video, output_path, f"[0:v]{filter_str}[vout]", [],
+                overlay.duration, crf, log_callback, cancel_check
+            )
+            if result is not None:
+                return result
+
+            result = encode_segmented_if_long(
+                [SegmentSource(input_video, f"[0:v]{filter_str}[vout]")],
+                output_path,
+                crf,
+                _copy_audio_args(input_video),
+                log_callback,
+                cancel_check
+            )
+            if result is not None:
+                return result
+
             cmd = [
                 'ffmpeg', '-y',
                 '-i', str(input_video),
@@ -732,14 +1088,14 @@ def apply_text_overlay(
                 '-c:v', 'libx264',
                 '-preset', 'medium',
                 '-crf', str(crf),
+                '-movflags', '+faststart',
                 '-c:a', 'copy',
                 '-map', '0:v:0',
                 '-map', '0:a?',
-                '-movflags', '+faststart',
                 str(output_path)
             ]
 
-            success, error = _run_ffmpeg_command(cmd, output_path, cancel_check)
+            success, error = run_ffmpeg(cmd, output_path, cancel_check)
             if not success and log_callback:
                 log_callback(f"  Overlay failed: {error[:300]}")
             return success, error
@@ -760,127 +1116,370 @@ def apply_text_overlay(
     return success, error
 
 
-def reencode_concat(
-    file1: Path,
-    file2: Path,
-    output: Path,
-    crf: int = 18,
-    log_callback: Optional[Callable[[str], None]] = None,
-    cancel_check: Optional[Callable[[], bool]] = None
-) -> tuple[bool, str]:
+def prepare_overlay_layer(
+    input_video: Path,
+    overlay: TextOverlayConfig,
+    work_dir: Path,
+    name: str,
+    log_callback: Optional[Callable[[str], None]] = None
+) -> tuple[Optional[OverlayLayer], str]:
+    """
+    Decide how an overlay joins the concat graph, without encoding anything.
+    Uses drawtext for manual layouts when available, otherwise renders the
+    text to a PNG in work_dir (same choice as apply_text_overlay).
     """
-    Concatenate two videos with re-encoding for maximum compatibility.
-    Normalizes: 30fps, 48kHz audio, yuv420p, libx264, AAC 192k
+    if log_callback:
+        duration_desc = "full length" if overlay.duration <= 0 else f"{overlay.duration}s"
+        log_callback(f"  Overlay text: '{overlay.text}' at ({overlay.x}, {overlay.y}) for {duration_desc}")
+
+    if _check_drawtext_available() and overlay.align != "top_center":
+        return OverlayLayer(drawtext=build_drawtext_filter(overlay), duration=overlay.duration), ""
+
+    video_width, video_height = get_video_dimensions(input_video)
+    image_path = work_dir / f"{name}_overlay.png"
+    ok, error = _render_text_overlay_image(overlay, image_path, video_width, video_height)
+    if not ok:
+        return None, error
+    return OverlayLayer(image=image_path, duration=overlay.duration), ""
 
-    Always tries WITH audio first, falls back to video-only if audio fails.
 
-    Returns (success, error_message)
+def _even(value: int) -> int:
+    return max(2, value - value % 2)
+
+
+def plan_concat_render(
+    files: list[Path],
+    overlays: Optional[list[Optional[OverlayLayer]]] = None
+) -> Optional[ConcatRenderPlan]:
     """
-    # First attempt: WITH audio
-    if log_callback:
-        log_callback(f"  Re-encoding with audio: libx264 CRF={crf}, AAC 192k, 30fps, 48kHz")
-
-    filter_with_audio = (
-        "[0:v]fps=30,format=yuv420p,scale=trunc(iw/2)*2:trunc(ih/2)*2[v0];"
-        "[1:v]fps=30,format=yuv420p,scale=trunc(iw/2)*2:trunc(ih/2)*2[v1];"
-        "[0:a]aresample=48000,aformat=sample_fmts=fltp:channel_layouts=stereo[a0];"
-        "[1:a]aresample=48000,aformat=sample_fmts=fltp:channel_layouts=stereo[a1];"
-        "[v0][a0][v1][a1]concat=n=2:v=1:a=1[outv][outa]"
-    )
+    Pick a single re-encode graph for concatenating files from probe data.
+    Inputs without audio get a silent track (anullsrc) so the output keeps
+    audio; inputs whose size differs from the first are scaled and padded.
+    Overlays (one per file, or None) are composited onto each input before
+    normalisation. Returns None if any input cannot be probed.
+    """
+    infos = [probe_media(file) for file in files]
+    if any(info is None or not info.has_video for info in infos):
+        return None
 
-    success, error = _run_ffmpeg_concat(
-        file1, file2, output,
-        filter_with_audio,
-        ['-map', '[outv]', '-map', '[outa]'],
-        ['-c:a', 'aac', '-b:a', '192k'],
-        crf, log_callback, cancel_check
+    width = _even(infos[0].width)
+    height = _even(infos[0].height)
+    with_audio = any(info.has_audio for info in infos)
+    notes = [f"{width}x{height} @ 30fps"]
+    overlays = overlays or []
+    extra_inputs: list[Path] = []
+
+    filter_parts = []
+    video_parts = []
+    concat_inputs = []
+    segment_sources = []
+    segment_audio_parts = []
+    for idx, (file, info) in enumerate(zip(files, infos)):
+        video_start = len(filter_parts)
+        source = f"[{idx}:v]"
+        segment_parts = []
+        segment_inputs = []
+        segment_source = "[0:v]"
+        rate = "fps=30,"
+        layer = overlays[idx] if idx < len(overlays) else None
+        if layer and layer.drawtext:
+            filter_parts.append(f"{source}{layer.drawtext}[ov{idx}]")
+            segment_parts.append(f"[0:v]{layer.drawtext}[ov]")
+            source = f"[ov{idx}]"
+            segment_source = "[ov]"
+            notes.append(f"drawtext on {file.name}")
+        elif layer and layer.image:
+            image_idx = len(files) + len(extra_inputs)
+            extra_inputs.append(layer.image)
+            enable_clause = ""
+            if layer.duration and layer.duration > 0:
+                enable_clause = f":enable='between(t,0,{layer.duration})'"
+            # A single still frame is held by overlay until the video ends.
+            # fps after an overlay drops the last frame (the overlay's end of
+            # stream carries no frame duration), so the rate is converted first
+            filter_parts.append(f"{source}fps=30[base{idx}]")
+            filter_parts.append(f"[{image_idx}:v]format=rgba[img{idx}]")
+            filter_parts.append(f"[base{idx}][img{idx}]overlay=x=0:y=0{enable_clause}[ov{idx}]")
+            segment_inputs = ['-i', str(layer.image)]
+            segment_parts.append("[0:v]fps=30[base]")
+            segment_parts.append("[1:v]format=rgba[img]")
+            segment_parts.append(f"[base][img]overlay=x=0:y=0{enable_clause}[ov]")
+            source = f"[ov{idx}]"
+            segment_source = "[ov]"
+            rate = ""
+            notes.append(f"image overlay on {file.name}")
+
+        if info.width == infos[0].width and info.height == infos[0].height:
+            video_chain = f"{rate}format=yuv420p,scale=trunc(iw/2)*2:trunc(ih/2)*2"
+        else:
+            video_chain = (
+                f"scale={width}:{height}:force_original_aspect_ratio=decrease,"
+                f"pad={width}:{height}:(ow-iw)/2:(oh-ih)/2,setsar=1,{rate}format=yuv420p"
+            )
+            notes.append(f"scale/pad {file.name} from {info.width}x{info.height}")
+        filter_parts.append(f"{source}{video_chain}[v{idx}]")
+        concat_inputs.append(f"[v{idx}]")
+        video_parts.extend(filter_parts[video_start:])
+        segment_parts.append(f"{segment_source}{video_chain}[vout]")
+        segment_sources.append(SegmentSource(file, ";".join(segment_parts), segment_inputs))
+
+        if not with_audio:
+            continue
+        duration_sec = (info.video_duration_ms or info.duration_ms) / 1000
+        if info.has_audio:
+            filter_parts.append(
+                f"[{idx}:a]aresample=48000,aformat=sample_fmts=fltp:channel_layouts=stereo[a{idx}]"
+            )
+            # Audio-only pass: pin each track to its video length so the
+            # separately encoded video chunks stay in sync
+            segment_audio_parts.append(
+                f"[{idx}:a]aresample=48000,aformat=sample_fmts=fltp:channel_layouts=stereo,"
+                f"apad,atrim=duration={duration_sec:.3f}[a{idx}]"
+            )
+        else:
+            filter_parts.append(
+                f"anullsrc=r=48000:cl=stereo,atrim=duration={duration_sec:.3f}[a{idx}]"
+            )
+            segment_audio_parts.append(filter_parts[-1])
+            notes.append(f"silent track for {file.name}")
+        concat_inputs.append(f"[a{idx}]")
+
+    video_concat = "".join(f"[v{idx}]" for idx in range(len(files)))
+    video_parts.append(f"{video_concat}concat=n={len(files)}:v=1:a=0[outv]")
+
+    segment_audio_args = None
+    if with_audio:
+        filter_parts.append(f"{''.join(concat_inputs)}concat=n={len(files)}:v=1:a=1[outv][outa]")
+        map_args = ['-map', '[outv]', '-map', '[outa]']
+        audio_codec = ['-c:a', 'aac', '-b:a', '192k']
+        audio_labels = "".join(f"[a{idx}]" for idx in range(len(files)))
+        segment_audio_parts.append(f"{audio_labels}concat=n={len(files)}:v=0:a=1[outa]")
+        segment_audio_args = []
+        for file in files:
+            segment_audio_args.extend(['-i', str(file)])
+        segment_audio_args.extend([
+            '-filter_complex', ";".join(segment_audio_parts),
+            '-map', '[outa]', *audio_codec
+        ])
+    else:
+        filter_parts.append(f"{''.join(concat_inputs)}concat=n={len(files)}:v=1:a=0[outv]")
+        map_args = ['-map', '[outv]']
+        audio_codec = ['-an']
+        notes.append("no audio in any input")
+
+    return ConcatRenderPlan(
+        width=width,
+        height=height,
+        with_audio=with_audio,
+        filter_complex=";".join(filter_parts),
+        map_args=map_args,
+        audio_codec=audio_codec,
+        notes=notes,
+        extra_inputs=extra_inputs,
+        segment_sources=segment_sources,
+        segment_audio_args=segment_audio_args,
+        video_filter_complex=";".join(video_parts)
     )
 
-    if success:
-        return True, ""
 
-    # If audio concat failed, try video-only as fallback
-    if log_callback:
-        log_callback(f"  Audio concat failed, trying video-only fallback...")
-        log_callback(f"  Error was: {error[:200]}")
+@dataclass
+class AudioPassthroughPlan:
+    """Per-segment plan for building a concat's audio track mostly by copy."""
+    sample_rate: int
+    layout: str
+    copy: list[bool]  # per segment: stream-copy, or re-encode to match
 
-    filter_video_only = (
-        "[0:v]fps=30,format=yuv420p,scale=trunc(iw/2)*2:trunc(ih/2)*2[v0];"
-        "[1:v]fps=30,format=yuv420p,scale=trunc(iw/2)*2:trunc(ih/2)*2[v1];"
-        "[v0][v1]concat=n=2:v=1:a=0[outv]"
-    )
 
-    success, error = _run_ffmpeg_concat(
-        file1, file2, output,
-        filter_video_only,
-        ['-map', '[outv]'],
-        ['-an'],
-        crf, log_callback, cancel_check
+def plan_audio_passthrough(
+    files: list[Path],
+    video_durations_ms: list[int]
+) -> Optional[AudioPassthroughPlan]:
+    """
+    Decide which segments' audio can be stream-copied into the output.
+    The first AAC-LC track sets the target parameters; segments that match
+    it and whose audio lines up with their video are copied, the rest
+    (other codecs, other rates, silence) are re-encoded to match.
+    Returns None when nothing can be copied.
+    """
+    infos = [probe_media(file) for file in files]
+    reference = next(
+        (info for info in infos
+         if info and info.has_audio and info.audio_codec == "aac"
+         and info.audio_profile in ("", "LC") and info.sample_rate > 0),
+        None
     )
+    if reference is None:
+        return None
 
-    if success and log_callback:
-        log_callback(f"  Note: Output has no audio (source videos lacked compatible audio)")
+    copy = []
+    for info, video_ms in zip(infos, video_durations_ms):
+        copy.append(bool(
+            info and info.has_audio
+            and info.audio_codec == reference.audio_codec
+            and info.audio_profile == reference.audio_profile
+            and info.sample_rate == reference.sample_rate
+            and info.audio_channels == reference.audio_channels
+            and info.audio_duration_ms > 0
+            and abs(info.audio_duration_ms - video_ms) <= _AUDIO_ALIGN_TOLERANCE_MS
+        ))
+    if not any(copy):
+        return None
 
-    return success, error
+    layout = reference.audio_layout or ("mono" if reference.audio_channels == 1 else "stereo")
+    return AudioPassthroughPlan(reference.sample_rate, layout, copy)
 
 
-def simple_video_concat(
-    file1: Path,
-    file2: Path,
-    output: Path,
-    crf: int = 18,
-    log_callback: Optional[Callable[[str], None]] = None,
+def build_audio_track(
+    files: list[Path],
+    video_durations_ms: list[int],
+    plan: AudioPassthroughPlan,
+    work_dir: Path,
     cancel_check: Optional[Callable[[], bool]] = None
-) -> tuple[bool, str]:
+) -> tuple[bool, str, Path]:
+    """
+    Assemble the concatenated audio track following plan: copy matching
+    segments, re-encode (or synthesise silence for) the rest, then join the
+    pieces with the concat demuxer. Returns (success, error, track path).
     """
-    Simple video concatenation with fixed 1920x1080 output.
-    Tries with audio first, falls back to video-only.
+    pieces = []
+    for idx, (file, video_ms, copy) in enumerate(zip(files, video_durations_ms, plan.copy)):
+        piece = work_dir / f"audio_{idx:02d}.m4a"
+        duration = f"{video_ms / 1000:.3f}"
+        if copy:
+            cmd = ['ffmpeg', '-y', '-i', str(file), '-map', '0:a:0', '-c:a', 'copy', str(piece)]
+        else:
+            info = probe_media(file)
+            if info and info.has_audio:
+                source = ['-i', str(file), '-map', '0:a:0']
+                audio_filter = (
+                    f"aresample={plan.sample_rate},"
+                    f"aformat=sample_fmts=fltp:channel_layouts={plan.layout},"
+                    f"apad,atrim=duration={duration}"
+                )
+            else:
+                source = ['-f', 'lavfi', '-i', f"anullsrc=r={plan.sample_rate}:cl={plan.layout}"]
+                audio_filter = f"atrim=duration={duration}"
+            cmd = [
+                'ffmpeg', '-y', *source,
+                '-af', audio_filter,
+                '-c:a', 'aac', '-b:a', '192k',
+                str(piece)
+            ]
+        success, error = run_ffmpeg(cmd, piece, cancel_check)
+        if not success:
+            return False, error, piece
+        pieces.append(piece)
+
+    list_file = work_dir / "audio.txt"
+    list_file.write_text("".join(f"file '{piece.name}'\n" for piece in pieces))
+    track = work_dir / "audio.m4a"
+    cmd = ['ffmpeg', '-y', '-f', 'concat', '-safe', '0', '-i', str(list_file), '-c', 'copy', str(track)]
+    success, error = run_ffmpeg(cmd, track, cancel_check)
+    return success, error, track
 
-    Returns (success, error_message)
+
+def render_with_audio_passthrough(
+    files: list[Path],
+    inputs: list[Path],
+    output: Path,
+    video_filter_complex: str,
+    crf: int,
+    log_callback: Optional[Callable[[str], None]] = None,
+    cancel_check: Optional[Callable[[], bool]] = None,
+    renditions: Optional[list[Rendition]] = None
+) -> Optional[tuple[bool, str]]:
+    """
+    Encode only the video of a concat (video_filter_complex writes [outv]
+    from inputs) and mux in an audio track built by build_audio_track.
+    Renditions share the video encode's decode and the one audio track.
+    Returns None when audio cannot be passed through or the attempt
+    failed, so the caller renders audio in its filter graph instead.
     """
+    video_durations_ms = [
+        (info.video_duration_ms or info.duration_ms) if info else 0
+        for info in (probe_media(file) for file in files)
+    ]
+    plan = plan_audio_passthrough(files, video_durations_ms)
+    if plan is None:
+        return None
     if log_callback:
-        log_callback(f"  Simple concat: 1920x1080 with audio")
-
-    # Try WITH audio first
-    filter_with_audio = (
-        "[0:v]scale=1920:1080:force_original_aspect_ratio=decrease,"
-        "pad=1920:1080:(ow-iw)/2:(oh-ih)/2,setsar=1,fps=30[v0];"
-        "[1:v]scale=1920:1080:force_original_aspect_ratio=decrease,"
-        "pad=1920:1080:(ow-iw)/2:(oh-ih)/2,setsar=1,fps=30[v1];"
-        "[0:a]aresample=48000,aformat=sample_fmts=fltp:channel_layouts=stereo[a0];"
-        "[1:a]aresample=48000,aformat=sample_fmts=fltp:channel_layouts=stereo[a1];"
-        "[v0][a0][v1][a1]concat=n=2:v=1:a=1[outv][outa]"
-    )
+        log_callback(f"  Audio passthrough: stream-copying audio of {sum(plan.copy)}/{len(files)} segments")
+
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with tempfile.TemporaryDirectory(prefix=".audio_", dir=output.parent) as tmpdir:
+        work_dir = Path(tmpdir)
+        video = work_dir / "video.mp4"
+        success, error = _run_ffmpeg_render(
+            inputs, video, video_filter_complex, ['-map', '[outv]'], ['-an'],
+            crf, log_callback, cancel_check, faststart=False, renditions=renditions
+        )
+        if success:
+            success, error, track = build_audio_track(
+                files, video_durations_ms, plan, work_dir, cancel_check
+            )
+        finals = [output, *(rendition.output_path(output) for rendition in renditions or [])]
+        videos = [video, *(rendition.output_path(video) for rendition in renditions or [])]
+        for final, rendition_video in zip(finals, videos):
+            if not success:
+                break
+            cmd = [
+                'ffmpeg', '-y', '-i', str(rendition_video), '-i', str(track),
+                '-map', '0:v', '-map', '1:a',
+                '-c', 'copy',
+                '-movflags', '+faststart',
+                str(final)
+            ]
+            success, error = run_ffmpeg(cmd, final, cancel_check)
+        if not success:
+            for final in finals:
+                if final.exists():
+                    final.unlink()
+        if success or classify_failure(error) in UNRECOVERABLE_FAILURES:
+            return success, error
 
-    success, error = _run_ffmpeg_concat(
-        file1, file2, output,
-        filter_with_audio,
-        ['-map', '[outv]', '-map', '[outa]'],
-        ['-c:a', 'aac', '-b:a', '192k'],
-        crf, log_callback, cancel_check
-    )
+    if log_callback:
+        log_callback(f"  Audio passthrough failed, re-encoding audio: {error[-200:]}")
+    return None
 
-    if success:
-        return True, ""
 
-    # Fallback to video-only
+def render_concat(
+    files: list[Path],
+    output: Path,
+    plan: ConcatRenderPlan,
+    crf: int = 18,
+    log_callback: Optional[Callable[[str], None]] = None,
+    cancel_check: Optional[Callable[[], bool]] = None,
+    renditions: Optional[list[Rendition]] = None,
+    audio_files: Optional[list[Path]] = None
+) -> tuple[bool, str]:
+    """
+    Concatenate files with one encode following a ConcatRenderPlan.
+    Renditions are encoded from the same decode beside output.
+    audio_files are the originals of files (e.g. when files are mezzanines);
+    audio passthrough is planned and copied from them.
+    """
     if log_callback:
-        log_callback(f"  Audio failed, trying video-only...")
-
-    filter_video_only = (
-        "[0:v]scale=1920:1080:force_original_aspect_ratio=decrease,"
-        "pad=1920:1080:(ow-iw)/2:(oh-ih)/2,setsar=1,fps=30[v0];"
-        "[1:v]scale=1920:1080:force_original_aspect_ratio=decrease,"
-        "pad=1920:1080:(ow-iw)/2:(oh-ih)/2,setsar=1,fps=30[v1];"
-        "[v0][v1]concat=n=2:v=1:a=0[outv]"
-    )
-
-    return _run_ffmpeg_concat(
-        file1, file2, output,
-        filter_video_only,
-        ['-map', '[outv]'],
-        ['-an'],
-        crf, log_callback, cancel_check
+        log_callback(f"  Re-encoding (planned): libx264 CRF={crf}, {', '.join(plan.notes)}")
+        if renditions:
+            log_callback(f"  Renditions: {', '.join(rendition.name for rendition in renditions)}")
+    if plan.with_audio and plan.video_filter_complex:
+        result = render_with_audio_passthrough(
+            audio_files or files, [*files, *plan.extra_inputs], output, plan.video_filter_complex,
+            crf, log_callback, cancel_check, renditions
+        )
+        if result is not None:
+            return result
+    # Segmented chunks are stitched per output, so they would not share a decode
+    if plan.segment_sources and not renditions:
+        result = encode_segmented_if_long(
+            plan.segment_sources, output, crf, plan.segment_audio_args,
+            log_callback, cancel_check
+        )
+        if result is not None:
+            return result
+    return _run_ffmpeg_render(
+        [*files, *plan.extra_inputs], output, plan.filter_complex, plan.map_args,
+        plan.audio_codec, crf, log_callback, cancel_check, renditions=renditions
     )
 
 
@@ -894,11 +1493,13 @@ def process_video_pair(
     overlay_a: Optional[TextOverlayConfig] = None,
     overlay_b: Optional[TextOverlayConfig] = None,
     log_callback: Optional[Callable[[str], None]] = None,
-    cancel_check: Optional[Callable[[], bool]] = None
+    cancel_check: Optional[Callable[[], bool]] = None,
+    renditions: Optional[list[Rendition]] = None,
+    progress_callback: Optional[Callable[[EncodeProgress], None]] = None
 ) -> ProcessingResult:
     """
     Process a single matched video pair.
-    Creates both flat and nested outputs.
+    Creates both flat and nested outputs, plus any renditions beside each.
     """
     if not match.is_matched:
         return ProcessingResult(
@@ -908,17 +1509,57 @@ def process_video_pair(
             error_message="Not a matched pair"
         )
 
-    file_a = match.file_a
-    file_b = match.file_b
+    parts = [("A", match.file_a, overlay_a), ("B", match.file_b, overlay_b)]
+    if order == ConcatOrder.B_THEN_A:
+        parts.reverse()
+
+    return process_video_sequence(
+        match.basename,
+        [file for _, file, _ in parts],
+        output_flat,
+        output_nested,
+        crf,
+        try_fast_copy,
+        overlays=[overlay for _, _, overlay in parts],
+        labels=[label for label, _, _ in parts],
+        log_callback=log_callback,
+        cancel_check=cancel_check,
+        renditions=renditions,
+        progress_callback=progress_callback
+    )
 
-    overlay_a_enabled = overlay_a.is_enabled() if overlay_a else False
-    overlay_b_enabled = overlay_b.is_enabled() if overlay_b else False
-    overlay_active = overlay_a_enabled or overlay_b_enabled
+
+def process_video_sequence(
+    basename: str,
+    files: list[Path],
+    output_flat: Path,
+    output_nested: Path,
+    crf: int,
+    try_fast_copy: bool,
+    overlays: Optional[list[Optional[TextOverlayConfig]]] = None,
+    labels: Optional[list[str]] = None,
+    log_callback: Optional[Callable[[str], None]] = None,
+    cancel_check: Optional[Callable[[], bool]] = None,
+    renditions: Optional[list[Rendition]] = None,
+    progress_callback: Optional[Callable[[EncodeProgress], None]] = None
+) -> ProcessingResult:
+    """
+    Concatenate files (in timeline order) into one output, by stream copy
+    when compatible, otherwise in a single encode with any overlays (one per
+    file, or None) composited in. Creates both flat and nested outputs, plus
+    any renditions beside each. labels name the parts in the log.
+    progress_callback receives the progress of each ffmpeg pass.
+    """
+    labels = labels or [str(idx) for idx in range(1, len(files) + 1)]
+    overlays = list(overlays or [])
+    overlays += [None] * (len(files) - len(overlays))
+    enabled = [bool(overlay and overlay.is_enabled()) for overlay in overlays]
+    overlay_active = any(enabled)
 
     if log_callback:
-        log_callback(f"Processing: {match.basename}")
-        log_callback(f"  Video A: {file_a.name}")
-        log_callback(f"  Video B: {file_b.name}")
+        log_callback(f"Processing: {basename}")
+        for label, file in zip(labels, files):
+            log_callback(f"  Video {label}: {file.name}")
         if overlay_active:
             log_callback("  Text overlays: enabled")
 
@@ -926,99 +1567,109 @@ def process_video_pair(
     output_flat.parent.mkdir(parents=True, exist_ok=True)
     output_nested.parent.mkdir(parents=True, exist_ok=True)
 
-    # Apply overlays if needed
-    with tempfile.TemporaryDirectory() as tmpdir:
-        temp_dir = Path(tmpdir)
-        if overlay_a_enabled:
-            output_a = temp_dir / f"{file_a.stem}_overlay{file_a.suffix}"
-            success, error_msg = apply_text_overlay(
-                input_video=file_a,
-                output_path=output_a,
-                overlay=overlay_a,
-                crf=crf,
-                log_callback=log_callback,
-                cancel_check=cancel_check
-            )
-            if not success:
-                if log_callback:
-                    log_callback(f"  FAILED overlay for Video A: {error_msg[:300]}")
-                return ProcessingResult(
-                    basename=match.basename,
-                    success=False,
-                    used_fast_copy=False,
-                    error_message=error_msg
-                )
-            file_a = output_a
-
-        if overlay_b_enabled:
-            output_b = temp_dir / f"{file_b.stem}_overlay{file_b.suffix}"
-            success, error_msg = apply_text_overlay(
-                input_video=file_b,
-                output_path=output_b,
-                overlay=overlay_b,
-                crf=crf,
-                log_callback=log_callback,
-                cancel_check=cancel_check
+    expected_sec = sum(get_video_duration_ms(file) for file in files) / 1000
+    with scratch_space("concat") as scratch, progress_scope(progress_callback, expected_sec):
+        temp_dir = scratch.path
+        # Rendered in scratch and moved into place once complete
+        staged_flat = temp_dir / output_flat.name
+
+        # Resolve overlays up front; they are drawn inside the concat encode
+        layers: list[Optional[OverlayLayer]] = []
+        for idx, (label, source, overlay) in enumerate(zip(labels, files, overlays)):
+            if not enabled[idx]:
+                layers.append(None)
+                continue
+            layer, error_msg = prepare_overlay_layer(
+                source, overlay, scratch.small, f"part{idx}", log_callback
             )
-            if not success:
+            if layer is None:
                 if log_callback:
-                    log_callback(f"  FAILED overlay for Video B: {error_msg[:300]}")
+                    log_callback(f"  FAILED overlay for Video {label}: {error_msg[:300]}")
                 return ProcessingResult(
-                    basename=match.basename,
+                    basename=basename,
                     success=False,
                     used_fast_copy=False,
                     error_message=error_msg
                 )
-            file_b = output_b
+            layers.append(layer)
 
+        fast_copy_reason: Optional[str] = None
         if overlay_active and try_fast_copy:
             if log_callback:
                 log_callback("  Text overlays active; disabling fast copy.")
             try_fast_copy = False
-
-        # Determine order
-        if order == ConcatOrder.A_THEN_B:
-            file1, file2 = file_a, file_b
-        else:
-            file1, file2 = file_b, file_a
-
-        if log_callback:
-            log_callback(f"  First: {file1.name}")
-            log_callback(f"  Second: {file2.name}")
+            fast_copy_reason = "text overlays active"
 
         used_fast_copy = False
+        fast_copy_attempted = False
         success = False
         error_msg = None
+        renditions_done = not renditions
 
-        # Try fast copy first if enabled
+        # Try fast copy first if enabled and the inputs can be stream-copied
         if try_fast_copy:
-            if try_fast_copy_concat(file1, file2, output_flat, log_callback):
-                used_fast_copy = True
-                success = True
-                if log_callback:
-                    log_callback(f"  Fast copy succeeded!")
+            plan = plan_fast_copy(files)
+            fast_copy_reason = plan.reason
+            if plan.allowed:
+                fast_copy_attempted = True
+                if try_fast_copy_concat_files(files, staged_flat, log_callback):
+                    used_fast_copy = True
+                    success = True
+                    if log_callback:
+                        log_callback(f"  Fast copy succeeded!")
+            elif log_callback:
+                log_callback(f"  Skipping fast copy: {plan.reason} ({plan.detail})")
 
         # Fall back to re-encode if needed
         if not success:
-            if try_fast_copy and log_callback:
+            if fast_copy_attempted and log_callback:
                 log_callback(f"  Falling back to re-encode...")
-            success, error_msg = reencode_concat(
-                file1, file2, output_flat, crf, log_callback, cancel_check
-            )
 
-            # If that failed too, try simplest possible concat
-            if not success:
-                if log_callback:
-                    log_callback(f"  Trying simple video-only concat...")
-                success, error_msg = simple_video_concat(
-                    file1, file2, output_flat, crf, log_callback, cancel_check
+            # Re-renders of the same inputs start from cached normalised
+            # streams; overlay layers and audio passthrough planning use
+            # the originals
+            video_files = files
+            if mezzanine_enabled():
+                video_files = [
+                    get_mezzanine(file, log_callback, cancel_check) or file
+                    for file in files
+                ]
+
+            # Pick the graph from probe data so one encode covers every
+            # input mix (sizes, missing audio, overlays); its own fallbacks
+            # stop at unrecoverable causes
+            render_plan = plan_concat_render(video_files, layers)
+            if render_plan is None:
+                error_msg = "Could not probe inputs for re-encode"
+            else:
+                success, error_msg = render_concat(
+                    video_files, staged_flat, render_plan, crf, log_callback, cancel_check,
+                    renditions, audio_files=files
                 )
+                renditions_done = success
+
+        if success and not renditions_done:
+            # Fast copy writes one output; derive the renditions from it in
+            # a single decode
+            success, error_msg = encode_renditions(
+                staged_flat, staged_flat, renditions, crf, log_callback, cancel_check
+            )
 
+        rendition_outputs = [rendition.output_path(output_flat) for rendition in renditions or []]
         if success:
-            # Copy to nested location
             try:
-                import shutil
-                shutil.copy2(output_flat, output_nested)
+                scratch.publish(staged_flat, output_flat)
+                for rendition in renditions or []:
+                    scratch.publish(rendition.output_path(staged_flat), rendition.output_path(output_flat))
+            except OSError as e:
+                success = False
+                error_msg = f"Could not publish output: {e}"
+        if success:
+            # Nested location: a hard link where possible, otherwise a copy
+            try:
+                link_or_copy(output_flat, output_nested)
+                for rendition in renditions or []:
+                    link_or_copy(rendition.output_path(output_flat), rendition.output_path(output_nested))
                 if log_callback:
                     log_callback(f"  Success! Output: {output_flat.name}")
             except Exception as e:
@@ -1029,8 +1680,12 @@ def process_video_pair(
                 log_callback(f"  FAILED: {error_msg}")
 
         return ProcessingResult(
-            basename=match.basename,
+            basename=basename,
             success=success,
             used_fast_copy=used_fast_copy,
-            error_message=error_msg
+            error_message=error_msg,
+            fast_copy_attempted=fast_copy_attempted,
+            fast_copy_reason=fast_copy_reason,
+            renditions=rendition_outputs if success else [],
+            failure_cause=None if success else classify_failure(error_msg or "")
         )
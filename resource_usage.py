@@ -0,0 +1,140 @@
+"""
+Resource Usage Module
+
+Accounting of the ffmpeg/ffprobe children a job launches. Each child is
+reaped with wait4 so its own rusage (CPU, peak RSS, blocks written) is
+kept, and the numbers are added to every usage scope open in the calling
+context, so a job and the item it is working on can both be totalled.
+"""
+
+import os
+import signal
+import subprocess
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import asdict, dataclass
+from typing import Iterator, Optional
+
+# wait4 is POSIX-only; elsewhere only wall time is measured
+HAS_WAIT4 = hasattr(os, "wait4")
+# ru_maxrss is in kilobytes on Linux and in bytes on macOS
+_MAXRSS_UNIT = 1 if sys.platform == "darwin" else 1024
+# ru_oublock counts 512-byte blocks
+_BLOCK_BYTES = 512
+
+_SCOPES: ContextVar[tuple["ResourceUsage", ...]] = ContextVar("resource_usage_scopes", default=())
+_SCOPES_LOCK = threading.Lock()
+
+
+@dataclass
+class ResourceUsage:
+    """Totals over a set of child processes."""
+    processes: int = 0
+    wall_sec: float = 0.0
+    cpu_sec: float = 0.0  # user + system
+    max_rss_bytes: int = 0  # peak of any single process
+    bytes_written: int = 0
+
+    def add(self, other: "ResourceUsage") -> None:
+        self.processes += other.processes
+        self.wall_sec += other.wall_sec
+        self.cpu_sec += other.cpu_sec
+        self.max_rss_bytes = max(self.max_rss_bytes, other.max_rss_bytes)
+        self.bytes_written += other.bytes_written
+
+    def to_dict(self) -> dict:
+        data = asdict(self)
+        data["wall_sec"] = round(self.wall_sec, 2)
+        data["cpu_sec"] = round(self.cpu_sec, 2)
+        return data
+
+    def describe(self) -> str:
+        """e.g. '4 processes, 12.3s wall, 30.1s CPU, peak 512 MB, 45.2 MB written'."""
+        mb = 1024 * 1024
+        return (
+            f"{self.processes} process{'es' if self.processes != 1 else ''}, "
+            f"{self.wall_sec:.1f}s wall, {self.cpu_sec:.1f}s CPU, "
+            f"peak {self.max_rss_bytes / mb:.0f} MB, {self.bytes_written / mb:.1f} MB written"
+        )
+
+
+@contextmanager
+def usage_scope() -> Iterator[ResourceUsage]:
+    """Total the children launched from this context while the block runs."""
+    usage = ResourceUsage()
+    token = _SCOPES.set(_SCOPES.get() + (usage,))
+    try:
+        yield usage
+    finally:
+        _SCOPES.reset(token)
+
+
+def record_usage(usage: Optional[ResourceUsage]) -> None:
+    """Add one child's usage to every scope open in the current context."""
+    if usage is None:
+        return
+    scopes = _SCOPES.get()
+    if not scopes:
+        return
+    with _SCOPES_LOCK:  # probe threads share their caller's scopes
+        for scope in scopes:
+            scope.add(usage)
+
+
+def usage_from_rusage(wall_sec: float, rusage) -> ResourceUsage:
+    return ResourceUsage(
+        processes=1,
+        wall_sec=wall_sec,
+        cpu_sec=rusage.ru_utime + rusage.ru_stime,
+        max_rss_bytes=rusage.ru_maxrss * _MAXRSS_UNIT,
+        bytes_written=rusage.ru_oublock * _BLOCK_BYTES,
+    )
+
+
+def reap(process: subprocess.Popen, started: float) -> ResourceUsage:
+    """
+    Block until process exits and reap it with wait4, setting its
+    returncode. started is its time.monotonic() launch time.
+    """
+    if not HAS_WAIT4:
+        process.wait()
+        return ResourceUsage(processes=1, wall_sec=time.monotonic() - started)
+    _, status, rusage = os.wait4(process.pid, 0)
+    process.returncode = os.waitstatus_to_exitcode(status)
+    return usage_from_rusage(time.monotonic() - started, rusage)
+
+
+def run_measured(cmd: list[str], timeout: float) -> tuple[int, str]:
+    """
+    Run a short command (ffprobe) and record its usage.
+    Returns (returncode, stdout); stderr is discarded. Raises OSError if it
+    cannot be started.
+    """
+    started = time.monotonic()
+    process = subprocess.Popen(
+        cmd, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True
+    )
+
+    def _kill() -> None:
+        if not HAS_WAIT4:
+            process.kill()
+            return
+        # Not Popen.kill(): its poll() could reap the process before wait4
+        try:
+            os.kill(process.pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+
+    killer = threading.Timer(timeout, _kill)
+    killer.start()
+    try:
+        stdout = process.stdout.read()
+        process.stdout.close()
+        usage = reap(process, started)
+    finally:
+        killer.cancel()
+    record_usage(usage)
+    return process.returncode, stdout
@@ -0,0 +1,142 @@
+"""
+Scratch Space Module
+
+Per-item scratch directories for intermediates and not-yet-published
+outputs. Scratch lives in the job directory when a scratch_root() is set
+(the web worker, on the outputs' filesystem, so finished files are
+published by atomic rename), otherwise under the cache dir; publishing
+falls back to a copy when that is on another filesystem. Nothing is ever
+created in, or swept from, the user's output folder. Small intermediates
+(captions, overlay images) can go to a tmpfs instead
+(RECLIP_SCRATCH_TMPFS, e.g. /dev/shm). Scratch is always removed when the
+item finishes, and directories left by crashed workers are swept from the
+scratch root after a day.
+"""
+
+import errno
+import os
+import shutil
+import tempfile
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Iterator, Optional
+
+from media_probe import get_cache_dir
+
+_TMPFS_DIR: Optional[Path] = Path(os.environ["RECLIP_SCRATCH_TMPFS"]) if os.getenv("RECLIP_SCRATCH_TMPFS") else None
+_SCRATCH_PREFIX = ".scratch_"
+_TMPFS_PREFIX = "reclip_scratch_"
+# Scratch directories older than this belong to crashed workers
+_STALE_SCRATCH_SEC = 24 * 3600
+
+_SCRATCH_ROOT: ContextVar[Optional[Path]] = ContextVar("scratch_root", default=None)
+
+
+def configure_scratch(tmpfs_dir: Optional[Path]) -> None:
+    """Put small intermediates under tmpfs_dir, or beside the rest when None."""
+    global _TMPFS_DIR
+    _TMPFS_DIR = Path(tmpfs_dir) if tmpfs_dir else None
+
+
+def _default_root() -> Path:
+    return get_cache_dir() / "scratch"
+
+
+@contextmanager
+def scratch_root(path: Path) -> Iterator[None]:
+    """Allocate scratch for work started in this block under path (e.g. the job directory)."""
+    token = _SCRATCH_ROOT.set(Path(path))
+    try:
+        yield
+    finally:
+        _SCRATCH_ROOT.reset(token)
+
+
+def _sweep_stale(root: Path, prefix: str) -> None:
+    now = time.time()
+    for path in root.glob(f"{prefix}*"):
+        try:
+            if now - path.stat().st_mtime > _STALE_SCRATCH_SEC:
+                shutil.rmtree(path, ignore_errors=True)
+        except OSError:
+            pass
+
+
+class Scratch:
+    """
+    One item's scratch space. path is under the scratch root; small is for
+    small intermediates and may be a tmpfs.
+    """
+
+    def __init__(self, path: Path, small: Path):
+        self.path = path
+        self.small = small
+
+    @classmethod
+    def create(cls, prefix: str = "item") -> "Scratch":
+        """Allocate scratch under scratch_root(), or the cache dir when unset."""
+        root = _SCRATCH_ROOT.get() or _default_root()
+        root.mkdir(parents=True, exist_ok=True)
+        _sweep_stale(root, _SCRATCH_PREFIX)
+        path = Path(tempfile.mkdtemp(prefix=f"{_SCRATCH_PREFIX}{prefix}_", dir=root))
+        small = path
+        if _TMPFS_DIR is not None:
+            try:
+                _sweep_stale(_TMPFS_DIR, _TMPFS_PREFIX)
+                small = Path(tempfile.mkdtemp(prefix=f"{_TMPFS_PREFIX}{prefix}_", dir=_TMPFS_DIR))
+            except OSError:
+                pass  # tmpfs missing or full; keep everything together
+        return cls(path, small)
+
+    def publish(self, staged: Path, dest: Path) -> None:
+        """Move a finished file from scratch to dest atomically."""
+        dest.parent.mkdir(parents=True, exist_ok=True)
+        try:
+            os.replace(staged, dest)
+        except OSError as e:
+            if e.errno != errno.EXDEV:
+                raise
+            # Scratch root on another filesystem: copy beside dest, then rename
+            _replace_via(dest, lambda temp: shutil.copy2(staged, temp))
+
+    def cleanup(self) -> None:
+        shutil.rmtree(self.path, ignore_errors=True)
+        if self.small != self.path:
+            shutil.rmtree(self.small, ignore_errors=True)
+
+
+@contextmanager
+def scratch_space(prefix: str = "item") -> Iterator[Scratch]:
+    """Scratch for one item, removed when the block exits however it exits."""
+    scratch = Scratch.create(prefix)
+    try:
+        yield scratch
+    finally:
+        scratch.cleanup()
+
+
+def _replace_via(dest: Path, write) -> None:
+    temp = dest.with_name(f".{dest.name}.{os.getpid()}.tmp")
+    try:
+        write(temp)
+        os.replace(temp, dest)
+    finally:
+        temp.unlink(missing_ok=True)
+
+
+def link_or_copy(source: Path, dest: Path) -> None:
+    """
+    Put a second copy of a published file at dest: a hard link when both
+    are on one filesystem, otherwise a real copy. dest appears atomically.
+    """
+    dest.parent.mkdir(parents=True, exist_ok=True)
+
+    def _write(temp: Path) -> None:
+        try:
+            os.link(source, temp)
+        except OSError:
+            shutil.copy2(source, temp)
+
+    _replace_via(dest, _write)
@@ -0,0 +1,308 @@
+"""
+Segmented Encode Module
+
+Optional segment-parallel libx264 encoding for long inputs. Each input is
+split at keyframes into chunks that are filtered and encoded by separate
+ffmpeg processes, audio is encoded once, and the pieces are stitched with
+the concat demuxer and -c copy. The stitched file is not bit-identical to
+a single-pass encode, so its frame count and duration are checked against
+the source and the caller encodes in one process if they differ.
+"""
+
+import os
+import tempfile
+import threading
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, Optional
+
+from ffmpeg_runner import (
+    UNRECOVERABLE_FAILURES,
+    classify_failure,
+    run_ffmpeg_all,
+    run_ffmpeg_process,
+    run_result,
+)
+from media_probe import probe_media
+from resource_usage import run_measured
+
+# Parallel chunks per long encode; 0 disables segmented mode
+_SEGMENTS = int(os.getenv("RECLIP_ENCODE_SEGMENTS", "0") or 0)
+# Inputs shorter than this are always encoded by a single process
+_MIN_DURATION_SEC = float(os.getenv("RECLIP_SEGMENT_MIN_SEC", "60") or 60)
+# Never cut a chunk shorter than this
+_MIN_CHUNK_SEC = 2.0
+
+_KEYFRAME_CACHE: dict[tuple[str, int, int], list[float]] = {}
+_KEYFRAME_CACHE_LOCK = threading.Lock()
+
+
+@dataclass
+class SegmentSource:
+    """
+    One input to encode in keyframe-aligned chunks.
+    filter_graph reads [0:v] (extra inputs are numbered from 1) and writes
+    [vout]. Frames keep their position in the full input, so enable=
+    windows and ASS timings need no per-chunk adjustment.
+    """
+    path: Path
+    filter_graph: str
+    extra_inputs: list[str] = field(default_factory=list)
+    duration_sec: Optional[float] = None  # encode only the first N seconds
+
+
+def configure_segmented_encoding(segments: int, min_duration_sec: Optional[float] = None) -> None:
+    """Set the chunk count (0 disables) and the minimum input length."""
+    global _SEGMENTS, _MIN_DURATION_SEC
+    _SEGMENTS = max(0, int(segments))
+    if min_duration_sec is not None:
+        _MIN_DURATION_SEC = float(min_duration_sec)
+
+
+def segment_count(duration_sec: float) -> int:
+    """Chunks to use for an encode of this length; 0 means don't segment."""
+    if _SEGMENTS < 2 or duration_sec < _MIN_DURATION_SEC:
+        return 0
+    return _SEGMENTS
+
+
+def probe_keyframes(file_path: Path) -> list[float]:
+    """Keyframe times (seconds from the start) of the first video stream."""
+    file_path = Path(file_path)
+    try:
+        stat = file_path.stat()
+    except OSError:
+        return []
+    key = (str(file_path.resolve()), stat.st_size, stat.st_mtime_ns)
+    with _KEYFRAME_CACHE_LOCK:
+        cached = _KEYFRAME_CACHE.get(key)
+    if cached is not None:
+        return cached
+
+    cmd = [
+        'ffprobe', '-v', 'error',
+        '-select_streams', 'v:0',
+        '-show_entries', 'format=start_time:packet=pts_time,flags',
+        '-of', 'csv=p=0',
+        str(file_path)
+    ]
+    try:
+        returncode, stdout = run_measured(cmd, timeout=120)
+    except Exception:
+        return []
+    if returncode != 0:
+        return []
+
+    start_time = 0.0
+    times = []
+    for line in stdout.splitlines():
+        values = line.strip().split(',')
+        try:
+            if len(values) >= 2:
+                if 'K' in values[1]:
+                    times.append(float(values[0]))
+            elif values[0]:
+                start_time = float(values[0])
+        except ValueError:
+            continue
+
+    keyframes = sorted(t - start_time for t in times)
+    with _KEYFRAME_CACHE_LOCK:
+        _KEYFRAME_CACHE[key] = keyframes
+    return keyframes
+
+
+def plan_segments(keyframes: list[float], duration_sec: float, count: int) -> list[tuple[float, float]]:
+    """Split [0, duration) into up to count ranges cut at keyframes."""
+    bounds = [0.0]
+    for i in range(1, count):
+        target = duration_sec * i / count
+        candidates = [
+            t for t in keyframes
+            if t >= bounds[-1] + _MIN_CHUNK_SEC and t <= duration_sec - _MIN_CHUNK_SEC
+        ]
+        if not candidates:
+            break
+        best = min(candidates, key=lambda t: abs(t - target))
+        if best > bounds[-1]:
+            bounds.append(best)
+    bounds.append(duration_sec)
+    return list(zip(bounds[:-1], bounds[1:]))
+
+
+def source_duration_sec(source: SegmentSource) -> float:
+    info = probe_media(source.path)
+    if info is None:
+        return 0.0
+    duration = (info.video_duration_ms or info.duration_ms) / 1000
+    if source.duration_sec is not None:
+        duration = min(duration, source.duration_sec)
+    return duration
+
+
+def _chunk_cmd(
+    source: SegmentSource,
+    start: float,
+    end: float,
+    crf: int,
+    threads: int,
+    output: Path
+) -> list[str]:
+    # Shift frames back to their position in the full input before the
+    # caller's graph runs, then rebase to zero for the chunk file.
+    graph = source.filter_graph.replace("[0:v]", "[seg_src]")
+    filter_complex = (
+        f"[0:v]setpts=PTS+{start:.6f}/TB[seg_src];{graph};"
+        f"[vout]setpts=PTS-STARTPTS[seg_out]"
+    )
+    return [
+        'ffmpeg', '-y',
+        '-ss', f"{start:.6f}", '-t', f"{end - start:.6f}", '-i', str(source.path),
+        *source.extra_inputs,
+        '-filter_complex', filter_complex,
+        '-map', '[seg_out]',
+        '-an',
+        '-c:v', 'libx264',
+        '-preset', 'medium',
+        '-crf', str(crf),
+        '-threads', str(threads),
+        str(output)
+    ]
+
+
+def encode_segmented(
+    sources: list[SegmentSource],
+    output: Path,
+    work_dir: Path,
+    crf: int,
+    audio_args: Optional[list[str]] = None,
+    segments: Optional[int] = None,
+    log_callback: Optional[Callable[[str], None]] = None,
+    cancel_check: Optional[Callable[[], bool]] = None
+) -> tuple[bool, str]:
+    """
+    Encode the video of sources (played back to back) in parallel chunks.
+    audio_args are the ffmpeg inputs, filters and codec options producing
+    the full audio track in one pass (no output path), or None for no audio.
+    The stitched output is checked against the expected frame count and
+    duration and removed if they differ (see _check_stitched).
+    Returns (success, error_message).
+    """
+    durations = [source_duration_sec(source) for source in sources]
+    for source, duration in zip(sources, durations):
+        if duration <= 0:
+            return False, f"cannot probe {source.path.name}"
+    segments = segments or _SEGMENTS or 2
+    total = sum(durations)
+
+    plans = []
+    for source, duration in zip(sources, durations):
+        # Share the chunks between sources in proportion to their length
+        count = max(1, round(segments * duration / total))
+        plans.append((source, plan_segments(probe_keyframes(source.path), duration, count)))
+
+    jobs = []
+    for source_idx, (source, ranges) in enumerate(plans):
+        for chunk_idx, (start, end) in enumerate(ranges):
+            jobs.append((source, start, end, work_dir / f"chunk_{source_idx:02d}_{chunk_idx:03d}.mp4"))
+    if len(jobs) < 2:
+        return False, "input too short to segment"
+
+    work_dir.mkdir(parents=True, exist_ok=True)
+    workers = max(1, min(len(jobs), segments))
+    threads = max(1, (os.cpu_count() or 4) // workers)
+    if log_callback:
+        log_callback(f"  Segmented encode: {len(jobs)} chunks on {workers} parallel encoders")
+
+    runs = []
+    if audio_args is not None:
+        audio_path = work_dir / "audio.mka"
+        runs.append((['ffmpeg', '-y', *audio_args, '-vn', str(audio_path)], audio_path))
+    runs.extend(
+        (_chunk_cmd(source, start, end, crf, threads, chunk_path), chunk_path)
+        for source, start, end, chunk_path in jobs
+    )
+    # One extra slot for the audio encode, which runs beside the chunks;
+    # progress counts the video chunks only
+    chunk_runs = set(range(len(runs) - len(jobs), len(runs)))
+    results = run_ffmpeg_all(runs, cancel_check, max_parallel=workers + 1, progress_runs=chunk_runs)
+
+    for ok, error in results:
+        if not ok and error != "Cancelled by user":
+            return False, error
+    if cancel_check and cancel_check():
+        return False, "Cancelled by user"
+    if not all(ok for ok, _ in results):
+        return False, "segment encode failed"
+
+    list_file = work_dir / "chunks.txt"
+    with open(list_file, 'w') as f:
+        for _, _, _, chunk_path in jobs:
+            f.write(f"file '{str(chunk_path).replace(chr(39), chr(39) + chr(92) + chr(39) + chr(39))}'\n")
+
+    cmd = ['ffmpeg', '-y', '-f', 'concat', '-safe', '0', '-i', str(list_file)]
+    map_args = ['-map', '0:v']
+    if audio_args is not None:
+        cmd.extend(['-i', str(work_dir / "audio.mka")])
+        map_args.extend(['-map', '1:a'])
+    cmd.extend([*map_args, '-c', 'copy', '-movflags', '+faststart', str(output)])
+    run = run_ffmpeg_process(cmd, cancel_check, total)
+    success, error = run_result(run, output)
+    if success:
+        error = _check_stitched(run.frames, output, jobs[0][3], total, len(jobs))
+        if error:
+            output.unlink(missing_ok=True)
+            return False, error
+    return success, error
+
+
+def _check_stitched(frames: int, output: Path, first_chunk: Path, duration_sec: float, chunks: int) -> str:
+    """
+    Compare a stitched output with what one process encoding the whole
+    duration would write: the same frame count at the chunks' frame rate
+    and the same video duration, give or take one frame per chunk
+    boundary. Returns an error message, or "" if they match.
+    """
+    chunk_info = probe_media(first_chunk)
+    info = probe_media(output)
+    if chunk_info is None or info is None or chunk_info.fps <= 0:
+        return "cannot probe stitched output"
+    expected_frames = round(duration_sec * chunk_info.fps)
+    if abs(frames - expected_frames) > chunks:
+        return f"stitched {frames} frames, expected {expected_frames}"
+    actual_sec = (info.video_duration_ms or info.duration_ms) / 1000
+    if abs(actual_sec - duration_sec) > chunks / chunk_info.fps + 0.05:
+        return f"stitched {actual_sec:.3f}s, expected {duration_sec:.3f}s"
+    return ""
+
+
+def encode_segmented_if_long(
+    sources: list[SegmentSource],
+    output: Path,
+    crf: int,
+    audio_args: Optional[list[str]] = None,
+    log_callback: Optional[Callable[[str], None]] = None,
+    cancel_check: Optional[Callable[[], bool]] = None
+) -> Optional[tuple[bool, str]]:
+    """
+    Run encode_segmented when segmented mode is on and the inputs are long
+    enough. Returns None when the caller should encode normally instead
+    (mode off, input short, or the segmented attempt failed for a reason a
+    single-process encode could avoid).
+    """
+    total = sum(source_duration_sec(source) for source in sources)
+    if not segment_count(total):
+        return None
+
+    # Chunks live beside the output so the final stitch stays on one filesystem
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with tempfile.TemporaryDirectory(prefix=".segments_", dir=output.parent) as tmpdir:
+        success, error = encode_segmented(
+            sources, output, Path(tmpdir), crf, audio_args,
+            log_callback=log_callback, cancel_check=cancel_check
+        )
+    if success or classify_failure(error) in UNRECOVERABLE_FAILURES:
+        return success, error
+    if log_callback:
+        log_callback(f"  Segmented encode failed, encoding in one process: {error[-200:]}")
+    return None
@@ -0,0 +1,101 @@
+import shutil
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+# The modules live at the repository root rather than in a package
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from media_probe import (  # noqa: E402
+    MediaInfo,
+    clear_probe_cache,
+    configure_cache_dir,
+    get_cache_dir,
+    remember_media_info,
+)
+
+requires_ffmpeg = pytest.mark.skipif(
+    shutil.which("ffmpeg") is None or shutil.which("ffprobe") is None,
+    reason="ffmpeg is not installed"
+)
+
+
+@pytest.fixture(autouse=True)
+def cache_dir(tmp_path):
+    """Point the on-disk caches at a per-test directory and start with an empty memo."""
+    previous = get_cache_dir()
+    configure_cache_dir(tmp_path / "cache")
+    clear_probe_cache()
+    yield tmp_path / "cache"
+    configure_cache_dir(previous)
+    clear_probe_cache()
+
+
+# Probe data of a typical phone clip: H.264 High 1080x1920 at 30fps, AAC-LC audio
+PHONE_CLIP = dict(
+    format_name="mov,mp4,m4a,3gp,3g2,mj2",
+    duration_ms=8000,
+    has_video=True,
+    width=1080,
+    height=1920,
+    fps=30.0,
+    frame_rate="30/1",
+    video_codec="h264",
+    video_profile="High",
+    video_level=40,
+    pix_fmt="yuv420p",
+    video_time_base="1/15360",
+    video_duration_ms=8000,
+    has_audio=True,
+    audio_codec="aac",
+    audio_profile="LC",
+    audio_channels=2,
+    audio_layout="stereo",
+    sample_rate=48000,
+    audio_duration_ms=8000,
+)
+
+
+@pytest.fixture
+def media_file(tmp_path):
+    """
+    Factory for placeholder files whose probe result is seeded: PHONE_CLIP
+    with the given fields changed. Lets the planners run without ffmpeg.
+    """
+    def make(name: str, **changes) -> Path:
+        path = tmp_path / name
+        path.write_bytes(b"\0")
+        remember_media_info(path, MediaInfo(**{**PHONE_CLIP, **changes}))
+        return path
+
+    return make
+
+
+@pytest.fixture
+def make_video(tmp_path):
+    """Factory for short synthetic H.264 clips rendered from lavfi sources."""
+    def make(
+        name: str = "clip.mp4",
+        duration: float = 1.0,
+        size: str = "320x240",
+        rate: int = 30,
+        audio: bool = True,
+        gop: int = 250
+    ) -> Path:
+        path = tmp_path / name
+        cmd = [
+            'ffmpeg', '-y', '-v', 'error',
+            '-f', 'lavfi', '-i', f"testsrc2=size={size}:rate={rate}:duration={duration}",
+        ]
+        if audio:
+            cmd += ['-f', 'lavfi', '-i', f"sine=frequency=440:sample_rate=48000:duration={duration}"]
+        cmd += ['-c:v', 'libx264', '-preset', 'ultrafast', '-g', str(gop), '-pix_fmt', 'yuv420p']
+        cmd += ['-c:a', 'aac'] if audio else ['-an']
+        subprocess.run([*cmd, str(path)], check=True)
+        return path
+
+    return make
@@ -0,0 +1,69 @@
+import pytest
+
+import ffmpeg_capabilities
+from ffmpeg_capabilities import FFmpegCapabilities, _parse_names, get_capabilities
+
+from conftest import requires_ffmpeg
+
+FILTERS_OUTPUT = """Filters:
+  T.. = Timeline support
+  .S. = Slice threading
+  ..C = Command support
+  A = Audio input/output
+  V = Video input/output
+  | = Source or sink filter
+ ... ass               V->V       Render ASS subtitles onto input video using the libass library.
+ TSC drawtext          V->V       Draw text on top of video frames using libfreetype library.
+ ... anullsrc          |->A       Null audio source, return empty audio frames.
+"""
+
+ENCODERS_OUTPUT = """Encoders:
+ V..... = Video
+ A..... = Audio
+ ------
+ V....D libx264              libx264 H.264 / AVC / MPEG-4 AVC / MPEG-4 part 10 (codec h264)
+ A....D aac                  AAC (Advanced Audio Coding)
+"""
+
+
+@pytest.fixture(autouse=True)
+def empty_memo(monkeypatch):
+    monkeypatch.setattr(ffmpeg_capabilities, "_MEMO", {})
+
+
+def test_parse_names_skips_headers_and_legends():
+    assert _parse_names(FILTERS_OUTPUT) == {"ass", "drawtext", "anullsrc"}
+    assert _parse_names(ENCODERS_OUTPUT) == {"libx264", "aac"}
+
+
+def test_capabilities_round_trip_through_dict():
+    capabilities = FFmpegCapabilities("/usr/bin/ffmpeg", "ffmpeg version 6.0", {"ass"}, {"aac"}, {"h264"})
+
+    assert FFmpegCapabilities.from_dict(capabilities.to_dict()) == capabilities
+    assert capabilities.has_libass
+    assert not FFmpegCapabilities("/usr/bin/ffmpeg", "ffmpeg version 6.0").has_libass
+
+
+def test_get_capabilities_without_ffmpeg(monkeypatch):
+    monkeypatch.setattr(ffmpeg_capabilities.shutil, "which", lambda name: None)
+
+    assert get_capabilities() is None
+
+
+@requires_ffmpeg
+def test_get_capabilities_collects_once_then_loads_from_disk(monkeypatch, cache_dir):
+    capabilities = get_capabilities()
+
+    assert capabilities.version.startswith("ffmpeg version")
+    assert "libx264" in capabilities.encoders
+    assert "h264" in capabilities.decoders
+    assert list((cache_dir / "ffmpeg").glob("capabilities_*.json"))
+
+    def fail(path):
+        raise AssertionError("ffmpeg queried again")
+
+    # A new worker process: empty memo, same binary
+    monkeypatch.setattr(ffmpeg_capabilities, "_MEMO", {})
+    monkeypatch.setattr(ffmpeg_capabilities, "_collect", fail)
+    assert get_capabilities() == capabilities
+    assert get_capabilities() is get_capabilities()
@@ -0,0 +1,242 @@
+import os
+import time
+
+import pytest
+
+import ffmpeg_runner
+from ffmpeg_runner import (
+    UNRECOVERABLE_FAILURES,
+    EncodeProgress,
+    FailureCause,
+    StderrRing,
+    _Watchdog,
+    classify_failure,
+    progress_scope,
+    run_ffmpeg,
+    run_ffmpeg_all,
+    run_ffmpeg_process,
+)
+
+from conftest import requires_ffmpeg
+
+
+def _lavfi_cmd(output, duration=1.0, extra=()):
+    return [
+        'ffmpeg', '-y', '-f', 'lavfi', '-i', f"testsrc2=size=160x120:rate=30:duration={duration}",
+        '-c:v', 'libx264', '-preset', 'ultrafast', *extra, str(output)
+    ]
+
+
+@requires_ffmpeg
+def test_run_ffmpeg_reports_success_and_final_position(tmp_path):
+    output = tmp_path / "out.mp4"
+
+    run = run_ffmpeg_process(_lavfi_cmd(output, duration=2.0))
+
+    assert run.ok and run.returncode == 0
+    assert run.frames == 60
+    assert 1900 <= run.out_time_ms <= 2100
+    assert output.stat().st_size > 0
+
+
+@requires_ffmpeg
+def test_run_ffmpeg_failure_returns_stderr_and_removes_output(tmp_path):
+    output = tmp_path / "out.mp4"
+    output.write_bytes(b"stale")
+
+    success, error = run_ffmpeg(_lavfi_cmd(output, extra=['-c:v', 'no_such_encoder']), output)
+
+    assert not success
+    assert "no_such_encoder" in error
+    assert not output.exists()
+
+
+def test_run_ffmpeg_reports_a_missing_binary(tmp_path):
+    success, error = run_ffmpeg(['reclip-no-such-ffmpeg', '-i', 'in.mp4', 'out.mp4'], tmp_path / "out.mp4")
+
+    assert not success
+    assert error
+
+
+@requires_ffmpeg
+def test_run_ffmpeg_cancel_check_stops_the_process(tmp_path):
+    output = tmp_path / "out.mp4"
+    started = time.monotonic()
+
+    success, error = run_ffmpeg(
+        _lavfi_cmd(output, duration=600), output, cancel_check=lambda: time.monotonic() - started > 0.5
+    )
+
+    assert (success, error) == (False, "Cancelled by user")
+    assert time.monotonic() - started < 10
+    assert not output.exists()
+
+
+@requires_ffmpeg
+def test_run_ffmpeg_all_returns_results_in_order(tmp_path):
+    outputs = [tmp_path / f"out{idx}.mp4" for idx in range(3)]
+
+    results = run_ffmpeg_all([(_lavfi_cmd(output), output) for output in outputs], max_parallel=2)
+
+    assert results == [(True, "")] * 3
+    assert all(output.exists() for output in outputs)
+
+
+@requires_ffmpeg
+def test_run_ffmpeg_all_cancels_siblings_of_a_failed_run(tmp_path):
+    slow = tmp_path / "slow.mp4"
+    broken = tmp_path / "broken.mp4"
+
+    results = run_ffmpeg_all([
+        (_lavfi_cmd(slow, duration=600), slow),
+        (_lavfi_cmd(broken, extra=['-c:v', 'no_such_encoder']), broken),
+    ])
+
+    assert results[0] == (False, "Cancelled by user")
+    assert not results[1][0]
+    assert not slow.exists()
+
+
+@pytest.mark.parametrize("error, cause", [
+    ("Cancelled by user", FailureCause.CANCELLED),
+    ("Stalled: no progress for 120s", FailureCause.STALLED),
+    ("Timed out: over the watchdog budget for its duration", FailureCause.TIMEOUT),
+    ("av_interleaved_write_frame(): No space left on device", FailureCause.OUT_OF_DISK),
+    ("Stream specifier ':a' in filtergraph description [0:a]anull matches no streams.", FailureCause.MISSING_AUDIO),
+    ("Stream map '1:a' matches no streams.", FailureCause.MISSING_AUDIO),
+    (
+        "Input link in1:v0 parameters (size 720x1280, SAR 1:1) do not match the corresponding output link",
+        FailureCause.DIMENSION_MISMATCH,
+    ),
+    ("[libx264 @ 0x1] width not divisible by 2 (1081x1920)", FailureCause.DIMENSION_MISMATCH),
+    ("Unknown encoder 'libfdk_aac'", FailureCause.UNSUPPORTED_CODEC),
+    ("Decoder (codec hevc) not found for input stream #0:0", FailureCause.UNSUPPORTED_CODEC),
+    ("Conversion failed!", FailureCause.UNKNOWN),
+])
+def test_classify_failure(error, cause):
+    assert classify_failure(error) == cause
+
+
+def test_only_input_independent_failures_are_unrecoverable():
+    assert FailureCause.OUT_OF_DISK in UNRECOVERABLE_FAILURES
+    assert FailureCause.MISSING_AUDIO not in UNRECOVERABLE_FAILURES
+    assert FailureCause.DIMENSION_MISMATCH not in UNRECOVERABLE_FAILURES
+    assert FailureCause.UNKNOWN not in UNRECOVERABLE_FAILURES
+
+
+def test_stderr_ring_joins_chunks_and_keeps_the_last_lines():
+    ring = StderrRing(max_lines=3)
+    for chunk in [b"one\ntw", b"o\n\nthree\rfour\nfi", b"ve"]:
+        ring.feed(chunk)
+
+    # Three complete lines plus the unterminated one; blank lines dropped
+    assert ring.lines() == ["two", "three", "four", "five"]
+
+
+def test_stderr_ring_decodes_split_utf8_and_truncates_long_lines():
+    ring = StderrRing()
+    encoded = "caf\u00e9\n".encode()
+    ring.feed(encoded[:4])
+    ring.feed(encoded[4:])
+    ring.feed(b"x" * 5000 + b"\n")
+
+    assert ring.lines()[0] == "caf\u00e9"
+    assert len(ring.lines()[1]) == 1000
+
+
+def _block(out_sec, speed, frame=0):
+    return {"out_time_us": str(int(out_sec * 1_000_000)), "frame": str(frame), "speed": f"{speed}x"}
+
+
+def test_watchdog_budget_starts_from_the_expected_duration():
+    watchdog = _Watchdog(now=1000.0, duration_sec=60.0)
+
+    # 120s base plus the duration at 0.25x realtime
+    assert watchdog.deadline == 1000.0 + 120 + 240
+    assert not watchdog.expired(1359.0)
+    assert watchdog.expired(1360.0)
+
+
+def test_watchdog_extends_the_budget_with_the_live_speed():
+    watchdog = _Watchdog(now=0.0, duration_sec=600.0)
+
+    # 100s in at 0.1x: 500s of output left takes 5000s, doubled for slack
+    watchdog.observe(_block(100, 0.1), now=1000.0)
+
+    assert watchdog.deadline == 1000.0 + 120 + 2 * 500 / 0.1
+
+
+def test_watchdog_gives_no_more_time_past_the_expected_duration():
+    watchdog = _Watchdog(now=0.0, duration_sec=10.0)
+    deadline = watchdog.deadline
+
+    watchdog.observe(_block(30, 0.01), now=150.0)
+
+    assert watchdog.deadline == deadline
+
+
+def test_watchdog_without_duration_only_detects_stalls():
+    watchdog = _Watchdog(now=0.0, duration_sec=None)
+    watchdog.observe(_block(5, 1.0, frame=150), now=10.0)
+    watchdog.observe(_block(5, 1.0, frame=150), now=100.0)  # same position
+
+    assert not watchdog.expired(10 ** 9)
+    assert not watchdog.stalled(10.0 + ffmpeg_runner._STALL_SEC - 1)
+    assert watchdog.stalled(10.0 + ffmpeg_runner._STALL_SEC)
+
+
+@requires_ffmpeg
+@pytest.mark.skipif(not hasattr(os, "mkfifo"), reason="needs named pipes")
+def test_run_ffmpeg_kills_a_stalled_process(tmp_path, monkeypatch):
+    monkeypatch.setattr(ffmpeg_runner, "_STALL_SEC", 1.0)
+    fifo = tmp_path / "input.pipe"
+    os.mkfifo(fifo)  # never written: ffmpeg blocks reading its input
+    output = tmp_path / "out.mp4"
+
+    success, error = run_ffmpeg(['ffmpeg', '-y', '-f', 'h264', '-i', str(fifo), str(output)], output)
+
+    assert not success
+    assert classify_failure(error) == FailureCause.STALLED
+
+
+def test_progress_scope_derives_percent_and_eta_from_the_duration():
+    updates = []
+    with progress_scope(updates.append, 10.0) as scope:
+        scope.emit(4.0, 120, 60.0, 2.0)
+        scope.emit(12.0, 360, 60.0, 2.0)  # past the expected length
+
+    assert updates[0] == EncodeProgress(4.0, 120, 60.0, 2.0, percent=40.0, eta_sec=3.0)
+    assert (updates[1].out_time_sec, updates[1].percent, updates[1].eta_sec) == (10.0, 99.9, 0.0)
+
+
+def test_progress_scope_without_a_duration_or_callback():
+    updates = []
+    with progress_scope(updates.append) as scope:
+        scope.emit(4.0, 120, 60.0, 0.0)
+    with progress_scope(None) as no_scope:
+        pass
+
+    assert (updates[0].percent, updates[0].eta_sec) == (None, None)
+    assert no_scope is None
+
+
+def test_progress_callback_errors_do_not_reach_the_encode():
+    def broken(progress):
+        raise RuntimeError("display closed")
+
+    with progress_scope(broken, 10.0) as scope:
+        scope.emit(1.0, 30, 30.0, 1.0)
+
+
+@requires_ffmpeg
+def test_run_ffmpeg_reports_progress_to_the_open_scope(tmp_path):
+    updates = []
+    with progress_scope(updates.append, 2.0):
+        success, _ = run_ffmpeg(_lavfi_cmd(tmp_path / "out.mp4", duration=2.0), tmp_path / "out.mp4")
+
+    assert success
+    assert updates
+    assert updates[-1].frame == 60
+    assert updates[-1].percent >= 95
+    assert all(update.percent <= 99.9 for update in updates)
+    assert [update.frame for update in updates] == sorted(update.frame for update in updates)
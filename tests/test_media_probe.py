@@ -0,0 +1,219 @@
+import os
+import subprocess
+import sys
+import threading
+import time
+from pathlib import Path
+
+import media_probe
+from media_probe import MediaInfo, parse_ffprobe_output, probe_batch, probe_many, probe_media
+
+from conftest import requires_ffmpeg
+
+FFPROBE_OUTPUT = {
+    "format": {"format_name": "mov,mp4,m4a,3gp,3g2,mj2", "duration": "8.25", "bit_rate": "5000000"},
+    "streams": [
+        {
+            "codec_type": "video",
+            "codec_name": "mjpeg",
+            "disposition": {"attached_pic": 1},
+        },
+        {
+            "codec_type": "video",
+            "codec_name": "h264",
+            "profile": "High",
+            "level": 40,
+            "nb_frames": "241",
+            "width": 1080,
+            "height": 1920,
+            "avg_frame_rate": "30000/1001",
+            "pix_fmt": "yuv420p",
+            "time_base": "1/15360",
+            "duration": "8.125",
+        },
+        {
+            "codec_type": "audio",
+            "codec_name": "aac",
+            "profile": "LC",
+            "channels": 2,
+            "channel_layout": "stereo",
+            "sample_rate": "48000",
+            "duration": "8.000",
+        },
+    ],
+}
+
+
+def test_parse_ffprobe_output_reads_first_real_streams():
+    info = parse_ffprobe_output(FFPROBE_OUTPUT)
+
+    assert info.duration_ms == 8250
+    assert info.bit_rate == 5000000
+    assert info.has_video and info.video_codec == "h264"  # cover art skipped
+    assert (info.width, info.height) == (1080, 1920)
+    assert info.frame_rate == "30000/1001"
+    assert abs(info.fps - 29.97) < 0.01
+    assert (info.video_profile, info.video_level, info.video_frames) == ("High", 40, 241)
+    assert info.video_duration_ms == 8125
+    assert info.has_audio and info.audio_codec == "aac"
+    assert (info.sample_rate, info.audio_channels, info.audio_layout) == (48000, 2, "stereo")
+
+
+def test_parse_ffprobe_output_falls_back_to_stream_durations():
+    data = {"format": {}, "streams": [{"codec_type": "audio", "codec_name": "mp3", "duration": "3.5"}]}
+    info = parse_ffprobe_output(data)
+
+    assert info.duration_ms == 3500
+    assert not info.has_video
+    assert info.is_decodable
+
+
+def test_media_info_from_dict_ignores_unknown_fields():
+    info = MediaInfo.from_dict({"width": 640, "height": 360, "removed_field": 1})
+
+    assert (info.width, info.height) == (640, 360)
+
+
+def test_probe_media_missing_file_returns_none(tmp_path):
+    assert probe_media(tmp_path / "missing.mp4") is None
+
+
+@requires_ffmpeg
+def test_probe_media_reads_a_real_clip(make_video):
+    info = probe_media(make_video(duration=1.0, size="320x240"))
+
+    assert info is not None
+    assert (info.width, info.height) == (320, 240)
+    assert info.video_codec == "h264"
+    assert info.has_audio and info.audio_codec == "aac"
+    assert 900 <= info.duration_ms <= 1200
+
+
+@requires_ffmpeg
+def test_probe_media_is_memoized(make_video, monkeypatch):
+    path = make_video()
+    first = probe_media(path)
+
+    def fail(_path):
+        raise AssertionError("ffprobe ran again")
+
+    monkeypatch.setattr(media_probe, "_run_ffprobe", fail)
+    assert probe_media(path) is first
+
+
+@requires_ffmpeg
+def test_probe_media_uses_disk_cache_across_processes(make_video, monkeypatch):
+    path = make_video()
+    first = probe_media(path)
+    media_probe.clear_probe_cache()  # as in a fresh worker process
+
+    monkeypatch.setattr(media_probe, "_run_ffprobe", lambda _path: None)
+    assert probe_media(path) == first
+
+
+@requires_ffmpeg
+def test_probe_many_keeps_order_and_marks_unreadable(make_video, tmp_path):
+    video = make_video("a.mp4", audio=False)
+    broken = tmp_path / "broken.mp4"
+    broken.write_bytes(b"not a video")
+
+    infos = probe_many([video, broken, Path(tmp_path / "missing.mp4"), video], max_workers=4)
+
+    assert [info is not None for info in infos] == [True, False, False, True]
+    assert not infos[0].has_audio
+
+
+def test_probe_many_is_bounded_by_max_workers(tmp_path, monkeypatch):
+    running = 0
+    peak = 0
+    lock = threading.Lock()
+
+    def slow_probe(path):
+        nonlocal running, peak
+        with lock:
+            running += 1
+            peak = max(peak, running)
+        time.sleep(0.05)
+        with lock:
+            running -= 1
+        return MediaInfo(width=int(path.stem))
+
+    monkeypatch.setattr(media_probe, "probe_media", slow_probe)
+    infos = probe_many([tmp_path / f"{index}.mp4" for index in range(12)], max_workers=3)
+
+    assert [info.width for info in infos] == list(range(12))
+    assert 1 < peak <= 3
+
+
+@requires_ffmpeg
+def test_probe_batch_logs_the_scan_and_counts_ffprobe_runs(make_video, tmp_path):
+    videos = [make_video("a.mp4"), make_video("b.mp4", audio=False)]
+    broken = tmp_path / "broken.mp4"
+    broken.write_bytes(b"not a video")
+    messages = []
+
+    usage = probe_batch([*videos, broken], messages.append)
+
+    assert usage.processes == 3
+    assert len(messages) == 1
+    assert messages[0].startswith("Probed 3 inputs in ")
+    assert messages[0].endswith("(1 unreadable)")
+    assert probe_batch(videos).processes == 0  # memoized
+
+
+@requires_ffmpeg
+def test_disk_cache_is_shared_with_another_process(make_video, cache_dir, monkeypatch):
+    path = make_video()
+    subprocess.run(
+        [sys.executable, "-c", "import sys; from media_probe import probe_media; probe_media(sys.argv[1])", str(path)],
+        cwd=Path(media_probe.__file__).parent,
+        env={**os.environ, "RECLIP_CACHE_DIR": str(cache_dir)},
+        check=True
+    )
+
+    monkeypatch.setattr(media_probe, "_run_ffprobe", lambda _path: None)
+    info = probe_media(path)
+
+    assert info is not None and (info.width, info.height) == (320, 240)
+
+
+def test_disk_cache_follows_file_identity(tmp_path, monkeypatch):
+    probed = []
+
+    def fake_ffprobe(path):
+        probed.append(path.name)
+        return MediaInfo(width=len(probed))
+
+    monkeypatch.setattr(media_probe, "_run_ffprobe", fake_ffprobe)
+    path = tmp_path / "clip.mp4"
+    path.write_bytes(b"first")
+    assert probe_media(path).width == 1
+
+    # A hard-linked copy (e.g. a staged upload) is the same file
+    os.link(path, tmp_path / "linked.mp4")
+    media_probe.clear_probe_cache()
+    assert probe_media(tmp_path / "linked.mp4").width == 1
+
+    # Rewriting the file changes its size and mtime, so it is probed again
+    path.write_bytes(b"rewritten")
+    media_probe.clear_probe_cache()
+    assert probe_media(path).width == 2
+    assert probed == ["clip.mp4", "clip.mp4"]
+
+
+def test_disk_cache_prunes_old_rows(tmp_path, monkeypatch):
+    monkeypatch.setattr(media_probe, "_run_ffprobe", lambda _path: MediaInfo(width=640))
+    path = tmp_path / "clip.mp4"
+    path.write_bytes(b"data")
+    probe_media(path)
+    conn = media_probe._open_disk_cache()
+    with conn:
+        conn.execute(f"UPDATE {media_probe._DISK_CACHE_TABLE} SET probed_at = 0")
+    conn.close()
+
+    monkeypatch.setattr(media_probe, "_DISK_CACHE_PRUNED_PID", None)  # as in a new process
+    conn = media_probe._open_disk_cache()
+    rows = conn.execute(f"SELECT COUNT(*) FROM {media_probe._DISK_CACHE_TABLE}").fetchone()[0]
+    conn.close()
+
+    assert rows == 0
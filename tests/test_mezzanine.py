@@ -0,0 +1,78 @@
+import os
+import time
+
+import pytest
+
+import mezzanine
+from media_probe import probe_media
+from mezzanine import evict_lru, get_mezzanine, touch_cached
+
+from conftest import requires_ffmpeg
+
+
+@pytest.fixture
+def enabled(monkeypatch):
+    monkeypatch.setattr(mezzanine, "_ENABLED", True)
+
+
+def _aged(path, size, age_sec):
+    path.write_bytes(b"\0" * size)
+    stamp = time.time() - age_sec
+    os.utime(path, (stamp, stamp))
+    return path
+
+
+def test_get_mezzanine_is_off_by_default(tmp_path, monkeypatch):
+    monkeypatch.setattr(mezzanine, "_ENABLED", False)
+
+    assert get_mezzanine(tmp_path / "clip.mp4") is None
+
+
+def test_evict_lru_removes_oldest_entries_down_to_budget(tmp_path):
+    old = _aged(tmp_path / "old.mkv", 100, 3 * 3600)
+    middle = _aged(tmp_path / "middle.mkv", 100, 2 * 3600)
+    new = _aged(tmp_path / "new.mkv", 100, 3600)
+
+    assert evict_lru(tmp_path, "*.mkv", 150) == 200
+    assert [old.exists(), middle.exists(), new.exists()] == [False, False, True]
+
+
+def test_evict_lru_spares_recent_and_kept_entries(tmp_path):
+    kept = _aged(tmp_path / "kept.mkv", 100, 3600)
+    recent = _aged(tmp_path / "recent.mkv", 100, 60)
+    other = _aged(tmp_path / "other.txt", 100, 3600)
+
+    assert evict_lru(tmp_path, "*.mkv", 0, keep=kept) == 0
+    assert kept.exists() and recent.exists() and other.exists()
+
+
+def test_evict_lru_removes_stale_temp_files(tmp_path):
+    stale = _aged(tmp_path / "entry.123.tmp.mkv", 100, 2 * 24 * 3600)
+    in_progress = _aged(tmp_path / "entry.456.tmp.mkv", 100, 60)
+
+    evict_lru(tmp_path, "*.mkv", 10 ** 9)
+
+    assert not stale.exists()
+    assert in_progress.exists()
+
+
+def test_touch_cached_marks_use(tmp_path):
+    entry = _aged(tmp_path / "entry.mkv", 10, 3600)
+
+    assert touch_cached(entry)
+    assert time.time() - entry.stat().st_mtime < 60
+    assert not touch_cached(tmp_path / "gone.mkv")
+
+
+@requires_ffmpeg
+def test_get_mezzanine_normalises_once_and_reuses_the_entry(make_video, enabled, cache_dir):
+    source = make_video(size="322x240", rate=25)
+
+    first = get_mezzanine(source)
+    second = get_mezzanine(source)
+
+    assert first is not None and first == second
+    assert first.parent == cache_dir / "mezzanine"
+    info = probe_media(first)
+    assert (info.width, info.height, info.fps) == (322, 240, 30.0)
+    assert info.has_audio and info.audio_codec == "aac"  # copied as is
@@ -0,0 +1,282 @@
+import pytest
+
+import processor
+from ffmpeg_runner import FailureCause
+from media_probe import probe_media
+from processor import (
+    ConcatOrder,
+    OverlayLayer,
+    TextOverlayConfig,
+    VideoMatch,
+    _annexb_first_slice_is_idr,
+    _duration_within_tolerance,
+    apply_text_overlay,
+    find_sequence_matches,
+    get_sequence_counts,
+    plan_audio_passthrough,
+    plan_concat_render,
+    plan_fast_copy,
+    process_video_pair,
+    process_video_sequence,
+)
+
+from conftest import requires_ffmpeg
+
+
+def test_plan_fast_copy_allows_matching_streams(media_file):
+    plan = plan_fast_copy([media_file("a.mp4"), media_file("b.mp4", duration_ms=3000)])
+
+    assert plan.allowed
+    assert plan.reason == "compatible streams"
+
+
+def test_plan_fast_copy_reports_first_mismatch(media_file):
+    files = [media_file("a.mp4"), media_file("b.mp4", width=720, height=1280, frame_rate="25/1")]
+
+    plan = plan_fast_copy(files)
+
+    assert not plan.allowed
+    assert plan.reason == "resolution differs"
+    assert plan.detail == "b.mp4: 1080x1920 vs 720x1280"
+
+
+def test_plan_fast_copy_compares_audio_only_when_both_have_it(media_file):
+    silent = media_file("b.mp4", has_audio=False, audio_codec="", sample_rate=0)
+
+    assert plan_fast_copy([media_file("a.mp4"), silent]).reason == "audio presence differs"
+    assert plan_fast_copy([media_file("c.mp4"), media_file("d.mp4", sample_rate=44100)]).reason == (
+        "audio sample rate differs"
+    )
+
+
+def test_plan_fast_copy_rejects_unprobeable_and_audio_only_inputs(media_file, tmp_path):
+    missing = tmp_path / "missing.mp4"
+    plan = plan_fast_copy([media_file("a.mp4"), missing])
+    assert (plan.allowed, plan.reason, plan.detail) == (False, "probe failed", "missing.mp4")
+
+    plan = plan_fast_copy([media_file("a.mp4"), media_file("song.m4a", has_video=False)])
+    assert (plan.allowed, plan.reason) == (False, "no video stream")
+
+
+def test_duration_within_tolerance():
+    assert _duration_within_tolerance(14100, 14000)
+    assert not _duration_within_tolerance(17000, 14000)
+    # 5% of long outputs
+    assert _duration_within_tolerance(104900, 100000)
+    assert not _duration_within_tolerance(105100, 100000)
+
+
+def test_duration_within_tolerance_fails_a_missing_actual_duration():
+    assert not _duration_within_tolerance(0, 14000)
+    assert _duration_within_tolerance(0, 0)  # nothing expected, nothing to check
+
+
+def test_plan_concat_render_keeps_matching_inputs_unscaled(media_file):
+    plan = plan_concat_render([media_file("a.mp4"), media_file("b.mp4")])
+
+    assert (plan.width, plan.height, plan.with_audio) == (1080, 1920, True)
+    assert "scale=trunc(iw/2)*2:trunc(ih/2)*2" in plan.filter_complex
+    assert "pad=" not in plan.filter_complex
+    assert plan.filter_complex.endswith("[v0][a0][v1][a1]concat=n=2:v=1:a=1[outv][outa]")
+    assert plan.map_args == ['-map', '[outv]', '-map', '[outa]']
+    assert plan.video_filter_complex.endswith("[v0][v1]concat=n=2:v=1:a=0[outv]")
+    assert len(plan.segment_sources) == 2
+
+
+def test_plan_concat_render_scales_other_sizes_and_fills_missing_audio(media_file):
+    files = [
+        media_file("a.mp4"),
+        media_file("b.mp4", width=720, height=1280),
+        media_file("c.mp4", has_audio=False, video_duration_ms=2500),
+    ]
+
+    plan = plan_concat_render(files)
+
+    assert "[1:v]scale=1080:1920:force_original_aspect_ratio=decrease,pad=1080:1920" in plan.filter_complex
+    assert "anullsrc=r=48000:cl=stereo,atrim=duration=2.500[a2]" in plan.filter_complex
+    assert "scale/pad b.mp4 from 720x1280" in plan.notes
+    assert "silent track for c.mp4" in plan.notes
+
+
+def test_plan_concat_render_without_any_audio(media_file):
+    plan = plan_concat_render([media_file("a.mp4", has_audio=False), media_file("b.mp4", has_audio=False)])
+
+    assert not plan.with_audio
+    assert plan.audio_codec == ['-an']
+    assert plan.segment_audio_args is None
+
+
+def test_plan_concat_render_composites_overlays(media_file, tmp_path):
+    image = tmp_path / "text.png"
+    layers = [OverlayLayer(drawtext="drawtext=text=Hi"), OverlayLayer(image=image, duration=2)]
+
+    plan = plan_concat_render([media_file("a.mp4"), media_file("b.mp4")], layers)
+
+    assert "[0:v]drawtext=text=Hi[ov0]" in plan.filter_complex
+    assert plan.extra_inputs == [image]
+    # The rate is converted before the overlay, which would otherwise lose the last frame
+    assert "[1:v]fps=30[base1]" in plan.filter_complex
+    assert "[base1][img1]overlay=x=0:y=0:enable='between(t,0,2)'[ov1]" in plan.filter_complex
+    assert "[ov1]format=yuv420p" in plan.filter_complex
+
+
+def test_plan_concat_render_needs_every_input_probed(media_file, tmp_path):
+    assert plan_concat_render([media_file("a.mp4"), tmp_path / "missing.mp4"]) is None
+
+
+def test_process_video_sequence_stops_on_unrecoverable_failure(media_file, tmp_path, monkeypatch):
+    calls = []
+
+    def render_concat(*args, **kwargs):
+        calls.append(args)
+        return False, "av_interleaved_write_frame(): No space left on device"
+
+    monkeypatch.setattr(processor, "render_concat", render_concat)
+    result = process_video_sequence(
+        "clip", [media_file("a.mp4"), media_file("b.mp4", width=720, height=1280)],
+        tmp_path / "out" / "clip.mp4", tmp_path / "out" / "nested" / "clip.mp4",
+        crf=23, try_fast_copy=False
+    )
+
+    assert not result.success
+    assert result.failure_cause == FailureCause.OUT_OF_DISK
+    assert len(calls) == 1
+    assert not (tmp_path / "out" / "clip.mp4").exists()
+
+
+def test_plan_audio_passthrough_copies_matching_segments(media_file):
+    files = [
+        media_file("a.mp4"),
+        media_file("b.mp4", audio_codec="opus", audio_profile=""),
+        media_file("c.mp4", sample_rate=44100),
+        media_file("d.mp4", has_audio=False),
+        media_file("e.mp4", audio_duration_ms=6000),  # audio ends 2s early
+        media_file("f.mp4"),
+    ]
+
+    plan = plan_audio_passthrough(files, [8000] * len(files))
+
+    assert (plan.sample_rate, plan.layout) == (48000, "stereo")
+    assert plan.copy == [True, False, False, False, False, True]
+
+
+def test_plan_audio_passthrough_takes_the_first_aac_lc_track_as_reference(media_file):
+    files = [media_file("a.mp4", audio_codec="mp3", audio_profile=""), media_file("b.mp4", sample_rate=44100)]
+
+    plan = plan_audio_passthrough(files, [8000, 8000])
+
+    assert plan.sample_rate == 44100
+    assert plan.copy == [False, True]
+
+
+def test_plan_audio_passthrough_needs_an_aac_lc_track(media_file):
+    files = [media_file("a.mp4", audio_profile="HE-AAC"), media_file("b.mp4", has_audio=False)]
+
+    assert plan_audio_passthrough(files, [8000, 8000]) is None
+
+
+def test_annexb_first_slice_is_idr():
+    sps_pps = b"\x00\x00\x00\x01\x67\x64\x00\x28" + b"\x00\x00\x00\x01\x68\xee"
+    sei = b"\x00\x00\x01\x06\x05"
+
+    assert _annexb_first_slice_is_idr(sps_pps + sei + b"\x00\x00\x01\x65\x88")
+    # Open-GOP I-frame: a non-IDR slice, flagged as a keyframe by ffprobe
+    assert not _annexb_first_slice_is_idr(sps_pps + b"\x00\x00\x01\x41\x9a")
+    assert not _annexb_first_slice_is_idr(sps_pps)
+
+
+@requires_ffmpeg
+def test_smart_render_copies_the_tail_and_keeps_every_frame(make_video, tmp_path):
+    source = make_video(duration=4.0, gop=30)
+    output = tmp_path / "out.mp4"
+    messages = []
+    overlay = TextOverlayConfig(text="Hi", x=10, y=10, duration=1, font_size=24, font_color="white")
+
+    success, error = apply_text_overlay(source, output, overlay, log_callback=messages.append)
+
+    assert (success, error) == (True, "")
+    assert any("Smart render: encoding first 1.00s" in message for message in messages)
+    source_info, info = probe_media(source), probe_media(output)
+    assert info.video_frames == source_info.video_frames == 120
+    assert (info.video_profile, info.video_level) == (source_info.video_profile, source_info.video_level)
+    assert info.has_audio
+
+
+@pytest.fixture
+def encodes(monkeypatch):
+    """Commands of the libx264 encodes processor runs."""
+    commands = []
+
+    def spy(run):
+        def wrapper(cmd, *args, **kwargs):
+            if 'libx264' in cmd:
+                commands.append(cmd)
+            return run(cmd, *args, **kwargs)
+        return wrapper
+
+    monkeypatch.setattr(processor, "run_ffmpeg", spy(processor.run_ffmpeg))
+    monkeypatch.setattr(processor, "run_ffmpeg_process", spy(processor.run_ffmpeg_process))
+    return commands
+
+
+@requires_ffmpeg
+def test_process_video_pair_draws_both_overlays_in_the_concat_encode(make_video, tmp_path, encodes):
+    match = VideoMatch("clip", make_video("a.mp4"), make_video("b.mp4", size="160x120"))
+    overlay_a = TextOverlayConfig(text="Hook", x=10, y=10, duration=0, font_size=24, font_color="white")
+    overlay_b = TextOverlayConfig(text="CTA", x=10, y=10, duration=0.5, font_size=24, font_color="yellow")
+    output_flat = tmp_path / "flat" / "clip.mp4"
+    output_nested = tmp_path / "nested" / "clip" / "clip.mp4"
+
+    result = process_video_pair(
+        match, output_flat, output_nested, ConcatOrder.B_THEN_A, crf=23, try_fast_copy=True,
+        overlay_a=overlay_a, overlay_b=overlay_b
+    )
+
+    assert result.success, result.error_message
+    assert (result.fast_copy_attempted, result.fast_copy_reason) == (False, "text overlays active")
+    assert len(encodes) == 1
+    info = probe_media(output_flat)
+    assert (info.width, info.height) == (160, 120)  # B first sets the size
+    assert info.video_frames == 60
+    assert output_nested.stat().st_ino == output_flat.stat().st_ino
+
+
+def test_find_sequence_matches_lines_up_basenames_across_folders(tmp_path):
+    folders = [tmp_path / name for name in ("hook", "body", "cta")]
+    for folder, names in zip(folders, [["2.mp4", "10.mp4"], ["2.mov", "10.mp4"], ["10.mp4", "notes.txt"]]):
+        folder.mkdir()
+        for name in names:
+            (folder / name).write_bytes(b"\0")
+
+    matches = find_sequence_matches(folders)
+
+    assert [match.basename for match in matches] == ["2", "10"]
+    assert matches[0].files == [folders[0] / "2.mp4", folders[1] / "2.mov", None]
+    assert matches[0].status == "Missing 1 of 3"
+    assert matches[1].is_complete
+    assert get_sequence_counts(matches) == (1, 1)
+
+
+@requires_ffmpeg
+def test_process_video_sequence_concatenates_three_parts_in_one_encode(make_video, tmp_path, encodes):
+    files = [
+        make_video("hook.mp4", duration=0.5),
+        make_video("body.mp4", duration=1.0, size="160x120", audio=False),
+        make_video("cta.mp4", duration=0.4, rate=25),
+    ]
+    output_flat = tmp_path / "flat" / "clip.mp4"
+    messages = []
+
+    result = process_video_sequence(
+        "clip", files, output_flat, tmp_path / "nested" / "clip.mp4", crf=23, try_fast_copy=True,
+        labels=["hook", "body", "cta"], log_callback=messages.append
+    )
+
+    assert result.success, result.error_message
+    assert not result.fast_copy_attempted
+    assert "  Video body: body.mp4" in messages
+    assert len(encodes) == 1
+    info = probe_media(output_flat)
+    assert (info.width, info.height) == (320, 240)
+    assert info.video_frames == 15 + 30 + 12  # every part at 30fps
+    assert info.has_audio and abs(info.audio_duration_ms - info.video_duration_ms) < 100
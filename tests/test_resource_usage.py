@@ -0,0 +1,68 @@
+import sys
+import time
+
+from ffmpeg_runner import run_ffmpeg_process
+from resource_usage import ResourceUsage, record_usage, run_measured, usage_scope
+
+from conftest import requires_ffmpeg
+
+MB = 1024 * 1024
+
+
+def test_add_sums_totals_and_keeps_the_peak_rss():
+    usage = ResourceUsage(processes=1, wall_sec=2.0, cpu_sec=1.5, max_rss_bytes=300 * MB, bytes_written=10)
+    usage.add(ResourceUsage(processes=2, wall_sec=1.0, cpu_sec=4.0, max_rss_bytes=100 * MB, bytes_written=5))
+
+    assert usage == ResourceUsage(
+        processes=3, wall_sec=3.0, cpu_sec=5.5, max_rss_bytes=300 * MB, bytes_written=15
+    )
+
+
+def test_describe_and_to_dict():
+    usage = ResourceUsage(processes=1, wall_sec=12.345, cpu_sec=30.06, max_rss_bytes=512 * MB, bytes_written=45 * MB)
+
+    assert usage.describe() == "1 process, 12.3s wall, 30.1s CPU, peak 512 MB, 45.0 MB written"
+    assert usage.to_dict()["wall_sec"] == 12.35
+
+
+def test_record_usage_adds_to_every_open_scope():
+    one = ResourceUsage(processes=1, cpu_sec=1.0)
+    record_usage(one)  # no scope open: dropped
+
+    with usage_scope() as job:
+        record_usage(one)
+        with usage_scope() as item:
+            record_usage(one)
+        record_usage(None)
+
+    assert (job.processes, item.processes) == (2, 1)
+
+
+def test_run_measured_returns_stdout_and_records_the_process():
+    with usage_scope() as usage:
+        returncode, stdout = run_measured([sys.executable, '-c', 'print("hello")'], timeout=30)
+
+    assert (returncode, stdout) == (0, "hello\n")
+    assert usage.processes == 1
+    assert usage.wall_sec > 0
+
+
+def test_run_measured_kills_on_timeout():
+    started = time.monotonic()
+    with usage_scope() as usage:
+        returncode, _ = run_measured([sys.executable, '-c', 'import time; time.sleep(30)'], timeout=0.3)
+
+    assert returncode != 0
+    assert time.monotonic() - started < 10
+    assert usage.processes == 1
+
+
+@requires_ffmpeg
+def test_supervised_ffmpeg_runs_are_counted():
+    with usage_scope() as usage:
+        run = run_ffmpeg_process(['ffmpeg', '-y', '-f', 'lavfi', '-i', 'testsrc2=duration=1', '-f', 'null', '-'])
+
+    assert run.ok
+    assert usage.processes == 1
+    assert usage.cpu_sec > 0
+    assert run.usage.max_rss_bytes > 0
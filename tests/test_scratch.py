@@ -0,0 +1,109 @@
+import errno
+import os
+import time
+from pathlib import Path
+
+import pytest
+
+import scratch
+from scratch import Scratch, link_or_copy, scratch_root, scratch_space
+
+
+@pytest.fixture(autouse=True)
+def no_tmpfs(monkeypatch):
+    monkeypatch.setattr(scratch, "_TMPFS_DIR", None)
+
+
+def test_scratch_space_defaults_to_the_cache_dir_and_is_always_removed(cache_dir):
+    with pytest.raises(RuntimeError):
+        with scratch_space("concat") as space:
+            (space.path / "part.mp4").write_bytes(b"data")
+            assert space.path.parent == cache_dir / "scratch"
+            assert space.path.name.startswith(".scratch_concat_")
+            assert space.small == space.path
+            raise RuntimeError("encode failed")
+
+    assert not space.path.exists()
+
+
+def test_scratch_root_moves_scratch_into_the_job_directory(tmp_path):
+    job_dir = tmp_path / "job" / "scratch"
+    with scratch_root(job_dir), scratch_space() as space:
+        assert space.path.parent == job_dir
+
+
+def test_small_intermediates_go_to_tmpfs(tmp_path, monkeypatch):
+    monkeypatch.setattr(scratch, "_TMPFS_DIR", tmp_path / "shm")
+    (tmp_path / "shm").mkdir()
+
+    with scratch_root(tmp_path / "job"), scratch_space() as space:
+        assert space.small.parent == tmp_path / "shm"
+        assert space.path.parent == tmp_path / "job"
+
+    assert not space.small.exists()
+
+
+def test_publish_renames_into_place(tmp_path):
+    dest = tmp_path / "flat" / "clip.mp4"
+    dest.parent.mkdir()
+    dest.write_bytes(b"old")
+    with scratch_root(tmp_path / "job"), scratch_space() as space:
+        staged = space.path / "clip.mp4"
+        staged.write_bytes(b"new")
+        inode = staged.stat().st_ino
+
+        space.publish(staged, dest)
+
+    assert dest.read_bytes() == b"new"
+    assert dest.stat().st_ino == inode
+
+
+def test_publish_copies_when_scratch_is_on_another_filesystem(tmp_path, monkeypatch):
+    dest = tmp_path / "flat" / "clip.mp4"
+    rename = os.replace
+
+    def no_cross_device_rename(src, dst):
+        if Path(src).parent != Path(dst).parent:
+            raise OSError(errno.EXDEV, "Invalid cross-device link")
+        rename(src, dst)
+
+    monkeypatch.setattr(scratch.os, "replace", no_cross_device_rename)
+    with scratch_root(tmp_path / "job"), scratch_space() as space:
+        staged = space.path / "clip.mp4"
+        staged.write_bytes(b"new")
+
+        space.publish(staged, dest)
+
+    assert dest.read_bytes() == b"new"
+    assert [path.name for path in dest.parent.iterdir()] == ["clip.mp4"]
+
+
+def test_create_sweeps_stale_scratch_only_under_its_root(tmp_path):
+    root = tmp_path / "job"
+    outputs = tmp_path / "outputs"
+    old = time.time() - 2 * 24 * 3600
+    for parent in (root, outputs):
+        (parent / ".scratch_item_crashed").mkdir(parents=True)
+        os.utime(parent / ".scratch_item_crashed", (old, old))
+    (root / ".scratch_item_running").mkdir()
+
+    with scratch_root(root):
+        Scratch.create().cleanup()
+
+    assert not (root / ".scratch_item_crashed").exists()
+    assert (root / ".scratch_item_running").exists()
+    assert (outputs / ".scratch_item_crashed").exists()
+
+
+def test_link_or_copy_hard_links_on_one_filesystem(tmp_path):
+    source = tmp_path / "flat" / "clip.mp4"
+    source.parent.mkdir()
+    source.write_bytes(b"video")
+    dest = tmp_path / "nested" / "a" / "clip.mp4"
+
+    link_or_copy(source, dest)
+
+    assert dest.read_bytes() == b"video"
+    # Nested outputs share the flat output's inode rather than being copies
+    assert dest.stat().st_ino == source.stat().st_ino
+    assert [path.name for path in dest.parent.iterdir()] == ["clip.mp4"]
@@ -0,0 +1,77 @@
+import pytest
+
+import segmented_encode
+from media_probe import probe_media
+from segmented_encode import (
+    SegmentSource,
+    encode_segmented,
+    encode_segmented_if_long,
+    plan_segments,
+    probe_keyframes,
+    segment_count,
+)
+
+from conftest import requires_ffmpeg
+
+
+@pytest.fixture
+def segments(monkeypatch):
+    """Turn segmented mode on for inputs of 2s or more."""
+    monkeypatch.setattr(segmented_encode, "_SEGMENTS", 3)
+    monkeypatch.setattr(segmented_encode, "_MIN_DURATION_SEC", 2.0)
+
+
+def test_segment_count_respects_mode_and_minimum(monkeypatch):
+    monkeypatch.setattr(segmented_encode, "_SEGMENTS", 0)
+    assert segment_count(600) == 0
+
+    monkeypatch.setattr(segmented_encode, "_SEGMENTS", 4)
+    monkeypatch.setattr(segmented_encode, "_MIN_DURATION_SEC", 60.0)
+    assert segment_count(59) == 0
+    assert segment_count(60) == 4
+
+
+def test_plan_segments_cuts_at_keyframes_nearest_the_targets():
+    keyframes = [0.0, 2.0, 4.0, 6.0, 8.0, 10.0, 12.0]
+
+    assert plan_segments(keyframes, 12.5, 3) == [(0.0, 4.0), (4.0, 8.0), (8.0, 12.5)]
+
+
+def test_plan_segments_never_cuts_short_chunks():
+    # Only keyframe is too close to the end to leave a 2s chunk
+    assert plan_segments([0.0, 9.5], 10.0, 4) == [(0.0, 10.0)]
+
+
+@requires_ffmpeg
+def test_probe_keyframes_lists_gop_starts(make_video):
+    keyframes = probe_keyframes(make_video(duration=3.0, gop=30, audio=False))
+
+    assert keyframes == pytest.approx([0.0, 1.0, 2.0], abs=0.01)
+
+
+@requires_ffmpeg
+def test_encode_segmented_matches_source_length(make_video, tmp_path, segments):
+    source = make_video(duration=6.0, gop=30)
+    output = tmp_path / "out.mp4"
+    audio_args = ['-i', str(source), '-map', '0:a', '-c:a', 'aac']
+
+    success, error = encode_segmented(
+        [SegmentSource(source, "[0:v]format=yuv420p[vout]")], output, tmp_path / "work", 30, audio_args
+    )
+
+    assert (success, error) == (True, "")
+    info = probe_media(output)
+    assert info.video_frames == 180
+    assert info.has_audio
+
+
+@requires_ffmpeg
+def test_encode_segmented_removes_a_mismatched_stitch(make_video, tmp_path, segments, monkeypatch):
+    source = make_video(duration=6.0, gop=30, audio=False)
+    output = tmp_path / "out.mp4"
+    monkeypatch.setattr(segmented_encode, "_check_stitched", lambda *args: "stitched 170 frames, expected 180")
+
+    result = encode_segmented_if_long([SegmentSource(source, "[0:v]format=yuv420p[vout]")], output, 30)
+
+    assert result is None  # the caller encodes in one process instead
+    assert not output.exists()
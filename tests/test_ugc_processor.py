@@ -0,0 +1,178 @@
+import os
+import subprocess
+import time
+
+import pytest
+
+import ugc_processor
+from media_probe import MediaInfo, probe_media
+from ugc_processor import (
+    get_normalized_sting,
+    prepare_add1_overlay,
+    prepare_add2_overlay,
+    process_ugc_video,
+)
+
+from conftest import requires_ffmpeg
+
+pytestmark = requires_ffmpeg
+
+
+@pytest.fixture
+def assets(tmp_path, make_video):
+    """add1.png, an add2.mov with alpha and a 1 s end sting of a different size."""
+    add1 = tmp_path / "add1.png"
+    subprocess.run([
+        'ffmpeg', '-y', '-v', 'error', '-f', 'lavfi', '-i', "color=c=red@0.5:size=40x20,format=rgba",
+        '-frames:v', '1', str(add1)
+    ], check=True)
+    add2 = tmp_path / "add2.mov"
+    subprocess.run([
+        'ffmpeg', '-y', '-v', 'error', '-f', 'lavfi', '-i', "testsrc2=size=160x120:rate=30:duration=1",
+        '-vf', "format=rgba,colorchannelmixer=aa=0.5", '-c:v', 'qtrle', '-pix_fmt', 'argb', str(add2)
+    ], check=True)
+    sting = make_video("ClipEnd.mp4", duration=1.0, size="160x120")
+    return add1, add2, sting
+
+
+def _render(input_video, output, assets, messages):
+    add1, add2, sting = assets
+    return process_ugc_video(
+        input_video, output, "", add1, add2, sting,
+        add1_position=(10, 10), enable_captions=False, log_callback=messages.append
+    )
+
+
+def test_single_pass_render_appends_the_sting_in_one_encode(make_video, assets, tmp_path, monkeypatch):
+    monkeypatch.setattr(
+        ugc_processor, "_render_with_cached_sting",
+        lambda *args, **kwargs: (False, "end sting cannot be matched to the main segment")
+    )
+    output = tmp_path / "out" / "main.mp4"
+    messages = []
+
+    result = _render(make_video("main.mp4", duration=4.0), output, assets, messages)
+
+    assert result.success, result.error_message
+    assert "  Rendering overlays + end sting in one pass..." in messages
+    info = probe_media(output)
+    assert (info.width, info.height) == (320, 240)
+    assert info.has_audio
+    # 1.2 s of main clip left after the 2.8 s trim, then the 1 s sting, at 30fps
+    assert info.video_frames == 66
+    assert [path.name for path in output.parent.iterdir()] == ["main.mp4"]
+
+
+def test_failed_single_pass_is_the_last_fallback(make_video, assets, tmp_path, monkeypatch):
+    calls = []
+
+    def fail(name):
+        def render(*args, **kwargs):
+            calls.append(name)
+            return False, "Conversion failed!"
+        return render
+
+    monkeypatch.setattr(ugc_processor, "_render_with_cached_sting", fail("cached sting"))
+    monkeypatch.setattr(ugc_processor, "_render_single_pass", fail("single pass"))
+    output = tmp_path / "out" / "main.mp4"
+    messages = []
+
+    result = _render(make_video("main.mp4", duration=4.0), output, assets, messages)
+
+    assert not result.success
+    assert calls == ["cached sting", "single pass"]
+    assert "  Single-pass render failed: Conversion failed!" in messages
+    assert not output.exists()
+
+
+def test_cached_sting_is_normalised_once_and_appended_by_stream_copy(make_video, assets, tmp_path, cache_dir):
+    messages = []
+    first = _render(make_video("first.mp4", duration=4.0), tmp_path / "out" / "first.mp4", assets, messages)
+    second = _render(make_video("second.mp4", duration=4.0), tmp_path / "out" / "second.mp4", assets, messages)
+
+    assert first.success and second.success
+    assert sum(message.startswith("  Normalising end sting") for message in messages) == 1
+    assert "  Using cached end sting (320x240)" in messages
+    assert len(list((cache_dir / "stings").glob("*.mp4"))) == 1
+    assert probe_media(tmp_path / "out" / "second.mp4").video_frames == 66
+
+
+def test_normalised_sting_matches_the_reference(make_video, assets):
+    _, _, sting = assets
+    reference = probe_media(make_video("main.mp4"))
+
+    cached = get_normalized_sting(sting, reference)
+
+    info = probe_media(cached)
+    assert (info.width, info.height) == (reference.width, reference.height)
+    assert info.frame_rate == reference.frame_rate
+    assert info.video_profile == reference.video_profile
+    assert info.video_time_base == reference.video_time_base
+    assert (info.sample_rate, info.audio_layout) == (reference.sample_rate, reference.audio_layout)
+
+
+def test_normalised_stings_are_evicted_beyond_their_budget(make_video, assets, cache_dir, monkeypatch):
+    _, _, sting = assets
+    stale = cache_dir / "stings" / "stale.mp4"
+    stale.parent.mkdir(parents=True)
+    stale.write_bytes(b"\0" * 1024)
+    old = time.time() - 3600
+    os.utime(stale, (old, old))
+    monkeypatch.setattr(ugc_processor, "_STING_CACHE_MAX_BYTES", 0)
+
+    cached = get_normalized_sting(sting, probe_media(make_video("main.mp4")))
+
+    assert cached.exists()
+    assert not stale.exists()
+
+
+def test_normalised_sting_needs_an_h264_reference(assets):
+    _, _, sting = assets
+    reference = MediaInfo(video_codec="hevc", video_profile="Main", width=320, height=240)
+
+    assert get_normalized_sting(sting, reference) is None
+
+
+def test_add1_is_prescaled_once(assets, monkeypatch):
+    add1, _, _ = assets
+
+    cached = prepare_add1_overlay(add1)
+
+    info = probe_media(cached)
+    assert (info.width, info.height) == (52, 26)  # 40x20 at ADD1_SCALE
+    monkeypatch.setattr(ugc_processor, "_render_to_cache", lambda *args: (False, "rendered again"))
+    assert prepare_add1_overlay(add1) == cached
+
+
+def test_add2_is_stored_at_the_target_size_with_alpha(assets, monkeypatch):
+    _, add2, _ = assets
+
+    cached = prepare_add2_overlay(add2, 320, 240, 0.5)
+
+    info = probe_media(cached)
+    assert cached.suffix == ".mkv"
+    assert (info.video_codec, info.pix_fmt) == ("ffv1", "yuva420p")
+    assert (info.width, info.height) == (320, 240)
+    monkeypatch.setattr(ugc_processor, "_render_to_cache", lambda *args: (False, "rendered again"))
+    assert prepare_add2_overlay(add2, 320, 240, 0.5) == cached
+    assert prepare_add2_overlay(add2, 320, 240, 0.8) is None  # another opacity is another entry
+
+
+def test_add2_derivatives_are_evicted_beyond_their_budget(assets, cache_dir, monkeypatch):
+    _, add2, _ = assets
+    overlays = cache_dir / "overlays"
+    overlays.mkdir(parents=True)
+    old = time.time() - 3600
+    for name in ("add2_1_old_320x240_0.5.mov", "add1_2_kept_1.3.png"):
+        (overlays / name).write_bytes(b"\0" * 1024)
+        os.utime(overlays / name, (old, old))
+    monkeypatch.setattr(ugc_processor, "_OVERLAY_CACHE_MAX_BYTES", 0)
+
+    cached = prepare_add2_overlay(add2, 320, 240, 0.5)
+
+    assert sorted(path.name for path in overlays.iterdir()) == ["add1_2_kept_1.3.png", cached.name]
+
+
+def test_missing_overlay_assets_are_not_prepared(tmp_path):
+    assert prepare_add1_overlay(tmp_path / "add1.png") is None
+    assert prepare_add2_overlay(tmp_path / "add2.mov", 320, 240, 0.5) is None
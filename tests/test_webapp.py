@@ -0,0 +1,106 @@
+import importlib
+import subprocess
+from types import SimpleNamespace
+
+import pytest
+from redis import Redis
+
+from ffmpeg_runner import EncodeProgress
+
+from conftest import requires_ffmpeg
+
+
+@pytest.fixture(scope="module")
+def main(tmp_path_factory):
+    """
+    webapp.main, imported with its data dir in a temp directory and without
+    a Redis server (the queue connects lazily).
+    """
+    with pytest.MonkeyPatch.context() as patch:
+        patch.setenv("RECLIP_DATA_DIR", str(tmp_path_factory.mktemp("data")))
+        patch.delenv("RECLIP_CACHE_DIR", raising=False)
+        patch.setattr(Redis, "ping", lambda self, **kwargs: True)
+        yield importlib.import_module("webapp.main")
+
+
+@pytest.fixture
+def storage(main):
+    return importlib.import_module("webapp.storage")
+
+
+def test_validate_renditions_accepts_valid_variants(main):
+    main._validate_renditions([
+        main.RenditionConfig(name="720p", width=720, height=1280),
+        main.RenditionConfig(name="small_crf", crf=28),
+    ])
+
+
+@pytest.mark.parametrize("renditions, detail", [
+    ([{"name": "bad name"}], "Invalid rendition name: 'bad name'"),
+    ([{"name": "720p"}, {"name": "720p"}], "Duplicate rendition name: 720p"),
+    ([{"name": "wide", "width": 720}], "Rendition width and height must be set together."),
+    ([{"name": "odd", "width": 721, "height": 1280}], "Rendition width and height must be even and positive."),
+    ([{"name": "neg", "width": -720, "height": -1280}], "Rendition width and height must be even and positive."),
+    ([{"name": "crf", "crf": 52}], "Rendition crf must be between 0 and 51."),
+])
+def test_validate_renditions_rejects_invalid_variants(main, renditions, detail):
+    with pytest.raises(main.HTTPException) as excinfo:
+        main._validate_renditions([main.RenditionConfig(**rendition) for rendition in renditions])
+
+    assert excinfo.value.status_code == 400
+    assert excinfo.value.detail == detail
+
+
+def _save(storage, path):
+    with open(path, "rb") as f:
+        return storage.save_upload(SimpleNamespace(filename=path.name, file=f))
+
+
+def test_save_upload_rejects_undecodable_files(storage, tmp_path):
+    path = tmp_path / "notes.mp4"
+    path.write_bytes(b"not a video")
+
+    with pytest.raises(storage.InvalidUploadError, match="Not a decodable media file"):
+        _save(storage, path)
+
+    assert not list(storage.UPLOADS_DIR.glob("*notes.mp4"))
+
+
+@requires_ffmpeg
+def test_save_upload_rejects_audio_only_files(storage, tmp_path):
+    path = tmp_path / "song.m4a"
+    subprocess.run(
+        ['ffmpeg', '-y', '-v', 'error', '-f', 'lavfi', '-i', 'sine=duration=1', '-c:a', 'aac', str(path)],
+        check=True
+    )
+
+    with pytest.raises(storage.InvalidUploadError, match="No video stream in song.m4a"):
+        _save(storage, path)
+
+    assert not list(storage.UPLOADS_DIR.glob("*song.m4a"))
+
+
+@pytest.fixture
+def tasks(main):
+    return importlib.import_module("webapp.tasks")
+
+
+def test_progress_reporter_publishes_the_job_percent_throttled(tasks, monkeypatch):
+    updates = []
+    monkeypatch.setattr(tasks, "update_job", lambda job_id, **fields: updates.append((job_id, fields)))
+    report = tasks._progress_reporter("job1", current=2, total=4)
+    progress = EncodeProgress(3.0, frame=90, fps=45.04, speed=1.5, percent=50.0, eta_sec=2.4)
+
+    report(progress)
+    report(progress)  # within the interval
+
+    assert updates == [("job1", {"progress": {
+        "percent": 37.5, "item_percent": 50.0, "fps": 45.0, "speed": 1.5, "eta_sec": 2,
+    }})]
+
+
+def test_item_progress_starts_each_item_without_encode_figures(tasks):
+    assert tasks._item_progress(3, 4) == {
+        "current": 3, "total": 4, "percent": 50.0,
+        "item_percent": None, "fps": None, "speed": None, "eta_sec": None,
+    }
@@ -8,13 +8,36 @@ Handles video processing with:
 - Caption burning with custom fonts
 """
 
+import hashlib
+import json
 import os
-import subprocess
-import tempfile
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from pathlib import Path
 from typing import Callable, Optional
-import json
+
+from ffmpeg_capabilities import get_capabilities
+from ffmpeg_runner import (
+    UNRECOVERABLE_FAILURES,
+    EncodeProgress,
+    FailureCause,
+    classify_failure,
+    progress_scope,
+    run_ffmpeg,
+)
+from media_probe import MediaInfo, get_cache_dir, probe_media
+from mezzanine import evict_lru, touch_cached
+from processor import (
+    MP4_AUDIO_CODECS,
+    X264_PROFILES,
+    Rendition,
+    encode_renditions,
+    plan_fast_copy,
+    rendition_targets,
+    split_outputs,
+    try_fast_copy_concat,
+)
+from scratch import Scratch
+from segmented_encode import SegmentSource, encode_segmented_if_long
 
 # Video extensions to recognize
 VIDEO_EXTENSIONS = {'.mp4', '.mov', '.avi', '.mkv', '.wmv', '.flv', '.webm', '.m4v', '.mpg', '.mpeg', '.3gp'}
@@ -22,6 +45,21 @@ VIDEO_EXTENSIONS = {'.mp4', '.mov', '.avi', '.mkv', '.wmv', '.flv', '.webm', '.m
 # Default assets path
 ASSETS_DIR = Path(__file__).parent / "assets"
 
+# Bump when the end sting normalisation recipe changes
+_STING_CACHE_VERSION = 1
+# Disk budget for the normalised stings (one per output stream layout)
+_STING_CACHE_MAX_BYTES = int(float(os.getenv("RECLIP_STING_CACHE_MAX_GB", "2") or 2) * 1024 ** 3)
+
+# add1.png is drawn at this multiple of its original size
+ADD1_SCALE = 1.3
+
+# Bump when the overlay derivative recipe changes
+_OVERLAY_CACHE_VERSION = 2
+# Disk budget for the prepared add2 derivatives (one per size and opacity)
+_OVERLAY_CACHE_MAX_BYTES = int(float(os.getenv("RECLIP_OVERLAY_CACHE_MAX_GB", "2") or 2) * 1024 ** 3)
+
+_ASSET_HASHES: dict[tuple[str, int, int], str] = {}
+
 
 @dataclass
 class TranscriptWord:
@@ -37,41 +75,22 @@ class UGCProcessingResult:
     filename: str
     success: bool
     error_message: Optional[str] = None
+    renditions: list[Path] = field(default_factory=list)  # extra variants written
+    failure_cause: Optional[FailureCause] = None
 
 
 def get_video_duration_ms(file_path: Path) -> int:
     """Get video duration in milliseconds using ffprobe."""
-    try:
-        cmd = [
-            'ffprobe', '-v', 'error',
-            '-show_entries', 'format=duration',
-            '-of', 'json',
-            str(file_path)
-        ]
-        result = subprocess.run(cmd, capture_output=True, text=True, timeout=30)
-        data = json.loads(result.stdout)
-        duration_sec = float(data['format']['duration'])
-        return int(duration_sec * 1000)
-    except Exception as e:
-        return 0
+    info = probe_media(file_path)
+    return info.duration_ms if info else 0
 
 
 def get_video_dimensions(file_path: Path) -> tuple[int, int]:
     """Get video width and height using ffprobe."""
-    try:
-        cmd = [
-            'ffprobe', '-v', 'error',
-            '-select_streams', 'v:0',
-            '-show_entries', 'stream=width,height',
-            '-of', 'json',
-            str(file_path)
-        ]
-        result = subprocess.run(cmd, capture_output=True, text=True, timeout=30)
-        data = json.loads(result.stdout)
-        stream = data['streams'][0]
-        return int(stream['width']), int(stream['height'])
-    except Exception:
-        return 1920, 1080  # Default fallback
+    info = probe_media(file_path)
+    if info and info.width and info.height:
+        return info.width, info.height
+    return 1920, 1080  # Default fallback
 
 
 def transcribe_with_assemblyai(
@@ -212,7 +231,9 @@ def process_ugc_video(
     crf: int = 18,
     enable_captions: bool = True,
     log_callback: Optional[Callable[[str], None]] = None,
-    cancel_check: Optional[Callable[[], bool]] = None
+    cancel_check: Optional[Callable[[], bool]] = None,
+    renditions: Optional[list[Rendition]] = None,
+    progress_callback: Optional[Callable[[EncodeProgress], None]] = None
 ) -> UGCProcessingResult:
     """
     Process a single UGC video with:
@@ -221,6 +242,10 @@ def process_ugc_video(
     3. add2.mov overlay with reduced opacity
     4. ClipEnd.mov concatenated at the end
 
+    Renditions (other sizes/CRFs) are written beside output_path, encoded
+    from the same decode and composite where the render path allows.
+    progress_callback receives the progress of the render passes.
+
     Layer order (bottom to top):
     - Base video
     - Captions (burned in) - only if enable_captions=True
@@ -235,11 +260,13 @@ def process_ugc_video(
         return UGCProcessingResult(
             filename=input_video.name,
             success=False,
-            error_message="Cancelled by user"
+            error_message="Cancelled by user",
+            failure_cause=FailureCause.CANCELLED
         )
 
+    scratch: Optional[Scratch] = None
     try:
-        # Get video properties
+        # Get video properties (single ffprobe call, memoized)
         video_width, video_height = get_video_dimensions(input_video)
         video_duration_ms = get_video_duration_ms(input_video)
         video_duration_sec = video_duration_ms / 1000
@@ -252,13 +279,21 @@ def process_ugc_video(
             log_callback(f"  Video: {video_width}x{video_height}, {video_duration_sec:.1f}s")
             log_callback(f"  Trimming last {trim_amount_sec}s -> {trimmed_duration_sec:.1f}s + ClipEnd")
 
-        # Create temporary files
-        temp_dir = tempfile.mkdtemp(prefix="ugc_")
-        ass_file = Path(temp_dir) / "captions.ass"
-        intermediate_video = Path(temp_dir) / "intermediate.mp4"
+        # Intermediates and the output are written to scratch; the output is
+        # moved into place once complete
+        scratch = Scratch.create("ugc")
+        ass_file = scratch.small / "captions.ass"
+        staged_output = scratch.path / output_path.name
 
         words = []
 
+        capabilities = get_capabilities()
+        if enable_captions and capabilities and not capabilities.has_libass:
+            # Burning captions needs the ass filter; skip the transcription too
+            if log_callback:
+                log_callback(f"  Warning: FFmpeg was built without libass, captions disabled")
+            enable_captions = False
+
         # Step 1: Transcribe with AssemblyAI (only if captions enabled)
         if enable_captions:
             if log_callback:
@@ -295,126 +330,124 @@ def process_ugc_video(
         if log_callback:
             log_callback(f"  Step 3: Applying overlays to trimmed video...")
 
-        # Build the filter complex for all overlays
-        # Layer order (bottom to top): video -> captions -> add2.mov -> add1.png
-
-        filter_parts = []
-        current_label = "0:v"
-
-        # Apply captions first (lowest overlay layer)
-        if words and ass_file.exists():
-            # Escape the path for FFmpeg (handle special characters)
-            ass_path_escaped = str(ass_file).replace("\\", "/").replace(":", "\\:")
-            filter_parts.append(f"[{current_label}]ass='{ass_path_escaped}'[captioned]")
-            current_label = "captioned"
-
-        # Overlay add2.mov with opacity (below add1)
-        if add2_overlay.exists():
-            opacity = add2_opacity
-            # add2 is input 1 (first overlay input)
-            filter_parts.append(
-                f"[1:v]scale={video_width}:{video_height},format=rgba,colorchannelmixer=aa={opacity}[add2_alpha];"
-                f"[{current_label}][add2_alpha]overlay=0:0:shortest=1[with_add2]"
-            )
-            current_label = "with_add2"
-
-        # Overlay add1.png at specified position (on top of add2)
-        # Scale add1 to 1.3x its original size
-        if add1_overlay.exists():
-            x_pos, y_pos = add1_position
-            # add1 is input 2 if add2 exists, otherwise input 1
-            add1_input_idx = 2 if add2_overlay.exists() else 1
-            # Scale add1 by 1.3x (iw=input width, ih=input height)
-            filter_parts.append(
-                f"[{add1_input_idx}:v]scale=iw*1.3:ih*1.3[add1_scaled];"
-                f"[{current_label}][add1_scaled]overlay={x_pos}:{y_pos}[with_add1]"
-            )
-            current_label = "with_add1"
-
-        # Combine filter parts
-        filter_complex = ";".join(filter_parts)
-        if filter_parts:
-            filter_complex += f";[{current_label}]copy[vout]"
-        else:
-            filter_complex = "[0:v]copy[vout]"
-
-        # Build FFmpeg command for overlays
-        # Use -t to trim to the desired duration (cutting off last 2.8s)
-        cmd = ['ffmpeg', '-y', '-t', str(trimmed_duration_sec), '-i', str(input_video)]
-
-        # Add overlay inputs (add2 first, then add1 - order matters for input indices)
-        if add2_overlay.exists():
-            # Use -stream_loop to loop the video if it's shorter than the main clip
-            # -1 means loop indefinitely, overlay's shortest=1 will stop at main video end
-            cmd.extend(['-stream_loop', '-1', '-i', str(add2_overlay)])
-        if add1_overlay.exists():
-            cmd.extend(['-i', str(add1_overlay)])
-
-        cmd.extend([
-            '-filter_complex', filter_complex,
-            '-map', '[vout]',
-            '-map', '0:a?',  # Map audio if exists
-            '-c:v', 'libx264',
-            '-preset', 'medium',
-            '-crf', str(crf),
-            '-c:a', 'aac',
-            '-b:a', '192k',
-            '-movflags', '+faststart',
-            str(intermediate_video)
-        ])
-
-        if log_callback:
-            log_callback(f"  Running FFmpeg overlay pass...")
-
-        result = subprocess.run(cmd, capture_output=True, text=True, timeout=600)
+        # Pre-scaled add1 / pre-scaled, pre-faded add2 from the derivative
+        # cache, so the per-video graph only composites
+        add1_prepared = prepare_add1_overlay(add1_overlay, log_callback, cancel_check)
+        add2_prepared = prepare_add2_overlay(
+            add2_overlay, video_width, video_height, add2_opacity, log_callback, cancel_check
+        )
 
-        if result.returncode != 0:
-            if log_callback:
-                log_callback(f"  FFmpeg overlay error: {result.stderr[-500:]}")
-            return UGCProcessingResult(
-                filename=input_video.name,
-                success=False,
-                error_message=f"FFmpeg overlay failed: {result.stderr[-200:]}"
-            )
+        overlay_inputs, filter_parts, current_label = _build_overlay_graph(
+            ass_file if words and ass_file.exists() else None,
+            add1_overlay,
+            add2_overlay,
+            add1_position,
+            add2_opacity,
+            video_width,
+            video_height,
+            add1_prepared=add1_prepared,
+            add2_prepared=add2_prepared
+        )
 
-        # Step 4: Concatenate with ClipEnd.mov
-        if log_callback:
-            log_callback(f"  Step 4: Appending end sting...")
-
-        if clip_end.exists():
-            success = concatenate_with_end_sting(
-                intermediate_video,
-                clip_end,
-                output_path,
-                crf,
-                log_callback,
-                cancel_check
-            )
-        else:
-            # No end sting, just copy intermediate to output
-            import shutil
-            shutil.copy2(intermediate_video, output_path)
-            success = True
-
-        # Cleanup temp files
-        try:
-            import shutil
-            shutil.rmtree(temp_dir)
-        except:
-            pass
+        # Step 4: Render the main segment and append the cached, pre-normalised
+        # end sting by stream copy; fall back to one encode of everything
+        renditions_done = not renditions
+        sting_ms = get_video_duration_ms(clip_end) if clip_end.exists() else 0
+        with progress_scope(progress_callback, trimmed_duration_sec + sting_ms / 1000):
+            if clip_end.exists():
+                if log_callback:
+                    log_callback(f"  Step 4: Rendering main segment + cached end sting...")
+
+                success, error = _render_with_cached_sting(
+                    input_video,
+                    trimmed_duration_sec,
+                    overlay_inputs,
+                    filter_parts,
+                    current_label,
+                    clip_end,
+                    scratch.path,
+                    staged_output,
+                    crf,
+                    log_callback,
+                    cancel_check,
+                    renditions
+                )
+                renditions_done = success
+                if not success and not _gives_up(error, cancel_check):
+                    if log_callback:
+                        log_callback(f"  Cached sting append unavailable: {error[-300:]}")
+                        log_callback(f"  Rendering overlays + end sting in one pass...")
+                    success, error = _render_single_pass(
+                        input_video,
+                        trimmed_duration_sec,
+                        overlay_inputs,
+                        filter_parts,
+                        current_label,
+                        clip_end,
+                        staged_output,
+                        video_width,
+                        video_height,
+                        crf,
+                        cancel_check,
+                        renditions
+                    )
+                    renditions_done = success
+                if not success and log_callback and not _gives_up(error, cancel_check):
+                    log_callback(f"  Single-pass render failed: {error[-300:]}")
+            else:
+                # No end sting: the overlay pass writes the final output directly
+                if log_callback:
+                    log_callback(f"  Step 4: No end sting, rendering overlays only...")
+                main_info = probe_media(input_video)
+                main_has_audio = bool(main_info and main_info.has_audio)
+                copy_audio = _passthrough_audio(main_info)
+                result = None
+                if not renditions:
+                    result = _segmented_overlay_pass(
+                        input_video, trimmed_duration_sec, overlay_inputs, filter_parts,
+                        current_label, crf, staged_output, False, main_has_audio, main_has_audio,
+                        log_callback, cancel_check, copy_audio=copy_audio
+                    )
+                if result is not None:
+                    success, error = result
+                else:
+                    cmd = _build_overlay_pass_cmd(
+                        input_video, trimmed_duration_sec, overlay_inputs,
+                        filter_parts, current_label, crf, staged_output, copy_audio=copy_audio,
+                        renditions=renditions
+                    )
+                    success, error = run_ffmpeg(cmd, staged_output, cancel_check)
+                    renditions_done = success and all(
+                        rendition.output_path(staged_output).exists() for rendition in renditions or []
+                    )
+                if not success and log_callback:
+                    log_callback(f"  FFmpeg overlay error: {error[-500:]}")
+
+            if success and not renditions_done:
+                # A rendition the render did not write is derived from the main output
+                success, error = encode_renditions(
+                    staged_output, staged_output, renditions, crf, log_callback, cancel_check
+                )
+                if not success and log_callback:
+                    log_callback(f"  Rendition encode failed: {error[-300:]}")
 
         if success:
+            scratch.publish(staged_output, output_path)
+            for rendition in renditions or []:
+                scratch.publish(rendition.output_path(staged_output), rendition.output_path(output_path))
             if log_callback:
                 log_callback(f"  Success! Output: {output_path.name}")
             return UGCProcessingResult(
                 filename=input_video.name,
-                success=True
+                success=True,
+                renditions=[rendition.output_path(output_path) for rendition in renditions or []]
             )
         else:
             return UGCProcessingResult(
                 filename=input_video.name,
                 success=False,
-                error_message="Failed to concatenate end sting"
+                error_message="Failed to render UGC video",
+                failure_cause=classify_failure(error)
             )
 
     except Exception as e:
@@ -425,103 +458,623 @@ def process_ugc_video(
             success=False,
             error_message=str(e)
         )
+    finally:
+        if scratch is not None:
+            scratch.cleanup()
+
+
+def _gives_up(error: str, cancel_check: Optional[Callable[[], bool]]) -> bool:
+    """True when a failed render step should not fall back to the next one."""
+    if cancel_check and cancel_check():
+        return True
+    return classify_failure(error) in UNRECOVERABLE_FAILURES
+
+
+def _build_overlay_graph(
+    ass_file: Optional[Path],
+    add1_overlay: Path,
+    add2_overlay: Path,
+    add1_position: tuple[int, int],
+    add2_opacity: float,
+    video_width: int,
+    video_height: int,
+    add1_prepared: Optional[Path] = None,
+    add2_prepared: Optional[Path] = None
+) -> tuple[list[str], list[str], str]:
+    """
+    Build the overlay part of the UGC filter graph for input 0.
+    Returns (extra input args, filter parts, label of the composited video).
+    Prepared derivatives (see prepare_add1_overlay / prepare_add2_overlay)
+    are composited as-is instead of being scaled and faded per frame.
+
+    Layer order (bottom to top): video -> captions -> add2.mov -> add1.png
+    """
+    overlay_inputs: list[str] = []
+    filter_parts = []
+    current_label = "0:v"
+    next_input_idx = 1
+
+    # Apply captions first (lowest overlay layer)
+    if ass_file is not None:
+        # Escape the path for FFmpeg (handle special characters)
+        ass_path_escaped = str(ass_file).replace("\\", "/").replace(":", "\\:")
+        filter_parts.append(f"[{current_label}]ass='{ass_path_escaped}'[captioned]")
+        current_label = "captioned"
+
+    # Overlay add2.mov with opacity (below add1)
+    if add2_prepared is not None:
+        overlay_inputs.extend(['-stream_loop', '-1', '-i', str(add2_prepared)])
+        filter_parts.append(
+            f"[{current_label}][{next_input_idx}:v]overlay=0:0:shortest=1[with_add2]"
+        )
+        current_label = "with_add2"
+        next_input_idx += 1
+    elif add2_overlay.exists():
+        # Use -stream_loop to loop the video if it's shorter than the main clip
+        # -1 means loop indefinitely, overlay's shortest=1 will stop at main video end
+        overlay_inputs.extend(['-stream_loop', '-1', '-i', str(add2_overlay)])
+        filter_parts.append(
+            f"[{next_input_idx}:v]scale={video_width}:{video_height},format=rgba,"
+            f"colorchannelmixer=aa={add2_opacity}[add2_alpha];"
+            f"[{current_label}][add2_alpha]overlay=0:0:shortest=1[with_add2]"
+        )
+        current_label = "with_add2"
+        next_input_idx += 1
+
+    # Overlay add1.png at specified position (on top of add2)
+    # Scale add1 to 1.3x its original size
+    if add1_prepared is not None:
+        x_pos, y_pos = add1_position
+        overlay_inputs.extend(['-i', str(add1_prepared)])
+        filter_parts.append(
+            f"[{current_label}][{next_input_idx}:v]overlay={x_pos}:{y_pos}[with_add1]"
+        )
+        current_label = "with_add1"
+    elif add1_overlay.exists():
+        x_pos, y_pos = add1_position
+        overlay_inputs.extend(['-i', str(add1_overlay)])
+        # Scale add1 by 1.3x (iw=input width, ih=input height)
+        filter_parts.append(
+            f"[{next_input_idx}:v]scale=iw*{ADD1_SCALE}:ih*{ADD1_SCALE}[add1_scaled];"
+            f"[{current_label}][add1_scaled]overlay={x_pos}:{y_pos}[with_add1]"
+        )
+        current_label = "with_add1"
+
+    return overlay_inputs, filter_parts, current_label
+
+
+def _normalized_main(filter_parts: list[str], current_label: str) -> tuple[list[str], str]:
+    """
+    The overlay graph with input 0 converted to 30fps before anything is
+    drawn on it. fps placed after an overlay drops the main clip's last
+    frame (the overlay's end of stream carries no frame duration).
+    """
+    parts = ["[0:v]fps=30[main]"]
+    parts.extend(part.replace("[0:v]", "[main]") for part in filter_parts)
+    return parts, "main" if current_label == "0:v" else current_label
+
+
+def _build_overlay_pass_cmd(
+    input_video: Path,
+    trimmed_duration_sec: float,
+    overlay_inputs: list[str],
+    filter_parts: list[str],
+    current_label: str,
+    crf: int,
+    output_path: Path,
+    copy_audio: bool = False,
+    renditions: Optional[list[Rendition]] = None
+) -> list[str]:
+    """
+    FFmpeg command that trims the main video and applies the overlays.
+    copy_audio passes the source audio through untouched. Deliverable
+    renditions are split off the same composite.
+    """
+    # Combine filter parts
+    filter_complex = ";".join(filter_parts)
+    if filter_parts:
+        filter_complex += f";[{current_label}]copy[vout]"
+    else:
+        filter_complex = "[0:v]copy[vout]"
+
+    # Use -t to trim to the desired duration (cutting off last 2.8s)
+    cmd = ['ffmpeg', '-y', '-t', str(trimmed_duration_sec), '-i', str(input_video)]
+    cmd.extend(overlay_inputs)
+    filter_complex, output_args = split_outputs(
+        filter_complex,
+        ['-map', '[vout]', '-map', '0:a?'],  # Map audio if exists
+        ['-c:a', 'copy'] if copy_audio else ['-c:a', 'aac', '-b:a', '192k'],
+        rendition_targets(output_path, crf, renditions)
+    )
+    cmd.extend(['-filter_complex', filter_complex, *output_args])
+    return cmd
+
+
+def _passthrough_audio(info: Optional[MediaInfo], concat_ready: bool = False) -> bool:
+    """
+    Whether info's first audio stream can be stream-copied into an MP4
+    output. With concat_ready it must also be AAC-LC, which the cached
+    end sting can be encoded to match.
+    """
+    if not info or not info.has_audio:
+        return False
+    if concat_ready:
+        return info.audio_codec == "aac" and info.audio_profile in ("", "LC")
+    return info.audio_codec in MP4_AUDIO_CODECS
+
+
+def _audio_source(
+    input_idx: int,
+    has_audio: bool,
+    duration_sec: float,
+    label: str
+) -> str:
+    """Normalised audio for one concat segment, or silence if it has none."""
+    if has_audio:
+        return (
+            f"[{input_idx}:a]aresample=48000,"
+            f"aformat=sample_fmts=fltp:channel_layouts=stereo[{label}]"
+        )
+    return f"anullsrc=r=48000:cl=stereo,atrim=duration={duration_sec:.3f}[{label}]"
 
 
-def concatenate_with_end_sting(
-    main_video: Path,
-    end_sting: Path,
+def _render_single_pass(
+    input_video: Path,
+    trimmed_duration_sec: float,
+    overlay_inputs: list[str],
+    filter_parts: list[str],
+    current_label: str,
+    clip_end: Path,
     output_path: Path,
+    width: int,
+    height: int,
+    crf: int,
+    cancel_check: Optional[Callable[[], bool]] = None,
+    renditions: Optional[list[Rendition]] = None
+) -> tuple[bool, str]:
+    """
+    Trim, burn captions, composite overlays, normalise the end sting and
+    concatenate, all in one ffmpeg graph and one encode (renditions split
+    off the concatenated result).
+    """
+    main_info = probe_media(input_video)
+    sting_info = probe_media(clip_end)
+    main_has_audio = bool(main_info and main_info.has_audio)
+    sting_has_audio = bool(sting_info and sting_info.has_audio)
+    sting_duration_sec = (sting_info.duration_ms / 1000) if sting_info else 0.0
+
+    sting_idx = 1 + overlay_inputs.count('-i')
+    parts, current_label = _normalized_main(filter_parts, current_label)
+    parts.append(f"[{current_label}]format=yuv420p,setsar=1[v0]")
+    parts.append(
+        f"[{sting_idx}:v]scale={width}:{height}:force_original_aspect_ratio=decrease,"
+        f"pad={width}:{height}:(ow-iw)/2:(oh-ih)/2,fps=30,format=yuv420p,setsar=1[v1]"
+    )
+
+    if main_has_audio or sting_has_audio:
+        parts.append(_audio_source(0, main_has_audio, trimmed_duration_sec, "a0"))
+        parts.append(_audio_source(sting_idx, sting_has_audio, sting_duration_sec, "a1"))
+        parts.append("[v0][a0][v1][a1]concat=n=2:v=1:a=1[outv][outa]")
+        map_args = ['-map', '[outv]', '-map', '[outa]']
+        audio_codec = ['-c:a', 'aac', '-b:a', '192k']
+    else:
+        parts.append("[v0][v1]concat=n=2:v=1:a=0[outv]")
+        map_args = ['-map', '[outv]']
+        audio_codec = ['-an']
+
+    targets = rendition_targets(output_path, crf, renditions)
+    filter_complex, output_args = split_outputs(";".join(parts), map_args, audio_codec, targets)
+    cmd = ['ffmpeg', '-y', '-t', str(trimmed_duration_sec), '-i', str(input_video)]
+    cmd.extend(overlay_inputs)
+    cmd.extend(['-i', str(clip_end)])
+    cmd.extend(['-filter_complex', filter_complex, *output_args])
+
+    success, error = run_ffmpeg(cmd, output_path, cancel_check)
+    if success and not all(path.exists() for path, _, _ in targets):
+        success, error = False, "missing rendition output"
+    return success, error
+
+
+def get_normalized_sting(
+    clip_end: Path,
+    reference: MediaInfo,
     crf: int = 18,
     log_callback: Optional[Callable[[str], None]] = None,
     cancel_check: Optional[Callable[[], bool]] = None
-) -> bool:
+) -> Optional[Path]:
     """
-    Concatenate main video with end sting.
-    Re-encodes to ensure compatibility.
+    Return the end sting re-encoded to match reference's stream parameters
+    (size, frame rate, pixel format, profile, timebase, audio layout), so it
+    can be appended with the concat demuxer and -c copy.
+    The encode is cached under the cache dir and shared by every video with
+    the same parameters; stings are evicted least recently used first beyond
+    their budget. Returns None if libx264/aac cannot match reference.
     """
-    try:
-        # Get dimensions of main video to scale end sting to match
-        width, height = get_video_dimensions(main_video)
-
-        filter_complex = (
-            f"[0:v]fps=30,format=yuv420p[v0];"
-            f"[1:v]scale={width}:{height}:force_original_aspect_ratio=decrease,"
-            f"pad={width}:{height}:(ow-iw)/2:(oh-ih)/2,fps=30,format=yuv420p[v1];"
-            f"[0:a]aresample=48000,aformat=sample_fmts=fltp:channel_layouts=stereo[a0];"
-            f"[1:a]aresample=48000,aformat=sample_fmts=fltp:channel_layouts=stereo[a1];"
-            f"[v0][a0][v1][a1]concat=n=2:v=1:a=1[outv][outa]"
-        )
-
-        cmd = [
-            'ffmpeg', '-y',
-            '-i', str(main_video),
-            '-i', str(end_sting),
-            '-filter_complex', filter_complex,
-            '-map', '[outv]',
-            '-map', '[outa]',
-            '-c:v', 'libx264',
-            '-preset', 'medium',
-            '-crf', str(crf),
-            '-c:a', 'aac',
-            '-b:a', '192k',
-            '-movflags', '+faststart',
-            str(output_path)
-        ]
-
-        process = subprocess.Popen(
-            cmd,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            text=True
-        )
+    profile = X264_PROFILES.get(reference.video_profile)
+    timescale = reference.video_time_base.partition("/")[2]
+    if reference.video_codec != "h264" or not profile:
+        return None
+    if not timescale.isdigit() or not reference.frame_rate or not reference.pix_fmt:
+        return None
+    if reference.has_audio and (
+        reference.audio_codec != "aac" or reference.audio_profile not in ("", "LC")
+    ):
+        return None
+
+    sting_info = probe_media(clip_end)
+    if sting_info is None or not sting_info.has_video:
+        return None
+
+    stat = clip_end.stat()
+    layout = reference.audio_layout or ("mono" if reference.audio_channels == 1 else "stereo")
+    key_fields = [
+        _STING_CACHE_VERSION, str(clip_end.resolve()), stat.st_size, stat.st_mtime_ns,
+        reference.width, reference.height, reference.frame_rate, reference.pix_fmt,
+        profile, timescale, crf,
+        reference.has_audio, reference.sample_rate, layout,
+    ]
+    key = hashlib.sha1(json.dumps(key_fields).encode()).hexdigest()[:20]
+    cache_dir = get_cache_dir() / "stings"
+    cached = cache_dir / f"{key}.mp4"
+    if touch_cached(cached):
+        if log_callback:
+            log_callback(f"  Using cached end sting ({reference.width}x{reference.height})")
+        return cached
 
-        while True:
-            try:
-                stdout, stderr = process.communicate(timeout=1)
-                break
-            except subprocess.TimeoutExpired:
-                if cancel_check and cancel_check():
-                    process.terminate()
-                    try:
-                        process.wait(timeout=5)
-                    except:
-                        process.kill()
-                    if output_path.exists():
-                        output_path.unlink()
-                    return False
-
-        if process.returncode == 0 and output_path.exists():
-            return True
+    if log_callback:
+        log_callback(f"  Normalising end sting for {reference.width}x{reference.height} (cached for reuse)...")
+
+    width, height = reference.width, reference.height
+    filter_parts = [
+        f"[0:v]scale={width}:{height}:force_original_aspect_ratio=decrease,"
+        f"pad={width}:{height}:(ow-iw)/2:(oh-ih)/2,setsar=1,"
+        f"fps={reference.frame_rate},format={reference.pix_fmt}[v]"
+    ]
+    output_args = ['-map', '[v]']
+    if reference.has_audio:
+        if sting_info.has_audio:
+            filter_parts.append(
+                f"[0:a]aresample={reference.sample_rate},"
+                f"aformat=sample_fmts=fltp:channel_layouts={layout}[a]"
+            )
         else:
-            # Try video-only fallback if audio fails
+            filter_parts.append(
+                f"anullsrc=r={reference.sample_rate}:cl={layout},"
+                f"atrim=duration={sting_info.duration_ms / 1000:.3f}[a]"
+            )
+        output_args.extend(['-map', '[a]', '-c:a', 'aac', '-b:a', '192k'])
+    else:
+        output_args.append('-an')
+
+    cmd = [
+        'ffmpeg', '-y',
+        '-i', str(clip_end),
+        '-filter_complex', ";".join(filter_parts),
+        *output_args,
+        '-c:v', 'libx264',
+        '-preset', 'medium',
+        '-crf', str(crf),
+        '-profile:v', profile,
+        # In-band SPS/PPS so the sting decodes after a stream-copy append
+        '-x264-params', 'repeat-headers=1',
+        '-video_track_timescale', timescale,
+    ]
+    success, error = _render_to_cache(cmd, cached, cancel_check)
+    if not success:
+        if log_callback:
+            log_callback(f"  End sting normalisation failed: {error[-300:]}")
+        return None
+    evict_lru(cached.parent, "*.mp4", _STING_CACHE_MAX_BYTES, keep=cached)
+    return cached
+
+
+def _render_to_cache(
+    cmd: list[str],
+    cached: Path,
+    cancel_check: Optional[Callable[[], bool]] = None
+) -> tuple[bool, str]:
+    """
+    Run cmd with a temporary output beside cached, then rename into place,
+    so concurrent workers never see a partial cache entry.
+    """
+    cached.parent.mkdir(parents=True, exist_ok=True)
+    temp_path = cached.with_name(f"{cached.stem}.{os.getpid()}.tmp{cached.suffix}")
+    success, error = run_ffmpeg([*cmd, str(temp_path)], temp_path, cancel_check)
+    if success:
+        os.replace(temp_path, cached)
+    return success, error
+
+
+def _asset_hash(file_path: Path) -> str:
+    """Content hash of an overlay asset, memoized per (path, size, mtime)."""
+    stat = file_path.stat()
+    key = (str(file_path.resolve()), stat.st_size, stat.st_mtime_ns)
+    digest = _ASSET_HASHES.get(key)
+    if digest is None:
+        hasher = hashlib.sha1()
+        with open(file_path, "rb") as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                hasher.update(chunk)
+        digest = hasher.hexdigest()[:20]
+        _ASSET_HASHES[key] = digest
+    return digest
+
+
+def prepare_add1_overlay(
+    add1_overlay: Path,
+    log_callback: Optional[Callable[[str], None]] = None,
+    cancel_check: Optional[Callable[[], bool]] = None
+) -> Optional[Path]:
+    """
+    Return add1.png pre-scaled by ADD1_SCALE, cached per asset content.
+    Returns None if the asset is missing or the derivative cannot be made.
+    """
+    if not add1_overlay.exists():
+        return None
+    key = f"{_OVERLAY_CACHE_VERSION}_{_asset_hash(add1_overlay)}_{ADD1_SCALE}"
+    cached = get_cache_dir() / "overlays" / f"add1_{key}.png"
+    if cached.exists():
+        return cached
+
+    if log_callback:
+        log_callback(f"  Pre-scaling {add1_overlay.name} (cached for reuse)...")
+    cmd = [
+        'ffmpeg', '-y',
+        '-i', str(add1_overlay),
+        '-vf', f"scale=iw*{ADD1_SCALE}:ih*{ADD1_SCALE}",
+        '-frames:v', '1',
+    ]
+    success, error = _render_to_cache(cmd, cached, cancel_check)
+    if not success:
+        if log_callback:
+            log_callback(f"  add1 pre-scale failed, scaling per frame: {error[-200:]}")
+        return None
+    return cached
+
+
+def prepare_add2_overlay(
+    add2_overlay: Path,
+    width: int,
+    height: int,
+    opacity: float,
+    log_callback: Optional[Callable[[str], None]] = None,
+    cancel_check: Optional[Callable[[], bool]] = None
+) -> Optional[Path]:
+    """
+    Return add2.mov scaled to width x height with the opacity baked into its
+    alpha channel, cached per (asset content, size, opacity). Stored as
+    lossless FFV1 in yuva420p, the format the overlay blends in, so no
+    per-frame RGB conversion is left; the derivatives are evicted least
+    recently used first beyond their budget.
+    Returns None if the asset is missing or the derivative cannot be made.
+    """
+    if not add2_overlay.exists():
+        return None
+    key = f"{_OVERLAY_CACHE_VERSION}_{_asset_hash(add2_overlay)}_{width}x{height}_{opacity}"
+    cached = get_cache_dir() / "overlays" / f"add2_{key}.mkv"
+    if touch_cached(cached):
+        return cached
+
+    if log_callback:
+        log_callback(f"  Preparing {add2_overlay.name} at {width}x{height}, opacity {opacity} (cached for reuse)...")
+    cmd = [
+        'ffmpeg', '-y',
+        '-i', str(add2_overlay),
+        '-vf', f"scale={width}:{height},format=rgba,colorchannelmixer=aa={opacity}",
+        '-an',
+        '-c:v', 'ffv1',
+        '-pix_fmt', 'yuva420p',
+    ]
+    success, error = _render_to_cache(cmd, cached, cancel_check)
+    if not success:
+        if log_callback:
+            log_callback(f"  add2 preparation failed, fading per frame: {error[-200:]}")
+        return None
+    # add2_* also covers derivatives left by older recipes
+    evict_lru(cached.parent, "add2_*", _OVERLAY_CACHE_MAX_BYTES, keep=cached)
+    return cached
+
+
+def _render_with_cached_sting(
+    input_video: Path,
+    trimmed_duration_sec: float,
+    overlay_inputs: list[str],
+    filter_parts: list[str],
+    current_label: str,
+    clip_end: Path,
+    work_dir: Path,
+    output_path: Path,
+    crf: int,
+    log_callback: Optional[Callable[[str], None]] = None,
+    cancel_check: Optional[Callable[[], bool]] = None,
+    renditions: Optional[list[Rendition]] = None
+) -> tuple[bool, str]:
+    """
+    Produce the main segment, then append the cached end sting with the
+    concat demuxer and -c copy. Without captions or overlays the main clip
+    is trimmed by stream copy, so nothing is re-encoded at all.
+    Each rendition gets its own main segment (split off the same composite)
+    and a sting normalised to match it.
+    """
+    main_info = probe_media(input_video)
+    sting_info = probe_media(clip_end)
+    if main_info is None or sting_info is None:
+        return False, "probe failed"
+
+    modes = []
+    if not filter_parts and main_info.video_codec == "h264" and (
+        main_info.has_audio or not sting_info.has_audio
+    ):
+        modes.append("copy")
+    modes.append("encode")
+    # The sting is normalised to the main segment, so AAC-LC audio can stay as is
+    copy_audio = _passthrough_audio(main_info, concat_ready=True)
+
+    error = ""
+    for mode in modes:
+        main_segment = work_dir / f"main_{mode}.mp4"
+        if mode == "copy":
             if log_callback:
-                log_callback(f"  Audio concat failed, trying video-only...")
+                log_callback(f"  Trimming main clip without re-encode...")
+            cmd = [
+                'ffmpeg', '-y', '-t', str(trimmed_duration_sec), '-i', str(input_video),
+                '-map', '0:v:0', '-map', '0:a:0?',
+                '-c', 'copy',
+                str(main_segment)
+            ]
+        else:
+            cmd = _build_segment_cmd(
+                input_video, trimmed_duration_sec, overlay_inputs, filter_parts,
+                current_label, crf, main_info.has_audio or sting_info.has_audio,
+                main_info.has_audio, main_segment, copy_audio, renditions
+            )
+        result = None
+        if mode == "encode" and not renditions:
+            result = _segmented_overlay_pass(
+                input_video, trimmed_duration_sec, overlay_inputs, filter_parts,
+                current_label, crf, main_segment, True,
+                main_info.has_audio or sting_info.has_audio, main_info.has_audio,
+                log_callback, cancel_check, copy_audio=copy_audio
+            )
+        if result is not None:
+            success, error = result
+        else:
+            success, error = run_ffmpeg(cmd, main_segment, cancel_check)
+        if not success:
+            if error == "Cancelled by user":
+                return False, error
+            continue
+
+        if mode == "copy":
+            targets = [(main_segment, output_path, crf)]
+        else:
+            targets = [
+                (segment, final, target_crf)
+                for (segment, target_crf, _), (final, _, _) in zip(
+                    rendition_targets(main_segment, crf, renditions),
+                    rendition_targets(output_path, crf, renditions)
+                )
+            ]
+        for segment, final, target_crf in targets:
+            reference = probe_media(segment)
+            sting = get_normalized_sting(clip_end, reference, target_crf, log_callback, cancel_check) if reference else None
+            if sting is None:
+                success, error = False, "end sting cannot be matched to the main segment"
+                break
+
+            plan = plan_fast_copy([segment, sting])
+            if not plan.allowed:
+                success, error = False, f"{plan.reason} ({plan.detail})"
+                break
 
-            filter_video_only = (
-                f"[0:v]fps=30,format=yuv420p[v0];"
-                f"[1:v]scale={width}:{height}:force_original_aspect_ratio=decrease,"
-                f"pad={width}:{height}:(ow-iw)/2:(oh-ih)/2,fps=30,format=yuv420p[v1];"
-                f"[v0][v1]concat=n=2:v=1:a=0[outv]"
+            if not try_fast_copy_concat(segment, sting, final, log_callback, faststart=True):
+                success, error = False, "stream-copy append failed"
+                break
+
+        if success and mode == "copy" and renditions:
+            # The trimmed copy has no composite to share; derive renditions from it
+            success, error = encode_renditions(
+                output_path, output_path, renditions, crf, log_callback, cancel_check
             )
+        if success:
+            return True, ""
+        if error == "Cancelled by user":
+            return False, error
 
-            cmd_video_only = [
-                'ffmpeg', '-y',
-                '-i', str(main_video),
-                '-i', str(end_sting),
-                '-filter_complex', filter_video_only,
-                '-map', '[outv]',
-                '-an',
-                '-c:v', 'libx264',
-                '-preset', 'medium',
-                '-crf', str(crf),
-                '-movflags', '+faststart',
-                str(output_path)
-            ]
+    return False, error
 
-            result = subprocess.run(cmd_video_only, capture_output=True, text=True, timeout=300)
-            return result.returncode == 0 and output_path.exists()
 
-    except Exception as e:
-        if log_callback:
-            log_callback(f"  Concat error: {e}")
-        return False
+def _build_segment_cmd(
+    input_video: Path,
+    trimmed_duration_sec: float,
+    overlay_inputs: list[str],
+    filter_parts: list[str],
+    current_label: str,
+    crf: int,
+    with_audio: bool,
+    main_has_audio: bool,
+    output_path: Path,
+    copy_audio: bool = False,
+    renditions: Optional[list[Rendition]] = None
+) -> list[str]:
+    """
+    FFmpeg command for the trimmed, overlaid main segment, encoded with the
+    same normalisation the single-pass render applies (30fps, yuv420p,
+    48kHz stereo AAC). A silent track is added when only the sting has audio;
+    copy_audio keeps the main audio as is instead of resampling it.
+    Rendition segments are split off the same composite beside output_path.
+    """
+    parts, current_label = _normalized_main(filter_parts, current_label)
+    parts.append(f"[{current_label}]format=yuv420p,setsar=1[vout]")
+    map_args = ['-map', '[vout]']
+    if with_audio and main_has_audio and copy_audio:
+        map_args.extend(['-map', '0:a:0'])
+        audio_codec = ['-c:a', 'copy']
+    elif with_audio:
+        parts.append(_audio_source(0, main_has_audio, trimmed_duration_sec, "aout"))
+        map_args.extend(['-map', '[aout]'])
+        audio_codec = ['-c:a', 'aac', '-b:a', '192k']
+    else:
+        audio_codec = ['-an']
+
+    filter_complex, output_args = split_outputs(
+        ";".join(parts), map_args, audio_codec,
+        rendition_targets(output_path, crf, renditions), faststart=False
+    )
+    cmd = ['ffmpeg', '-y', '-t', str(trimmed_duration_sec), '-i', str(input_video)]
+    cmd.extend(overlay_inputs)
+    cmd.extend(['-filter_complex', filter_complex, *output_args])
+    return cmd
+
+
+def _segmented_overlay_pass(
+    input_video: Path,
+    trimmed_duration_sec: float,
+    overlay_inputs: list[str],
+    filter_parts: list[str],
+    current_label: str,
+    crf: int,
+    output_path: Path,
+    normalize: bool,
+    with_audio: bool,
+    main_has_audio: bool,
+    log_callback: Optional[Callable[[str], None]] = None,
+    cancel_check: Optional[Callable[[], bool]] = None,
+    copy_audio: bool = False
+) -> Optional[tuple[bool, str]]:
+    """
+    The overlay pass (or, with normalize, the main segment encode) split
+    across parallel encoders for long inputs. Returns None when segmented
+    mode does not apply and the single-process command should run instead.
+    """
+    if normalize:
+        parts, current_label = _normalized_main(filter_parts, current_label)
+        parts.append(f"[{current_label}]format=yuv420p,setsar=1[vout]")
+    else:
+        parts = list(filter_parts)
+        parts.append(f"[{current_label}]copy[vout]")
+
+    audio_args = None
+    if with_audio:
+        audio_args = ['-t', str(trimmed_duration_sec), '-i', str(input_video)]
+        if main_has_audio and copy_audio:
+            audio_args.extend(['-map', '0:a:0', '-c:a', 'copy'])
+        else:
+            if normalize:
+                audio_args.extend([
+                    '-filter_complex', _audio_source(0, main_has_audio, trimmed_duration_sec, "aout"),
+                    '-map', '[aout]'
+                ])
+            else:
+                audio_args.extend(['-map', '0:a:0'])
+            audio_args.extend(['-c:a', 'aac', '-b:a', '192k'])
+
+    return encode_segmented_if_long(
+        [SegmentSource(input_video, ";".join(parts), list(overlay_inputs), trimmed_duration_sec)],
+        output_path,
+        crf,
+        audio_args,
+        log_callback,
+        cancel_check
+    )
+
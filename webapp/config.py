@@ -7,6 +7,7 @@ REPO_ROOT = Path(__file__).resolve().parents[1]
 DATA_DIR = Path(os.getenv("RECLIP_DATA_DIR", REPO_ROOT / "data"))
 UPLOADS_DIR = DATA_DIR / "uploads"
 JOBS_DIR = DATA_DIR / "jobs"
+CACHE_DIR = Path(os.getenv("RECLIP_CACHE_DIR", DATA_DIR / "cache"))
 STATIC_DIR = Path(__file__).parent / "static"
 
 REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
@@ -15,5 +16,5 @@ ASSEMBLYAI_API_KEY = os.getenv("ASSEMBLYAI_API_KEY", "")
 
 
 def ensure_dirs() -> None:
-    for path in (DATA_DIR, UPLOADS_DIR, JOBS_DIR):
+    for path in (DATA_DIR, UPLOADS_DIR, JOBS_DIR, CACHE_DIR):
         path.mkdir(parents=True, exist_ok=True)
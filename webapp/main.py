@@ -1,6 +1,7 @@
 from __future__ import annotations
 
 import os
+import re
 import threading
 import time
 from contextlib import asynccontextmanager
@@ -27,7 +28,7 @@ from .job_store import (
     tail_logs,
     update_job,
 )
-from .storage import save_upload
+from .storage import InvalidUploadError, save_upload
 
 
 def create_redis_connection(url: str, max_retries: int = 5, retry_delay: float = 2.0) -> Redis:
@@ -63,6 +64,13 @@ class OverlayConfig(BaseModel):
     box_height: int = 0
 
 
+class RenditionConfig(BaseModel):
+    name: str
+    width: int = 0
+    height: int = 0
+    crf: Optional[int] = None
+
+
 class ConcatJobRequest(BaseModel):
     files_a: list[str] = Field(default_factory=list)
     files_b: list[str] = Field(default_factory=list)
@@ -73,6 +81,19 @@ class ConcatJobRequest(BaseModel):
     nested_folder: str = "nested"
     overlay_a: Optional[OverlayConfig] = None
     overlay_b: Optional[OverlayConfig] = None
+    renditions: list[RenditionConfig] = Field(default_factory=list)
+
+
+class SequenceJobRequest(BaseModel):
+    # One list of upload ids per folder, in timeline order
+    parts: list[list[str]] = Field(default_factory=list)
+    labels: list[str] = Field(default_factory=list)
+    crf: int = 18
+    try_fast_copy: bool = True
+    flat_folder: str = "flat"
+    nested_folder: str = "nested"
+    overlays: list[Optional[OverlayConfig]] = Field(default_factory=list)
+    renditions: list[RenditionConfig] = Field(default_factory=list)
 
 
 class UGCJobRequest(BaseModel):
@@ -86,6 +107,7 @@ class UGCJobRequest(BaseModel):
     crf: int = 18
     enable_captions: bool = True
     api_key: Optional[str] = None
+    renditions: list[RenditionConfig] = Field(default_factory=list)
 
 
 ensure_dirs()
@@ -96,8 +118,28 @@ queue = Queue(QUEUE_NAME, connection=redis_conn)
 RUN_EMBEDDED_WORKER = os.getenv("RUN_EMBEDDED_WORKER", "true").lower() == "true"
 
 
+_RENDITION_NAME_RE = re.compile(r"^[A-Za-z0-9_-]{1,32}$")
+
+
+def _validate_renditions(renditions: list[RenditionConfig]) -> None:
+    names = set()
+    for rendition in renditions:
+        if not _RENDITION_NAME_RE.match(rendition.name):
+            raise HTTPException(status_code=400, detail=f"Invalid rendition name: {rendition.name!r}")
+        if rendition.name in names:
+            raise HTTPException(status_code=400, detail=f"Duplicate rendition name: {rendition.name}")
+        names.add(rendition.name)
+        if bool(rendition.width) != bool(rendition.height):
+            raise HTTPException(status_code=400, detail="Rendition width and height must be set together.")
+        if rendition.width < 0 or rendition.height < 0 or rendition.width % 2 or rendition.height % 2:
+            raise HTTPException(status_code=400, detail="Rendition width and height must be even and positive.")
+        if rendition.crf is not None and not 0 <= rendition.crf <= 51:
+            raise HTTPException(status_code=400, detail="Rendition crf must be between 0 and 51.")
+
+
 def run_worker_thread():
     """Run RQ worker in a background thread using SimpleWorker (no forking)."""
+    print(tasks.warm_ffmpeg_capabilities())
     worker = SimpleWorker([queue], connection=redis_conn)
     worker.work(burst=False)
 
@@ -135,13 +177,17 @@ def upload_file(
     file: UploadFile = File(...),
     role: Optional[str] = Form(None),
 ) -> JSONResponse:
-    meta = save_upload(file, role)
+    try:
+        meta = save_upload(file, role)
+    except InvalidUploadError as exc:
+        raise HTTPException(status_code=415, detail=str(exc))
     return JSONResponse(
         {
             "id": meta.file_id,
             "name": meta.original_name,
             "size": meta.size,
             "role": meta.role,
+            "media": meta.media,
         }
     )
 
@@ -154,6 +200,8 @@ def create_concat_job(payload: ConcatJobRequest) -> JSONResponse:
     if payload.order not in ("A_THEN_B", "B_THEN_A"):
         raise HTTPException(status_code=400, detail="Invalid order value.")
 
+    _validate_renditions(payload.renditions)
+
     job = create_job("concat", payload.model_dump())
 
     queue.enqueue(
@@ -168,6 +216,39 @@ def create_concat_job(payload: ConcatJobRequest) -> JSONResponse:
         payload.nested_folder,
         payload.overlay_a.model_dump() if payload.overlay_a else None,
         payload.overlay_b.model_dump() if payload.overlay_b else None,
+        [rendition.model_dump() for rendition in payload.renditions],
+        job_timeout=60 * 60 * 6,
+    )
+
+    return JSONResponse({"job_id": job["id"]})
+
+
+@app.post("/api/jobs/sequence")
+def create_sequence_job(payload: SequenceJobRequest) -> JSONResponse:
+    if len(payload.parts) < 2 or not all(payload.parts):
+        raise HTTPException(status_code=400, detail="At least two non-empty parts are required.")
+
+    if payload.labels and len(payload.labels) != len(payload.parts):
+        raise HTTPException(status_code=400, detail="labels must have one entry per part.")
+
+    if len(payload.overlays) > len(payload.parts):
+        raise HTTPException(status_code=400, detail="More overlays than parts.")
+
+    _validate_renditions(payload.renditions)
+
+    job = create_job("sequence", payload.model_dump())
+
+    queue.enqueue(
+        tasks.run_sequence_job,
+        job["id"],
+        payload.parts,
+        payload.labels,
+        payload.crf,
+        False,
+        payload.flat_folder,
+        payload.nested_folder,
+        [overlay.model_dump() if overlay else None for overlay in payload.overlays],
+        [rendition.model_dump() for rendition in payload.renditions],
         job_timeout=60 * 60 * 6,
     )
 
@@ -179,6 +260,8 @@ def create_ugc_job(payload: UGCJobRequest) -> JSONResponse:
     if not payload.files:
         raise HTTPException(status_code=400, detail="files is required.")
 
+    _validate_renditions(payload.renditions)
+
     job = create_job("ugc", payload.model_dump())
 
     queue.enqueue(
@@ -194,6 +277,7 @@ def create_ugc_job(payload: UGCJobRequest) -> JSONResponse:
         payload.crf,
         payload.enable_captions,
         payload.api_key,
+        [rendition.model_dump() for rendition in payload.renditions],
         job_timeout=60 * 60 * 6,
     )
 
@@ -203,7 +287,7 @@ def create_ugc_job(payload: UGCJobRequest) -> JSONResponse:
 @app.get("/api/jobs/{job_id}")
 def get_job(job_id: str) -> JSONResponse:
     job = read_job(job_id)
-    if job.get("status") == "finished" and not job.get("outputs") and job.get("type") not in ("ugc", "concat"):
+    if job.get("status") == "finished" and not job.get("outputs") and job.get("type") not in ("ugc", "concat", "sequence"):
         outputs = list_output_files(job_id)
         job = update_job(job_id, outputs=outputs)
     return JSONResponse(job)
@@ -44,7 +44,8 @@ async function uploadFiles(files, role, listEl, stateKey, field) {
     if (role) form.append('role', role);
     const res = await fetch('/api/uploads', { method: 'POST', body: form });
     if (!res.ok) {
-      throw new Error('Upload failed');
+      const err = await res.json().catch(() => ({}));
+      throw new Error(err.detail || 'Upload failed');
     }
     const data = await res.json();
     uploads.push(data);
@@ -60,7 +61,8 @@ async function uploadSingle(file, role, stateKey, field) {
   if (role) form.append('role', role);
   const res = await fetch('/api/uploads', { method: 'POST', body: form });
   if (!res.ok) {
-    throw new Error('Upload failed');
+    const err = await res.json().catch(() => ({}));
+    throw new Error(err.detail || 'Upload failed');
   }
   const data = await res.json();
   state[stateKey][field] = data.id;
@@ -239,6 +241,20 @@ function encodePath(path) {
     .join('/');
 }
 
+function formatJobState(job) {
+  const status = job.status || 'unknown';
+  const progress = job.progress || {};
+  if (status !== 'running' || progress.item_percent == null) return status;
+  const parts = [`${status} ${progress.current}/${progress.total}`, `${Math.round(progress.item_percent)}%`];
+  if (progress.fps) parts.push(`${progress.fps} fps`);
+  if (progress.eta_sec != null) {
+    const minutes = Math.floor(progress.eta_sec / 60);
+    const seconds = String(progress.eta_sec % 60).padStart(2, '0');
+    parts.push(`ETA ${minutes}:${seconds}`);
+  }
+  return parts.join(' · ');
+}
+
 async function pollJob(section) {
   const jobId = state[section].jobId;
   if (!jobId) return;
@@ -248,11 +264,14 @@ async function pollJob(section) {
   const job = await jobRes.json();
 
   qs(`#${section}-job-id`).textContent = job.id || '-';
-  qs(`#${section}-job-state`).textContent = job.status || 'unknown';
+  qs(`#${section}-job-state`).textContent = formatJobState(job);
 
   const current = job.progress?.current || 0;
   const total = job.progress?.total || 0;
-  const percent = total ? Math.min(100, Math.round((current / total) * 100)) : 0;
+  let percent = total ? Math.min(100, Math.round((current / total) * 100)) : 0;
+  if (job.progress?.percent != null) {
+    percent = Math.min(100, Math.round(job.progress.percent));
+  }
   qs(`#${section}-progress`).style.width = `${percent}%`;
 
   if (job.summary) {
@@ -7,16 +7,21 @@ import shutil
 from dataclasses import asdict, dataclass
 from datetime import datetime, timezone
 from pathlib import Path
-from typing import Optional
+from typing import Any, Optional
 from uuid import uuid4
 
 from redis import Redis
 
-from .config import UPLOADS_DIR, REDIS_URL, ensure_dirs
+from media_probe import MediaInfo, configure_cache_dir, probe_media, remember_media_info
+
+from .config import CACHE_DIR, UPLOADS_DIR, REDIS_URL, ensure_dirs
 
 
 _SAFE_NAME_RE = re.compile(r"[^A-Za-z0-9._-]+")
 
+# Share the persistent probe cache with the workers
+configure_cache_dir(CACHE_DIR)
+
 # Redis client for upload metadata
 _redis_client: Optional[Redis] = None
 
@@ -41,6 +46,16 @@ class UploadMeta:
     size: int
     role: Optional[str]
     created_at: str
+    media: Optional[dict[str, Any]] = None
+
+    def media_info(self) -> Optional[MediaInfo]:
+        if not self.media:
+            return None
+        return MediaInfo.from_dict(self.media)
+
+
+class InvalidUploadError(ValueError):
+    """Raised when an uploaded file cannot be decoded or has no video stream."""
 
 
 def _utc_now() -> str:
@@ -67,6 +82,17 @@ def save_upload(upload_file, role: Optional[str] = None) -> UploadMeta:
         shutil.copyfileobj(upload_file.file, f)
         size = stored_path.stat().st_size
 
+    # Probe once at ingest so workers never have to, and reject files
+    # ffprobe cannot read, or without a video stream to process, before
+    # they reach the queue.
+    info = probe_media(stored_path)
+    if info is None or not info.is_decodable:
+        stored_path.unlink(missing_ok=True)
+        raise InvalidUploadError(f"Not a decodable media file: {original_name}")
+    if not info.has_video:
+        stored_path.unlink(missing_ok=True)
+        raise InvalidUploadError(f"No video stream in {original_name}")
+
     meta = UploadMeta(
         file_id=file_id,
         original_name=original_name,
@@ -75,6 +101,7 @@ def save_upload(upload_file, role: Optional[str] = None) -> UploadMeta:
         size=size,
         role=role,
         created_at=_utc_now(),
+        media=info.to_dict(),
     )
 
     # Store metadata in Redis
@@ -107,4 +134,8 @@ def stage_upload(file_id: str, dest_path: Path) -> UploadMeta:
     except Exception:
         shutil.copy2(source_path, dest_path)
 
+    info = meta.media_info()
+    if info is not None:
+        remember_media_info(dest_path, info)
+
     return meta
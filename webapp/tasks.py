@@ -1,19 +1,30 @@
 from __future__ import annotations
 
+import time
 from pathlib import Path
-from typing import Any, Optional
+from typing import Any, Callable, Optional
 
+from ffmpeg_capabilities import get_capabilities
+from ffmpeg_runner import EncodeProgress
+from media_probe import configure_cache_dir, probe_batch
 from processor import (
     ConcatOrder,
+    ProcessingResult,
+    Rendition,
     TextOverlayConfig,
     check_ffmpeg_available,
     find_matches,
+    find_sequence_matches,
     get_match_counts,
+    get_sequence_counts,
     process_video_pair,
+    process_video_sequence,
 )
-from ugc_processor import ASSETS_DIR, process_ugc_video, scan_ugc_videos
+from resource_usage import ResourceUsage, usage_scope
+from scratch import scratch_root
+from ugc_processor import ASSETS_DIR, UGCProcessingResult, process_ugc_video, scan_ugc_videos
 
-from .config import ASSEMBLYAI_API_KEY
+from .config import ASSEMBLYAI_API_KEY, CACHE_DIR
 from .job_store import (
     append_log,
     create_outputs_zip,
@@ -25,10 +36,66 @@ from .job_store import (
 from .storage import get_upload_meta, sanitize_filename, stage_upload
 
 
+# Every forked work horse shares the on-disk probe cache under the data dir
+configure_cache_dir(CACHE_DIR)
+
+
+# Minimum seconds between encode progress writes to the job record
+_PROGRESS_INTERVAL_SEC = 2.0
+
+
+def warm_ffmpeg_capabilities() -> str:
+    """
+    Load (or build once) the ffmpeg capabilities before jobs are forked off,
+    so each work horse inherits them instead of spawning ffmpeg.
+    Returns a one-line summary for the worker's startup output.
+    """
+    capabilities = get_capabilities()
+    return f"FFmpeg: {capabilities.version}" if capabilities else "FFmpeg not available"
+
+
 def _log(job_id: str, message: str) -> None:
     append_log(job_id, message)
 
 
+def _item_progress(current: int, total: int) -> dict[str, Any]:
+    """Job progress at the start of item current (1-based) of total."""
+    return {
+        "current": current,
+        "total": total,
+        "percent": round(100.0 * (current - 1) / total, 1),
+        "item_percent": None,
+        "fps": None,
+        "speed": None,
+        "eta_sec": None,
+    }
+
+
+def _progress_reporter(job_id: str, current: int, total: int) -> Callable[[EncodeProgress], None]:
+    """progress_callback publishing the running encode into the job record, throttled."""
+    last_update = 0.0
+
+    def report(progress: EncodeProgress) -> None:
+        nonlocal last_update
+        now = time.monotonic()
+        if now - last_update < _PROGRESS_INTERVAL_SEC:
+            return
+        last_update = now
+        item_fraction = (progress.percent or 0.0) / 100
+        update_job(
+            job_id,
+            progress={
+                "percent": round(100.0 * (current - 1 + item_fraction) / total, 1),
+                "item_percent": round(progress.percent, 1) if progress.percent is not None else None,
+                "fps": round(progress.fps, 1),
+                "speed": round(progress.speed, 2),
+                "eta_sec": round(progress.eta_sec) if progress.eta_sec is not None else None,
+            },
+        )
+
+    return report
+
+
 def _build_overlay(config: Optional[dict[str, Any]]) -> Optional[TextOverlayConfig]:
     if not config:
         return None
@@ -56,7 +123,24 @@ def _build_overlay(config: Optional[dict[str, Any]]) -> Optional[TextOverlayConf
     )
 
 
+def _build_renditions(configs: Optional[list[dict[str, Any]]]) -> list[Rendition]:
+    renditions = []
+    for config in configs or []:
+        crf = config.get("crf")
+        renditions.append(
+            Rendition(
+                name=str(config["name"]),
+                width=int(config.get("width") or 0),
+                height=int(config.get("height") or 0),
+                crf=int(crf) if crf is not None else None,
+            )
+        )
+    return renditions
+
+
 def _stage_inputs(file_ids: list[str], dest_dir: Path) -> None:
+    # stage_upload seeds the probe cache from the upload record, so the
+    # processors read dimensions/duration/audio without spawning ffprobe.
     dest_dir.mkdir(parents=True, exist_ok=True)
     for file_id in file_ids:
         meta = get_upload_meta(file_id)
@@ -64,6 +148,42 @@ def _stage_inputs(file_ids: list[str], dest_dir: Path) -> None:
         stage_upload(file_id, dest_path)
 
 
+def _record_fast_copy(stats: dict[str, Any], result: ProcessingResult) -> None:
+    if not result.fast_copy_reason:
+        return
+    if result.used_fast_copy:
+        stats["used"] += 1
+    elif result.fast_copy_attempted:
+        stats["failed"] += 1
+    else:
+        stats["skipped"] += 1
+    reasons = stats["reasons"]
+    reasons[result.fast_copy_reason] = reasons.get(result.fast_copy_reason, 0) + 1
+
+
+def _record_usage(
+    job_id: str,
+    job_usage: ResourceUsage,
+    items: list[dict[str, Any]],
+    name: str,
+    usage: ResourceUsage,
+) -> None:
+    # Per-item ffmpeg/ffprobe cost goes to the log and the job summary
+    job_usage.add(usage)
+    items.append({"item": name, **usage.to_dict()})
+    _log(job_id, f"  Resources: {usage.describe()}")
+
+
+def _resources_summary(job_id: str, job_usage: ResourceUsage, items: list[dict[str, Any]]) -> dict[str, Any]:
+    _log(job_id, f"Job resources: {job_usage.describe()}")
+    return {**job_usage.to_dict(), "items": items}
+
+
+def _record_failure(causes: dict[str, int], result: ProcessingResult | UGCProcessingResult) -> None:
+    if result.failure_cause:
+        causes[result.failure_cause.value] = causes.get(result.failure_cause.value, 0) + 1
+
+
 def run_concat_job(
     job_id: str,
     file_ids_a: list[str],
@@ -75,6 +195,7 @@ def run_concat_job(
     nested_folder: str,
     overlay_a: Optional[dict[str, Any]] = None,
     overlay_b: Optional[dict[str, Any]] = None,
+    renditions: Optional[list[dict[str, Any]]] = None,
 ) -> None:
     try:
         ok, ffmpeg_info = check_ffmpeg_available()
@@ -116,19 +237,30 @@ def run_concat_job(
             update_job(job_id, status="finished", progress={"current": 0, "total": 0})
             return
 
+        job_usage = probe_batch(
+            [path for m in matched for path in (m.file_a, m.file_b)],
+            log_callback=lambda msg: _log(job_id, msg),
+        )
+        item_usages: list[dict[str, Any]] = []
+
         overlay_a_cfg = _build_overlay(overlay_a)
         overlay_b_cfg = _build_overlay(overlay_b)
 
         order_enum = ConcatOrder.A_THEN_B if order == "A_THEN_B" else ConcatOrder.B_THEN_A
+        rendition_list = _build_renditions(renditions)
 
         success_count = 0
         fail_count = 0
+        fast_copy_stats: dict[str, Any] = {"used": 0, "skipped": 0, "failed": 0, "reasons": {}}
+        failure_causes: dict[str, int] = {}
 
         _log(job_id, f"Starting concat for {total} matched pairs...")
         _log(job_id, f"Order: {order_enum.value}, CRF: {crf}, Fast copy: {try_fast_copy}")
+        if rendition_list:
+            _log(job_id, f"Renditions: {', '.join(r.name for r in rendition_list)}")
 
         for idx, match in enumerate(matched, 1):
-            update_job(job_id, progress={"current": idx, "total": total})
+            update_job(job_id, progress=_item_progress(idx, total))
 
             output_name = f"{match.basename}.mp4"
             output_flat = flat_dir / output_name
@@ -136,22 +268,29 @@ def run_concat_job(
             nested_subdir.mkdir(parents=True, exist_ok=True)
             output_nested = nested_subdir / output_name
 
-            result = process_video_pair(
-                match=match,
-                output_flat=output_flat,
-                output_nested=output_nested,
-                order=order_enum,
-                crf=crf,
-                try_fast_copy=try_fast_copy,
-                overlay_a=overlay_a_cfg,
-                overlay_b=overlay_b_cfg,
-                log_callback=lambda msg: _log(job_id, msg),
-            )
+            with usage_scope() as item_usage, scratch_root(paths["base"] / "scratch"):
+                result = process_video_pair(
+                    match=match,
+                    output_flat=output_flat,
+                    output_nested=output_nested,
+                    order=order_enum,
+                    crf=crf,
+                    try_fast_copy=try_fast_copy,
+                    overlay_a=overlay_a_cfg,
+                    overlay_b=overlay_b_cfg,
+                    log_callback=lambda msg: _log(job_id, msg),
+                    progress_callback=_progress_reporter(job_id, idx, total),
+                    renditions=rendition_list,
+                )
+            _record_usage(job_id, job_usage, item_usages, match.basename, item_usage)
 
             if result.success:
                 success_count += 1
             else:
                 fail_count += 1
+                _record_failure(failure_causes, result)
+
+            _record_fast_copy(fast_copy_stats, result)
 
         flat_zip = create_outputs_zip_for(job_id, flat_dir.relative_to(output_dir).as_posix(), "flat_outputs.zip")
         nested_zip = create_outputs_zip_for(job_id, nested_dir.relative_to(output_dir).as_posix(), "nested_outputs.zip")
@@ -165,11 +304,156 @@ def run_concat_job(
             "flat_zip_ready": bool(flat_zip and flat_zip.exists()),
             "nested_zip_ready": bool(nested_zip and nested_zip.exists()),
         }
+        if try_fast_copy:
+            summary["fast_copy"] = fast_copy_stats
+        if failure_causes:
+            summary["failure_causes"] = failure_causes
+        summary["resources"] = _resources_summary(job_id, job_usage, item_usages)
+        if rendition_list:
+            summary["renditions"] = [r.name for r in rendition_list]
 
         update_job(
             job_id,
             status="finished",
-            progress={"current": total, "total": total},
+            progress={**_item_progress(total, total), "percent": 100.0},
+            summary=summary,
+            outputs=[],
+        )
+
+    except Exception as exc:
+        _log(job_id, f"Error: {exc}")
+        update_job(job_id, status="failed", summary={"error": str(exc)})
+
+
+def run_sequence_job(
+    job_id: str,
+    part_file_ids: list[list[str]],
+    labels: list[str],
+    crf: int,
+    try_fast_copy: bool,
+    flat_folder: str,
+    nested_folder: str,
+    overlays: Optional[list[Optional[dict[str, Any]]]] = None,
+    renditions: Optional[list[dict[str, Any]]] = None,
+) -> None:
+    try:
+        ok, ffmpeg_info = check_ffmpeg_available()
+        if not ok:
+            _log(job_id, f"FFmpeg not available: {ffmpeg_info}")
+            update_job(job_id, status="failed", summary={"error": "ffmpeg_not_found"})
+            return
+
+        set_job_status(job_id, "running")
+        paths = get_job_paths(job_id)
+        output_dir = paths["output"]
+        flat_dir = output_dir / (flat_folder or "flat")
+        nested_dir = output_dir / (nested_folder or "nested")
+        labels = labels or [str(idx) for idx in range(1, len(part_file_ids) + 1)]
+
+        _log(job_id, f"FFmpeg: {ffmpeg_info}")
+        _log(job_id, "Staging inputs...")
+        part_dirs = []
+        for idx, file_ids in enumerate(part_file_ids):
+            part_dir = paths["input"] / f"part_{idx:02d}"
+            _stage_inputs(file_ids, part_dir)
+            part_dirs.append(part_dir)
+
+        matches = find_sequence_matches(part_dirs)
+        complete_count, incomplete_count = get_sequence_counts(matches)
+
+        update_job(
+            job_id,
+            summary={
+                "parts": len(part_dirs),
+                "matched": complete_count,
+                "incomplete": incomplete_count,
+            },
+        )
+
+        complete = [m for m in matches if m.is_complete]
+        total = len(complete)
+
+        if total == 0:
+            _log(job_id, "No complete sequences to process.")
+            update_job(job_id, status="finished", progress={"current": 0, "total": 0})
+            return
+
+        job_usage = probe_batch(
+            [path for m in complete for path in m.files],
+            log_callback=lambda msg: _log(job_id, msg),
+        )
+        item_usages: list[dict[str, Any]] = []
+
+        overlay_cfgs = [_build_overlay(config) for config in overlays or []]
+        rendition_list = _build_renditions(renditions)
+
+        success_count = 0
+        fail_count = 0
+        fast_copy_stats: dict[str, Any] = {"used": 0, "skipped": 0, "failed": 0, "reasons": {}}
+        failure_causes: dict[str, int] = {}
+
+        _log(job_id, f"Starting sequence concat for {total} sequences...")
+        _log(job_id, f"Order: {' -> '.join(labels)}, CRF: {crf}, Fast copy: {try_fast_copy}")
+        if rendition_list:
+            _log(job_id, f"Renditions: {', '.join(r.name for r in rendition_list)}")
+
+        for idx, match in enumerate(complete, 1):
+            update_job(job_id, progress=_item_progress(idx, total))
+
+            output_name = f"{match.basename}.mp4"
+            output_flat = flat_dir / output_name
+            nested_subdir = nested_dir / str(idx)
+            nested_subdir.mkdir(parents=True, exist_ok=True)
+            output_nested = nested_subdir / output_name
+
+            with usage_scope() as item_usage, scratch_root(paths["base"] / "scratch"):
+                result = process_video_sequence(
+                    basename=match.basename,
+                    files=match.files,
+                    output_flat=output_flat,
+                    output_nested=output_nested,
+                    crf=crf,
+                    try_fast_copy=try_fast_copy,
+                    overlays=overlay_cfgs,
+                    labels=labels,
+                    log_callback=lambda msg: _log(job_id, msg),
+                    progress_callback=_progress_reporter(job_id, idx, total),
+                    renditions=rendition_list,
+                )
+            _record_usage(job_id, job_usage, item_usages, match.basename, item_usage)
+
+            if result.success:
+                success_count += 1
+            else:
+                fail_count += 1
+                _record_failure(failure_causes, result)
+            _record_fast_copy(fast_copy_stats, result)
+
+        flat_zip = create_outputs_zip_for(job_id, flat_dir.relative_to(output_dir).as_posix(), "flat_outputs.zip")
+        nested_zip = create_outputs_zip_for(job_id, nested_dir.relative_to(output_dir).as_posix(), "nested_outputs.zip")
+
+        summary = {
+            "parts": len(part_dirs),
+            "order": labels,
+            "matched": complete_count,
+            "incomplete": incomplete_count,
+            "success": success_count,
+            "failed": fail_count,
+            "flat_zip_ready": bool(flat_zip and flat_zip.exists()),
+            "nested_zip_ready": bool(nested_zip and nested_zip.exists()),
+        }
+        if try_fast_copy:
+            summary["fast_copy"] = fast_copy_stats
+        if failure_causes:
+            summary["failure_causes"] = failure_causes
+        summary["resources"] = _resources_summary(job_id, job_usage, item_usages)
+        if rendition_list:
+            summary["renditions"] = [r.name for r in rendition_list]
+
+        update_job(
+            job_id,
+            status="finished",
+            progress={**_item_progress(total, total), "percent": 100.0},
             summary=summary,
             outputs=[],
         )
@@ -200,6 +484,7 @@ def run_ugc_job(
     crf: int,
     enable_captions: bool,
     api_key: Optional[str] = None,
+    renditions: Optional[list[dict[str, Any]]] = None,
 ) -> None:
     try:
         ok, ffmpeg_info = check_ffmpeg_available()
@@ -225,6 +510,9 @@ def run_ugc_job(
             update_job(job_id, status="finished", progress={"current": 0, "total": 0})
             return
 
+        job_usage = probe_batch(videos, log_callback=lambda msg: _log(job_id, msg))
+        item_usages: list[dict[str, Any]] = []
+
         if enable_captions:
             key = api_key or ASSEMBLYAI_API_KEY
             if not key:
@@ -241,43 +529,57 @@ def run_ugc_job(
         add2_path = _resolve_asset(ASSETS_DIR / "add2.mov", add2_file, assets_dir)
         clip_end_path = _resolve_asset(ASSETS_DIR / "ClipEnd.mov", clip_end_file, assets_dir)
 
+        rendition_list = _build_renditions(renditions)
         _log(job_id, f"Starting UGC processing of {total} videos...")
+        if rendition_list:
+            _log(job_id, f"Renditions: {', '.join(r.name for r in rendition_list)}")
 
         success_count = 0
         fail_count = 0
+        failure_causes: dict[str, int] = {}
 
         for idx, video in enumerate(videos, 1):
-            update_job(job_id, progress={"current": idx, "total": total})
+            update_job(job_id, progress=_item_progress(idx, total))
 
             output_path = output_dir / f"{video.stem}_processed.mp4"
 
-            result = process_ugc_video(
-                input_video=video,
-                output_path=output_path,
-                api_key=key,
-                add1_overlay=add1_path,
-                add2_overlay=add2_path,
-                clip_end=clip_end_path,
-                add1_position=(add1_x, add1_y),
-                add2_opacity=add2_opacity,
-                crf=crf,
-                enable_captions=enable_captions,
-                log_callback=lambda msg: _log(job_id, msg),
-            )
+            with usage_scope() as item_usage, scratch_root(paths["base"] / "scratch"):
+                result = process_ugc_video(
+                    input_video=video,
+                    output_path=output_path,
+                    api_key=key,
+                    add1_overlay=add1_path,
+                    add2_overlay=add2_path,
+                    clip_end=clip_end_path,
+                    add1_position=(add1_x, add1_y),
+                    add2_opacity=add2_opacity,
+                    crf=crf,
+                    enable_captions=enable_captions,
+                    log_callback=lambda msg: _log(job_id, msg),
+                    progress_callback=_progress_reporter(job_id, idx, total),
+                    renditions=rendition_list,
+                )
+            _record_usage(job_id, job_usage, item_usages, video.name, item_usage)
 
             if result.success:
                 success_count += 1
             else:
                 fail_count += 1
+                _record_failure(failure_causes, result)
 
         zip_path = create_outputs_zip(job_id)
         zip_ready = bool(zip_path and zip_path.exists())
 
         summary = {"success": success_count, "failed": fail_count, "zip_ready": zip_ready}
+        if failure_causes:
+            summary["failure_causes"] = failure_causes
+        summary["resources"] = _resources_summary(job_id, job_usage, item_usages)
+        if rendition_list:
+            summary["renditions"] = [r.name for r in rendition_list]
         update_job(
             job_id,
             status="finished",
-            progress={"current": total, "total": total},
+            progress={**_item_progress(total, total), "percent": 100.0},
             summary=summary,
             outputs=[],
         )
@@ -7,6 +7,7 @@ from redis.exceptions import ConnectionError as RedisConnectionError
 from rq import Queue, Worker
 
 from .config import QUEUE_NAME, REDIS_URL
+from .tasks import warm_ffmpeg_capabilities
 
 
 def create_redis_connection(url: str, max_retries: int = 5, retry_delay: float = 2.0) -> Redis:
@@ -26,6 +27,7 @@ def create_redis_connection(url: str, max_retries: int = 5, retry_delay: float =
 
 
 if __name__ == "__main__":
+    print(warm_ffmpeg_capabilities())
     redis_conn = create_redis_connection(REDIS_URL)
     queue = Queue(QUEUE_NAME, connection=redis_conn)
     worker = Worker([queue], connection=redis_conn)